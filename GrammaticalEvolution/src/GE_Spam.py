@@ -16,7 +16,7 @@ from utilities.algorithm.general import check_python_version
 from stats.stats import get_stats
 from algorithm.parameters import params, set_params
 from utilities.stats import trackers
-from utilities.fitness.get_data import get_data
+from utilities.fitness.get_data import get_dataset
 from sklearn.metrics import confusion_matrix, ConfusionMatrixDisplay
 
 check_python_version()
@@ -32,11 +32,12 @@ def mane():
     # Print final review
     get_stats(individuals, end=True)
 
-    # reload the dataset
-    X_training, y_training, X_test, y_test = get_data(params['DATASET_TRAIN'], params['DATASET_TEST'])
+    # get the test labels from the dataset registry (already loaded)
+    test_set = get_dataset(params['DATASET_TEST'])
+    y_test = test_set.y
 
     # Get the best individual
-    y_training_prev = trackers.best_ever.eval_train
+    y_training_prev = getattr(trackers.best_ever, 'eval_train', None)
     y_prev  = trackers.best_ever.eval_test
 
     cm = confusion_matrix(y_test, y_prev, labels=[0, 1])
@@ -26,7 +26,7 @@ check_python_version()
 from stats.stats import get_stats
 from algorithm.parameters import params, set_params
 from utilities.stats import trackers
-from utilities.fitness.get_data import get_data
+from utilities.fitness.get_data import get_dataset
 from ErrorGrids import parkes_error_grid
 from synthetic_tests_lib import crosscorr
 import sys
@@ -46,11 +46,12 @@ def mane():
     print("📊 Calcolo statistiche finali...")
     get_stats(individuals, end=True)
 
-    print("📂 Ricarico il dataset per valutare il miglior individuo...")
-    training_in, training_real, test_in, test_real = get_data(params['DATASET_TRAIN'], params['DATASET_TEST'])
+    print("📂 Recupero il dataset di test dal registro dei dataset...")
+    test_set = get_dataset(params['DATASET_TEST'])
+    test_real = test_set.y
 
     print("🔍 Calcolo predizioni del miglior individuo...")
-    training_pred = trackers.best_ever.eval_train
+    training_pred = getattr(trackers.best_ever, 'eval_train', None)
     test_pred = trackers.best_ever.eval_test
 
     ### Metriche di classificazione
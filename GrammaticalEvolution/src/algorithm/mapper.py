@@ -1,12 +1,15 @@
-from collections import deque
+from itertools import accumulate
+from sys import maxsize
 
 import numpy as np
 from algorithm.parameters import params
+from representation.flat_tree import FlatTree, subtree_sizes
 from representation.tree import Tree
+from utilities.representation.mapping_cache import mapping_cache
 from utilities.representation.python_filter import python_filter
 
 
-def mapper(genome, tree):
+def mapper(genome, tree, resume=None):
     """
     Wheel for mapping. Calls the correct mapper for a given _input. Checks
     the params dict to ensure the correct type of individual is being created.
@@ -15,8 +18,17 @@ def mapper(genome, tree):
     generated. If a tree is passed in with no genome, the genome is
     sequenced from the tree.
 
+    If params['MAPPING_CACHE_SIZE'] is set, changed genomes which select
+    the same productions as a previously mapped genome take its mapping
+    from the mapping cache (see utilities.representation.mapping_cache).
+
     :param genome: Genome of an individual.
     :param tree: Tree of an individual.
+    :param resume: Optionally, for a genome which was made by changing the
+    genome of another individual, a (parent, index) pair, where index is
+    the first codon which differs from the genome of the parent (or None if
+    no codon differs). Mapping then resumes from the last checkpoint of the
+    parent before that codon (see get_checkpoint).
     :return: All components necessary for a fully mapped individual.
     """
 
@@ -24,6 +36,8 @@ def mapper(genome, tree):
     assert (genome or tree)
     assert not (genome and tree)
 
+    checkpoints, cache_size = None, params['MAPPING_CACHE_SIZE']
+
     if genome:
         # We have a genome and need to map an individual from that genome.
 
@@ -35,8 +49,31 @@ def mapper(genome, tree):
             # Can generate tree information faster using
             # algorithm.mapper.map_ind_from_genome() if we don't need to
             # store the whole tree.
+            if cache_size and resume is not None and \
+                    getattr(resume[0], 'checkpoints', None):
+                # Look the genome up by the productions of its parent.
+                cached = mapping_cache.lookup(
+                    genome, resume[0].checkpoints[1], resume[1])
+
+                if cached is not None:
+                    # The effective genome has been mapped (and filtered)
+                    # before.
+                    phenotype, nodes, depth, used_codons, checkpoints = \
+                        cached
+                    return phenotype, genome, None, nodes, False, depth, \
+                        used_codons, checkpoints
+
+            if resume is not None:
+                resume = get_checkpoint(resume[0], resume[1], len(genome))
+
             phenotype, genome, tree, nodes, invalid, depth, \
-            used_codons = map_ind_from_genome(genome)
+            used_codons, checkpoints = map_ind_from_genome(genome, resume)
+
+        elif params['FLAT_TREES']:
+            # Build a flat tree using
+            # algorithm.mapper.map_flat_tree_from_genome().
+            phenotype, genome, tree, nodes, invalid, depth, \
+            used_codons = map_flat_tree_from_genome(genome)
 
         else:
             # Build the tree using algorithm.mapper.map_tree_from_genome().
@@ -46,6 +83,10 @@ def mapper(genome, tree):
     else:
         # We have a tree.
 
+        if params['FLAT_TREES'] and isinstance(tree, Tree):
+            # Store the tree as a flat tree.
+            tree = FlatTree.from_tree(tree)
+
         # genome, output, invalid, depth, and nodes can all be
         # generated by recursing through the tree once.
 
@@ -63,116 +104,334 @@ def mapper(genome, tree):
         # Set values for invalid individuals.
         phenotype, nodes, depth, used_codons = None, np.nan, np.nan, np.nan
 
-    return phenotype, genome, tree, nodes, invalid, depth, used_codons
+    elif cache_size and checkpoints:
+        # The genome was mapped without wrapping.
+        mapping_cache.add(checkpoints[1], (phenotype, nodes, depth,
+                                           used_codons, checkpoints))
 
+    return phenotype, genome, tree, nodes, invalid, depth, used_codons, \
+        checkpoints
 
-def map_ind_from_genome(genome):
+
+def get_checkpoint(parent, index, n_input):
+    """
+    Find the last checkpoint of the mapping of a parent from which the
+    mapping of a changed genome can resume. GE mapping is a leftmost
+    derivation, so every codon before the first changed codon maps exactly
+    as it did in the parent.
+
+    :param parent: The individual whose genome was changed.
+    :param index: The first codon which differs from the genome of the
+    parent, or None if no codon differs.
+    :param n_input: The length of the changed genome.
+    :return: The output of the parent up to the checkpoint, the
+    productions selected up to the checkpoint, the checkpoint and the
+    checkpoints before it, or None if there is no such checkpoint.
+    """
+
+    checkpoints = getattr(parent, 'checkpoints', None)
+    interval = params['CHECKPOINT_INTERVAL']
+
+    if not checkpoints or not interval:
+        return None
+
+    output, productions, states = checkpoints
+
+    # The codon at the checkpoint itself must exist in the changed genome.
+    limit = n_input - 1 if index is None else min(index, n_input - 1)
+    k = min(limit // interval, len(states)) - 1
+
+    if k < 0:
+        return None
+
+    return output[:states[k][1]], productions[:states[k][0]], states[k], \
+        states[:k]
+
+
+def map_ind_from_genome(genome, resume=None):
     """
     A fast genotype to phenotype mapping process. Map input via rules to
     output. Does not require the recursive tree class, but still calculates
     tree information, e.g. number of nodes and maximum depth.
 
+    Mapping runs on the integer tables of the grammar (see
+    representation.grammar.Grammar.compile_tables), with a stack of
+    non-terminal IDs and runs of terminals and a stack of the depths of
+    the non-terminals. As long as the genome does not wrap and the depth
+    limit is not breached, the order in which symbols are checked does not
+    matter: terminals are output as whole runs, and the maximum depth is
+    only updated when a non-terminal is expanded. Otherwise, the genome is
+    mapped again by map_ind_with_limits, which checks every symbol in the
+    same order as the original mapper.
+
+    The minimum number of codons still needed, and the minimum depth of
+    the subtrees of the unexpanded non-terminals, are tracked from the
+    bounds of the grammar (see
+    representation.grammar.Grammar.compile_bounds). A genome which
+    provably cannot be mapped within MAX_WRAPS and MAX_TREE_DEPTH is
+    invalid at once, rather than being mapped again.
+
+    If params['CHECKPOINT_INTERVAL'] is set, the state of the mapping (the
+    stacks, the length of the output and the tree information) is saved
+    every CHECKPOINT_INTERVAL codons, so that the mapping of a genome which
+    differs only after a checkpoint can resume from it (see
+    get_checkpoint). The production selected by each codon is recorded
+    alongside the checkpoints, so that the mapping can be added to the
+    mapping cache.
+
     :param genome: A genome to be mapped.
+    :param resume: Optionally, a checkpoint from which to resume mapping,
+    as returned by get_checkpoint.
     :return: Output in the form of a phenotype string ('None' if invalid),
              Genome,
              None (this is reserved for the derivation tree),
              The number of nodes in the derivation,
              A boolean flag for whether or not the individual is invalid,
-             The maximum depth of any node in the tree, and
-             The number of used codons.
+             The maximum depth of any node in the tree,
+             The number of used codons, and
+             The output, the selected productions and the list of
+             checkpoints of the mapping (None if neither checkpoints nor
+             the mapping cache are used).
+    """
+
+    # Create local variables to avoid multiple lookups
+    depth_limit = params['MAX_TREE_DEPTH'] or maxsize
+    interval = params['CHECKPOINT_INTERVAL'] or maxsize
+    bnf_grammar = params['BNF_GRAMMAR']
+    rule_offsets, rule_sizes = bnf_grammar.rule_offsets, \
+        bnf_grammar.rule_sizes
+    prod_arities, prod_leading = bnf_grammar.prod_arities, \
+        bnf_grammar.prod_leading
+    prod_rest, terminal_runs = bnf_grammar.prod_rest, \
+        bnf_grammar.terminal_runs
+    prod_codon_deltas, prod_heights = bnf_grammar.prod_codon_deltas, \
+        bnf_grammar.prod_heights
+
+    n_input = len(genome)
+
+    if params['MAX_WRAPS'] < 0:
+        # The genome cannot be mapped at all.
+        return map_ind_with_limits(genome)
+
+    # The number of codons and the depth of the deepest symbol which a
+    # valid mapping can reach (see map_ind_with_limits).
+    codon_limit = (params['MAX_WRAPS'] + 1) * n_input + 1
+    height_limit = depth_limit + 1
+
+    if resume is None:
+        # Depth, max_depth, and nodes start from 1 to account for starting
+        # root
+        used_input, max_depth, nodes = 0, 1, 1
+
+        output, productions, states = [], [], []
+
+        # The stack of unexpanded symbols, with the next symbol to be
+        # expanded last, the stack of the depths of the non-terminals in it,
+        # and the number of non-terminals in it.
+        symbols, depths = [bnf_grammar.start_id], [1]
+        unexpanded_NTs = 1
+
+        # The minimum number of codons still needed to finish mapping.
+        needed = bnf_grammar.min_codons[bnf_grammar.start_id]
+
+    else:
+        # Resume from a checkpoint of the parent, whose output so far is
+        # the first piece of output.
+        prefix, productions, state, states = resume
+        used_input, _, symbols, depths, unexpanded_NTs, max_depth, \
+            nodes, needed = state
+        output, states = [prefix], states + [state]
+        symbols, depths = list(symbols), list(depths)
+        productions = list(productions)
+
+    output_append, productions_append = output.append, productions.append
+    symbols_pop, symbols_extend = symbols.pop, symbols.extend
+    depths_pop, depths_extend = depths.pop, depths.extend
+
+    # Checkpoints are saved at multiples of the interval.
+    next_checkpoint = used_input + interval
+    pieces = []
+
+    while symbols:
+        current_symbol = symbols_pop()
+
+        if current_symbol < 0:
+            # A run of terminals.
+            output_append(terminal_runs[-1 - current_symbol])
+            continue
+
+        # Select a production based on the next available codon in the
+        # genome.
+        production = rule_offsets[current_symbol] + \
+            genome[used_input] % rule_sizes[current_symbol]
+        productions_append(production)
+
+        # Use an input
+        used_input += 1
+
+        nt_count = prod_arities[production]
+        unexpanded_NTs += nt_count - 1
+        nodes += nt_count or 1
+        needed += prod_codon_deltas[production]
+
+        # The children of the production are one level deeper.
+        current_depth = depths_pop() + 1
+
+        if used_input + needed > codon_limit or \
+                current_depth + prod_heights[production] > height_limit:
+            # The genome provably cannot be mapped within the limits.
+            return None, genome, None, nodes, True, max_depth, used_input, \
+                None
+
+        if current_depth > depth_limit or \
+                (used_input == n_input and unexpanded_NTs):
+            # The depth limit would be breached, or the genome would wrap.
+            return map_ind_with_limits(genome)
+
+        if max_depth < current_depth:
+            # Set the new maximum depth.
+            max_depth = current_depth
+
+        leading = prod_leading[production]
+
+        if leading is not None:
+            output_append(leading)
+
+        if nt_count:
+            depths_extend([current_depth] * nt_count)
+
+        symbols_extend(prod_rest[production])
+
+        if used_input == next_checkpoint:
+            # Save a checkpoint, with the length of the output in pieces
+            # for now.
+            pieces.append(len(output))
+            states.append((used_input, None, tuple(symbols), tuple(depths),
+                           unexpanded_NTs, max_depth, nodes, needed))
+            next_checkpoint += interval
+
+    # Generate phenotype string.
+    phenotype = "".join(output)
+
+    if not (params['CHECKPOINT_INTERVAL'] or params['MAPPING_CACHE_SIZE']):
+        return phenotype, genome, None, nodes, False, max_depth, \
+            used_input, None
+
+    if pieces:
+        # Convert the lengths of the output at new checkpoints from pieces
+        # to characters.
+        chars = [0] + list(accumulate(map(len, output)))
+        new = len(states) - len(pieces)
+        states[new:] = [state[:1] + (chars[n],) + state[2:] for n, state in
+                        zip(pieces, states[new:])]
+
+    return phenotype, genome, None, nodes, False, max_depth, used_input, \
+        (phenotype, tuple(productions), states)
+
+
+def map_ind_with_limits(genome):
     """
+    Map a genome which may wrap, or breach the depth limit, on the integer
+    tables of the grammar. Every symbol is expanded from the stack, and the
+    limits are checked, in the same order as the original mapper, so that
+    invalid individuals and individuals which only just reach the limits
+    are mapped exactly as before. As in map_ind_from_genome, mapping stops
+    as soon as the genome provably cannot be mapped within the limits.
 
-    # Create local variables to avoid multiple dictionary lookups
-    max_tree_depth, max_wraps = params['MAX_TREE_DEPTH'], params['MAX_WRAPS']
+    :param genome: A genome to be mapped.
+    :return: As map_ind_from_genome, without checkpoints.
+    """
+
+    # Create local variables to avoid multiple lookups
+    max_wraps = params['MAX_WRAPS']
+    depth_limit = params['MAX_TREE_DEPTH'] or maxsize
     bnf_grammar = params['BNF_GRAMMAR']
+    n_NTs, strings = bnf_grammar.n_NTs, bnf_grammar.symbol_strings
+    rule_offsets, rule_sizes = bnf_grammar.rule_offsets, \
+        bnf_grammar.rule_sizes
+    prod_children, prod_arities = bnf_grammar.prod_children, \
+        bnf_grammar.prod_arities
+    prod_codon_deltas, prod_heights = bnf_grammar.prod_codon_deltas, \
+        bnf_grammar.prod_heights
 
     n_input = len(genome)
 
+    # A valid mapping can use at most one codon after its last wrap, and
+    # can only breach the depth limit with the last symbol it expands.
+    codon_limit = (max_wraps + 1) * n_input + 1
+    height_limit = depth_limit + 1
+
     # Depth, max_depth, and nodes start from 1 to account for starting root
     # Initialise number of wraps at -1 (since
-    used_input, current_depth, max_depth, nodes, wraps = 0, 1, 1, 1, -1
+    used_input, max_depth, nodes, wraps = 0, 1, 1, -1
+
+    output = []
 
-    # Initialise output as empty deque list (deque is a list-like container
-    # with fast appends and pops on either end).
-    output = deque()
+    # The stacks of unexpanded symbols and of their depths, with the next
+    # symbol to be expanded last, and the number of non-terminals in them.
+    symbols, depths = [bnf_grammar.start_id], [1]
+    unexpanded_NTs = 1
 
-    # Initialise the list of unexpanded non-terminals with the start rule.
-    unexpanded_symbols = deque([(bnf_grammar.start_rule, 1)])
+    # The minimum number of codons still needed to finish mapping.
+    needed = bnf_grammar.min_codons[bnf_grammar.start_id]
 
-    while (wraps < max_wraps) and unexpanded_symbols:
+    while (wraps < max_wraps) and symbols:
         # While there are unexpanded non-terminals, and we are below our
         # wrapping limit, we can continue to map the genome.
 
-        if max_tree_depth and (max_depth > max_tree_depth):
+        if max_depth > depth_limit:
             # We have breached our maximum tree depth limit.
             break
 
-        if used_input % n_input == 0 and \
-                used_input > 0 and \
-                any([i[0]["type"] == "NT" for i in unexpanded_symbols]):
+        if unexpanded_NTs and used_input % n_input == 0 and used_input > 0:
             # If we have reached the end of the genome and unexpanded
             # non-terminals remain, then we need to wrap back to the start
             # of the genome again. Can break the while loop.
             wraps += 1
 
-        # Expand a production from the list of unexpanded non-terminals.
-        current_item = unexpanded_symbols.popleft()
-        current_symbol, current_depth = current_item[0], current_item[1]
+        # Expand a symbol from the stack of unexpanded symbols.
+        current_symbol, current_depth = symbols.pop(), depths.pop()
 
         if max_depth < current_depth:
             # Set the new maximum depth.
             max_depth = current_depth
 
         # Set output if it is a terminal.
-        if current_symbol["type"] != "NT":
-            output.append(current_symbol["symbol"])
+        if current_symbol >= n_NTs:
+            output.append(strings[current_symbol])
 
         else:
-            # Current item is a new non-terminal. Find associated production
-            # choices.
-            production_choices = bnf_grammar.rules[current_symbol[
-                "symbol"]]["choices"]
-            no_choices = bnf_grammar.rules[current_symbol["symbol"]][
-                "no_choices"]
-
             # Select a production based on the next available codon in the
             # genome.
-            current_production = genome[used_input % n_input] % no_choices
+            production = rule_offsets[current_symbol] + \
+                genome[used_input % n_input] % rule_sizes[current_symbol]
 
             # Use an input
             used_input += 1
 
-            # Initialise children as empty deque list.
-            children = deque()
-            nt_count = 0
-
-            for prod in production_choices[current_production]['choice']:
-                # iterate over all elements of chosen production rule.
-
-                child = [prod, current_depth + 1]
-
-                # Extendleft reverses the order, thus reverse adding.
-                children.appendleft(child)
-                if child[0]["type"] == "NT":
-                    nt_count += 1
-
-            # Add the new children to the list of unexpanded symbols.
-            unexpanded_symbols.extendleft(children)
+            # Push the children of the production, first child last.
+            children = prod_children[production]
+            symbols.extend(children)
+            depths.extend([current_depth + 1] * len(children))
 
-            if nt_count > 0:
-                nodes += nt_count
-            else:
-                nodes += 1
+            nt_count = prod_arities[production]
+            unexpanded_NTs += nt_count - 1
+            nodes += nt_count or 1
+            needed += prod_codon_deltas[production]
 
-    # Generate phenotype string.
-    output = "".join(output)
+            if used_input + needed > codon_limit or current_depth + 1 + \
+                    prod_heights[production] > height_limit:
+                # The genome provably cannot be mapped within the limits.
+                break
 
-    if len(unexpanded_symbols) > 0:
+    if symbols:
         # All non-terminals have not been completely expanded, invalid
         # solution.
-        return None, genome, None, nodes, True, max_depth, used_input
+        return None, genome, None, nodes, True, max_depth, used_input, None
 
-    return output, genome, None, nodes, False, max_depth, used_input
+    # Generate phenotype string.
+    return "".join(output), genome, None, nodes, False, max_depth, \
+        used_input, None
 
 
 def map_tree_from_genome(genome):
@@ -203,6 +462,91 @@ def map_tree_from_genome(genome):
                used_codons
 
 
+def map_flat_tree_from_genome(genome):
+    """
+    Maps a flat tree (see representation.flat_tree.FlatTree) from a given
+    genome. Builds the same tree as map_tree_from_genome, but iterates over
+    a stack of unexpanded symbols instead of recursing, using the integer
+    grammar tables (see representation.grammar.Grammar.compile_tables).
+
+    :param genome: A genome to be mapped.
+    :return: All components necessary for a fully mapped individual.
+    """
+
+    bnf_grammar = params['BNF_GRAMMAR']
+    n_NTs, symbol_strings = bnf_grammar.n_NTs, bnf_grammar.symbol_strings
+    rule_offsets, rule_sizes = bnf_grammar.rule_offsets, \
+        bnf_grammar.rule_sizes
+    prod_children, prod_arities = bnf_grammar.prod_children, \
+        bnf_grammar.prod_arities
+
+    n_input = len(genome)
+    max_index = n_input * (params['MAX_WRAPS'] + 1)
+    max_tree_depth = params['MAX_TREE_DEPTH']
+
+    symbols, codons, depths, parents, output = [], [], [], [], []
+    index, nodes, max_depth, invalid = 0, 0, 0, False
+
+    # The unexpanded symbols, each with the index of its parent and its
+    # depth. The leftmost symbol is last.
+    stack = [(bnf_grammar.start_id, -1, 1)]
+
+    while stack:
+        # Add the nodes to the tree in preorder.
+        symbol, parent, depth = stack.pop()
+        i = len(symbols)
+
+        symbols.append(symbol)
+        depths.append(depth)
+        parents.append(parent)
+
+        if symbol >= n_NTs:
+            # The symbol is a terminal.
+            codons.append(None)
+            output.append(symbol_strings[symbol])
+
+        elif invalid or index >= max_index:
+            # Mapping incomplete, solution is invalid. The non-terminal is
+            # left unexpanded.
+            codons.append(None)
+            invalid = True
+
+        else:
+            # Expand the non-terminal with the current codon.
+            codon = genome[index % n_input]
+            codons.append(codon)
+            index += 1
+            nodes += 1
+
+            production = rule_offsets[symbol] + codon % rule_sizes[symbol]
+            stack.extend([(child, i, depth + 1) for child in
+                          prod_children[production]])
+
+            if not prod_arities[production]:
+                # There are no non-terminals in the chosen production
+                # choice, the branch terminates here.
+                nodes += 1
+
+                if depth + 1 > max_depth:
+                    # Set the new maximum depth.
+                    max_depth = depth + 1
+
+                if max_tree_depth and max_depth > max_tree_depth:
+                    # If our maximum depth exceeds the limit, the solution
+                    # is invalid.
+                    invalid = True
+
+    tree = FlatTree(symbols, codons, depths, parents, subtree_sizes(parents))
+
+    if invalid:
+        # Return "None" phenotype if invalid
+        return None, genome, tree, nodes, invalid, max_depth, index
+
+    else:
+        return "".join(output), genome, tree, nodes, invalid, max_depth, \
+               index
+
+
 def genome_tree_map(tree, genome, output, index, depth, max_depth, nodes,
                     invalid=False):
     """
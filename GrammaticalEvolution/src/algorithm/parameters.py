@@ -30,6 +30,14 @@ params = {
     'DATASET_TRAIN': "VitalSigns/human_vital_signs_train.csv",
     'DATASET_TEST': "VitalSigns/human_vital_signs_test.csv",
     'DATASET_DELIMITER': None,
+    # Maximum number of compiled phenotypes kept in the least-recently-used
+    # compile cache of the supervised learning fitness functions. Set to 0
+    # to disable the compile cache.
+    'COMPILE_CACHE_SIZE': 10000,
+    # Save parsed datasets to a checksummed binary cache file next to the
+    # dataset file, which later runs memory-map instead of parsing the
+    # dataset again.
+    'DATASET_CACHE': True,
 
     # Set grammar file
     'GRAMMAR_FILE': "supervised_learning/VitalSigns.bnf",
@@ -42,8 +50,55 @@ params = {
     # Select error metric
     'ERROR_METRIC': 'f1_score',
 
+    # Scale the output of each individual in the regression fitness function
+    # by the offset and scale which minimise its squared error, found in
+    # closed form, before applying the error metric.
+    'LINEAR_SCALING': False,
+    # When to evaluate the best individual on the test set during a run, in
+    # a background worker: "change" (whenever the best ever individual
+    # changes), "step" (every TEST_EVALUATION_STEP generations) or "end"
+    # (only at the end of the run).
+    'TEST_EVALUATION': "change",
+    'TEST_EVALUATION_STEP': 10,
     # Optimise constants in the supervised_learning fitness function.
     'OPTIMIZE_CONSTANTS': False,
+    # Pass exact gradients of the error metric with respect to the constants,
+    # by reverse-mode differentiation of the phenotype, to the optimiser
+    # rather than estimating them by finite differences. Only used with error
+    # metrics which have a gradient, e.g. mse.
+    'ANALYTIC_GRADIENTS': True,
+    # Maximum number of skeletons (phenotypes with consecutive constants)
+    # whose optimised constants are cached, so that repeated skeletons are
+    # not optimised again. 0 disables the constant cache.
+    'CONSTANT_CACHE_SIZE': 10000,
+    # Start the optimisation of the constants of a new individual from the
+    # optimised constants of its nearest parent rather than from 0.
+    'WARM_START_CONSTANTS': True,
+    # Evaluate boolean classifier phenotypes over whole dataset columns at
+    # once rather than row by row in the supervised_learning fitness
+    # function.
+    'COLUMN_EVALUATION': True,
+    # Evaluate rule classifier phenotypes (AND/OR/NOT of threshold
+    # predicates) as packed bitsets during training, with one bit per row,
+    # and score them from popcounts. Only used with error metrics which can
+    # be computed from confusion counts, e.g. f1_score.
+    'PACKED_EVALUATION': True,
+    # Evaluate the unique phenotypes of each generation as one batch, e.g.
+    # the supervised_learning fitness function writes their predictions into
+    # one population x samples matrix and scores it with a single call of
+    # the error metric. Only used if fitness depends on the phenotype alone.
+    'BATCH_EVALUATION': True,
+    # Maximum number of subexpression values (one column vector each) kept
+    # in the least-recently-used subexpression cache of column evaluation.
+    # Identical subexpressions across the population are then computed once
+    # per dataset. Set to 0 to evaluate every phenotype on its own.
+    'SUBEXPRESSION_CACHE_SIZE': 1000,
+    # Cache training fitness by the semantics (a hash of the predictions) of
+    # individuals in the supervised_learning fitness function, so that the
+    # error metric is computed once for each distinct behaviour.
+    'SEMANTIC_CACHE': False,
+    # Maximum number of entries in the least-recently-used semantic cache.
+    'SEMANTIC_CACHE_SIZE': 10000,
 
     # Specify target for target problems
     'TARGET': "ponyge_rocks",
@@ -55,6 +110,24 @@ params = {
     'CODON_SIZE': 80, #100
     'MAX_GENOME_LENGTH': 200,
     'MAX_WRAPS': 0,
+    # Save the state of the genome mapping every CHECKPOINT_INTERVAL codons,
+    # so that the children of linear variation operators resume mapping
+    # from the last checkpoint before their first changed codon. 0 disables
+    # checkpoints.
+    'CHECKPOINT_INTERVAL': 10,
+    # Maximum number of genome mappings kept in the least-recently-used
+    # mapping cache, keyed by the productions selected by the used codons, so
+    # that the children of linear variation operators which only differ from
+    # a mapped genome in their unused tail or in codons which select the
+    # same productions are not mapped again. Mostly worthwhile without
+    # checkpoints, or with python grammars whose phenotypes are expensive to
+    # filter. 0 disables the mapping cache.
+    'MAPPING_CACHE_SIZE': 0,
+    # Store derivation trees as flat trees (see
+    # representation.flat_tree.FlatTree) rather than as pointer-based trees
+    # when GENOME_OPERATIONS is off, i.e. with subtree variation operators.
+    # Flat trees are copied and spliced without recursion.
+    'FLAT_TREES': False,
 
     # INITIALISATION
     # Set initialisation operator.
@@ -119,6 +192,12 @@ params = {
     'VERBOSE': True,
     # Use this to prevent anything being printed to the command line.
     'SILENT': False,
+    # Set the log level of all modules (DEBUG, INFO, WARNING, ERROR or
+    # CRITICAL). DEBUG output is disabled by default.
+    'LOG_LEVEL': "INFO",
+    # Set the log level of individual modules or packages, as space
+    # separated "module:LEVEL" pairs, e.g. "fitness:DEBUG".
+    'LOG_MODULES': None,
 
     # SAVING
     # Save the phenotype of the best individual from each generation. Can
@@ -133,6 +212,11 @@ params = {
     'MULTICORE': False,
     # Set the number of cpus to be used for multiprocessing
     'CORES': cpu_count(),
+    # Set the number of unique phenotypes sent to a worker in a single task
+    # when the fitness function only needs phenotypes (see
+    # fitness.evaluation.evaluate_phenotypes). None splits each generation
+    # into about four tasks per core.
+    'MULTICORE_CHUNK_SIZE': None,
 
     # STATE SAVING/LOADING
     # Save the state of the evolutionary run every generation. You can
@@ -176,6 +260,21 @@ params = {
     # with mutated versions of the original individual. Hopefully this will
     # encourage diversity in the population.
     'MUTATE_DUPLICATES': True,
+    # Set the maximum number of entries in the cache. None for no limit.
+    'CACHE_SIZE': None,
+    # Set the maximum approximate memory used by the cache in bytes. None
+    # for no limit.
+    'CACHE_MEMORY': None,
+    # Set the policy used to evict entries when the cache is full: "lru"
+    # (least recently used), "lfu" (least frequently used) or "age" (oldest
+    # first). Evicted phenotypes are no longer recognised as duplicates.
+    'CACHE_EVICTION': "lru",
+    # Set the file name of an SQLite database in which fitnesses are saved
+    # and shared across runs. Entries are keyed by the grammar, dataset
+    # files, fitness function, error metric and target as well as the
+    # phenotype. Only used by fitness functions which depend on the
+    # phenotype alone. None disables the persistent cache.
+    'PERSISTENT_CACHE': None,
 
     # MULTI-AGENT Parameters
     # True or False for multi-agent
@@ -251,6 +350,7 @@ def set_params(command_line_args, create_files=True):
     from utilities.fitness.math_functions import return_one_percent
     from utilities.algorithm.command_line_parser import parse_cmd_args
     from utilities.stats import trackers, clean_stats
+    from utilities.stats.logger import set_log_levels
     from representation import grammar
 
     cmd_args, unknown = parse_cmd_args(command_line_args)
@@ -272,6 +372,9 @@ def set_params(command_line_args, create_files=True):
     # NOTE that command line arguments overwrite all previously set parameters.
     params.update(cmd_args)
 
+    # Set the levels of all loggers.
+    set_log_levels()
+
     if params['LOAD_STATE']:
         # Load run from state.
         from utilities.algorithm.state import load_state
@@ -2,10 +2,15 @@ from multiprocessing import Pool
 
 from algorithm.parameters import params
 from fitness.evaluation import evaluate_fitness
+from fitness.test_evaluation import TestEvaluator
 from operators.initialisation import initialisation
 from stats.stats import get_stats, stats
 from utilities.algorithm.initialise_run import pool_init
+from utilities.fitness.get_data import release_shared_datasets
 from utilities.stats import trackers
+from utilities.stats.logger import get_logger
+
+log = get_logger(__name__)
 
 
 def search_loop():
@@ -17,6 +22,9 @@ def search_loop():
     the specified number of generations.
     """
 
+    # Start the test evaluation worker before any other worker.
+    tester = TestEvaluator()
+
     if params['MULTICORE']:
         # initialize pool once, if multi-core is enabled
         params['POOL'] = Pool(processes=params['CORES'], initializer=pool_init,
@@ -38,19 +46,18 @@ def search_loop():
         # New generation
         individuals = params['STEP'](individuals)
 
-        # 💎 Test set evaluation
-        best_individual = max(individuals, key=lambda ind: ind.fitness)
+        # 💎 Test set evaluation of the best individual, in the background.
+        tester.update(generation)
 
-        try:
-            test_score = params['FITNESS_FUNCTION'].evaluate(best_individual, dist="test")
-            print(f"[🎯 Gen {generation} - Test set F1 score]: {test_score:.4f}")
-        except Exception as e:
-            print(f"[❌ Eval error on test set - Gen {generation}]: {str(e)}")
+    tester.close()
 
     if params['MULTICORE']:
         # Close the workers pool (otherwise they'll live on forever).
         params['POOL'].close()
 
+        # Unlink shared datasets now that no more workers will attach them.
+        release_shared_datasets()
+
     return individuals
 
 
@@ -65,6 +72,9 @@ def search_loop_from_state():
 
     individuals = trackers.state_individuals
 
+    # Start the test evaluation worker before any other worker.
+    tester = TestEvaluator()
+
     if params['MULTICORE']:
         # initialize pool once, if multi-core is enabled
         params['POOL'] = Pool(processes=params['CORES'], initializer=pool_init,
@@ -77,8 +87,16 @@ def search_loop_from_state():
         # New generation
         individuals = params['STEP'](individuals)
 
+        # 💎 Test set evaluation of the best individual, in the background.
+        tester.update(generation)
+
+    tester.close()
+
     if params['MULTICORE']:
         # Close the workers pool (otherwise they'll live on forever).
         params['POOL'].close()
 
+        # Unlink shared datasets now that no more workers will attach them.
+        release_shared_datasets()
+
     return individuals
@@ -1,7 +1,11 @@
 import numpy as np
+from algorithm.parameters import params
+from utilities.stats.logger import get_logger
 
 np.seterr(all="raise")
 
+log = get_logger(__name__)
+
 
 class base_ff:
     """
@@ -17,6 +21,20 @@ class base_ff:
     # Default fitness objective is to minimise fitness.
     maximise = False
 
+    # Whether fitness depends only on the phenotype of an individual. If so,
+    # multi-core evaluation sends phenotype strings to the workers rather
+    # than whole individuals, and only fitness values, runtime error flags
+    # and semantics are sent back (other attributes set on the individual by
+    # the fitness function are not).
+    phenotype_only = False
+
+    # Errors in evaluation which give an individual the default fitness and
+    # mark it as having a runtime error, rather than stopping the run.
+    # FP err can happen through eg overflow (lots of pow/exp calls)
+    # ZeroDiv can happen when using unprotected operators
+    runtime_errors = (FloatingPointError, ZeroDivisionError, OverflowError,
+                      MemoryError)
+
     def __init__(self):
         pass
 
@@ -34,10 +52,7 @@ class base_ff:
             # class.
             fitness = self.evaluate(ind, **kwargs)
 
-        except (FloatingPointError, ZeroDivisionError, OverflowError,
-                MemoryError):
-            # FP err can happen through eg overflow (lots of pow/exp calls)
-            # ZeroDiv can happen when using unprotected operators
+        except base_ff.runtime_errors:
             fitness = base_ff.default_fitness
 
             # These individuals are valid (i.e. not invalids), but they have
@@ -47,11 +62,43 @@ class base_ff:
         except Exception as err:
             # Other errors should not usually happen (unless we have
             # an unprotected operator) so user would prefer to see them.
-            print(err)
+            log.error(err)
             raise
 
         return fitness
 
+    def evaluate_batch(self, individuals):
+        """
+        Evaluate the fitness of a batch of individuals, e.g. all unique
+        phenotypes of a generation, setting the fitness of each. Fitness
+        functions which can evaluate many individuals at once (see
+        supervised_learning) over-write this function; by default
+        individuals are evaluated one at a time.
+
+        :param individuals: A list of individuals to be evaluated.
+        :return: Nothing.
+        """
+
+        for ind in individuals:
+            ind.fitness = self(ind)
+
+    def fingerprint(self):
+        """
+        Return everything other than the phenotype, the grammar and the
+        dataset files which determines the fitness of an individual, e.g.
+        to key the persistent fitness cache (see
+        utilities.fitness.persistent_cache). Fitness functions whose
+        fitness depends on further settings extend this.
+
+        :return: A tuple of values with a stable repr.
+        """
+
+        error_metric = params['ERROR_METRIC']
+
+        return type(self).__module__, type(self).__qualname__, \
+            getattr(error_metric, "__name__", error_metric), \
+            params['TARGET'], params.get('EXTRA_PARAMETERS')
+
     def evaluate(self, ind, **kwargs):
         """
         Default fitness execution call for all fitness functions. When
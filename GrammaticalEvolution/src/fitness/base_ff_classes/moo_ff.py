@@ -20,6 +20,9 @@ class moo_ff:
     # Required attribute for stats handling.
     multi_objective = True
 
+    # Individuals are evaluated whole (see base_ff.phenotype_only).
+    phenotype_only = False
+
     def __init__(self, fitness_functions):
 
         # Set list of individual fitness functions.
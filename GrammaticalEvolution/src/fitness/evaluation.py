@@ -2,6 +2,8 @@ import numpy as np
 
 from algorithm.parameters import params
 from stats.stats import stats
+from representation.individual import Individual
+from utilities.fitness.persistent_cache import get_persistent_cache
 from utilities.stats.trackers import cache, runtime_error_cache
 
 
@@ -22,6 +24,15 @@ def evaluate_fitness(individuals):
            have already been evaluated are mutated to produce new unique
            individuals which have not been encountered yet by the search
            process.
+    If the fitness of an individual depends on its phenotype alone (see
+    base_ff.phenotype_only), individuals are grouped by phenotype and each
+    unique phenotype is evaluated once, with its fitness shared by all
+    individuals which have it. stats['saved_evals'] counts the evaluations
+    saved in this way. If params['BATCH_EVALUATION'] is also specified,
+    unique phenotypes are evaluated as one batch (see
+    base_ff.evaluate_batch). If params['PERSISTENT_CACHE'] is specified,
+    unique phenotypes are first looked up in a persistent on-disk cache
+    shared across runs, and newly evaluated phenotypes are saved to it.
 
     :param individuals: A population of individuals to be evaluated.
     :return: A population of fully evaluated individuals.
@@ -29,6 +40,11 @@ def evaluate_fitness(individuals):
 
     results, pool = [], None
 
+    # Unique phenotypes to be evaluated, mapped to the names of the
+    # individuals which have them. If fitness depends on the phenotype alone,
+    # each unique phenotype is only evaluated once per generation.
+    phenotypes = {} if params['FITNESS_FUNCTION'].phenotype_only else None
+
     if params['MULTICORE']:
         pool = params['POOL']
 
@@ -45,16 +61,30 @@ def evaluate_fitness(individuals):
         else:
             eval_ind = True
 
-            # Valid individuals can be evaluated.
-            if params['CACHE'] and ind.phenotype in cache:
+            # Valid individuals can be evaluated. Each is looked up in the
+            # cache once, which counts as a cache hit or miss.
+            fitness = cache.get(ind.phenotype) if params['CACHE'] else None
+
+            if params['CACHE'] and (fitness is not None or (
+                    phenotypes is not None and ind.phenotype in phenotypes)):
                 # The individual has been encountered before in
-                # the utilities.trackers.cache.
+                # the utilities.trackers.cache, or earlier in this
+                # generation.
 
                 if params['LOOKUP_FITNESS']:
-                    # Set the fitness as the previous fitness from the
-                    # cache.
-                    ind.fitness = cache[ind.phenotype]
-                    eval_ind = False
+                    if fitness is not None:
+                        # Set the fitness as the previous fitness from the
+                        # cache.
+                        ind.fitness = fitness
+                        eval_ind = False
+
+                        semantics = cache.get_semantics(ind.phenotype)
+
+                        if semantics is not None:
+                            ind.semantics = semantics
+
+                    # Otherwise the individual is given the fitness of its
+                    # duplicates in this generation once they are evaluated.
 
                 elif params['LOOKUP_BAD_FITNESS']:
                     # Give the individual a bad default fitness.
@@ -64,7 +94,8 @@ def evaluate_fitness(individuals):
                 elif params['MUTATE_DUPLICATES']:
                     # Mutate the individual to produce a new phenotype
                     # which has not been encountered yet.
-                    while (not ind.phenotype) or ind.phenotype in cache:
+                    while (not ind.phenotype) or \
+                            is_duplicate(ind.phenotype, phenotypes):
                         ind = params['MUTATION'](ind)
                         stats['regens'] += 1
 
@@ -73,9 +104,59 @@ def evaluate_fitness(individuals):
                     ind.name = name
 
             if eval_ind:
-                results = eval_or_append(ind, results, pool)
+                if phenotypes is not None:
+                    # Identical phenotypes are only evaluated once.
+                    phenotypes.setdefault(ind.phenotype, []).append(name)
 
-    if params['MULTICORE']:
+                else:
+                    results = eval_or_append(ind, results, pool)
+
+    if phenotypes:
+        # Count the evaluations saved by evaluating duplicates only once.
+        stats['saved_evals'] += sum(len(names) for names in
+                                    phenotypes.values()) - len(phenotypes)
+
+        if params['PERSISTENT_CACHE']:
+            # Look up phenotypes evaluated in this or previous runs.
+            found = get_persistent_cache().get_many(list(phenotypes))
+            stats['persistent_hits'] += len(found)
+
+            for phenotype, (fitness, runtime_error, semantics) in \
+                    found.items():
+                share_fitness(individuals, phenotypes.pop(phenotype),
+                              fitness, runtime_error, semantics)
+
+                if params['CACHE']:
+                    cache[phenotype] = fitness
+                    cache.set_semantics(phenotype, semantics)
+
+        if phenotypes and params['MULTICORE']:
+            evaluate_phenotypes_parallel(individuals, phenotypes, pool)
+
+        elif phenotypes and params['BATCH_EVALUATION']:
+            evaluate_phenotypes_batch(individuals, phenotypes)
+
+        elif phenotypes:
+            for names in phenotypes.values():
+                # Evaluate the first individual with this phenotype.
+                ind = individuals[names[0]]
+                eval_or_append(ind, results, pool)
+
+                # Give its fitness to all of its duplicates.
+                share_fitness(individuals, names[1:], ind.fitness,
+                              ind.runtime_error,
+                              getattr(ind, 'semantics', None))
+
+        if phenotypes and params['PERSISTENT_CACHE']:
+            # Save the newly evaluated phenotypes.
+            get_persistent_cache().put_many(
+                {phenotype: (individuals[names[0]].fitness,
+                             individuals[names[0]].runtime_error,
+                             getattr(individuals[names[0]], 'semantics',
+                                     None)) for
+                 phenotype, names in phenotypes.items()})
+
+    elif params['MULTICORE']:
         for result in results:
             # Execute all jobs in the pool.
             ind = result.get()
@@ -86,11 +167,15 @@ def evaluate_fitness(individuals):
 
             # Add the evaluated individual to the cache.
             cache[ind.phenotype] = ind.fitness
+            cache.set_semantics(ind.phenotype, getattr(ind, 'semantics',
+                                                       None))
 
             # Check if individual had a runtime error.
             if ind.runtime_error:
                 runtime_error_cache.append(ind.phenotype)
 
+            record_constants(ind)
+
     return individuals
 
 
@@ -117,18 +202,198 @@ def eval_or_append(ind, results, pool):
         # Evaluate the individual.
         ind.evaluate()
 
+        record_fitness(ind)
+
+
+def record_fitness(ind):
+    """
+    Record the fitness of an individual which has just been evaluated
+    sequentially: note any runtime error and add the fitness to the cache.
+
+    :param ind: An evaluated individual.
+    :return: Nothing.
+    """
+
+    # Check if individual had a runtime error.
+    if ind.runtime_error:
+        runtime_error_cache.append(ind.phenotype)
+
+    if params['CACHE']:
+        # The phenotype string of the individual does not appear
+        # in the cache, it must be evaluated and added to the
+        # cache.
+
+        if (isinstance(ind.fitness, list) and not
+        any([np.isnan(i) for i in ind.fitness])) or \
+                (not isinstance(ind.fitness, list) and not
+                np.isnan(ind.fitness)):
+            # All fitnesses are valid.
+            cache[ind.phenotype] = ind.fitness
+            cache.set_semantics(ind.phenotype, getattr(ind, 'semantics',
+                                                       None))
+
+    record_constants(ind)
+
+
+def record_constants(ind):
+    """
+    Count the constant cache lookups, hits and optimiser iterations of an
+    individual whose constants have just been optimised (see
+    utilities.fitness.optimize_constants).
+
+    :param ind: An evaluated individual.
+    :return: Nothing.
+    """
+
+    if hasattr(ind, 'constant_stats'):
+        hit, iterations = ind.__dict__.pop('constant_stats')
+        stats['constant_lookups'] += 1
+        stats['constant_hits'] += hit
+        stats['opt_iterations'] += iterations
+
+
+def is_duplicate(phenotype, phenotypes):
+    """
+    Check whether a phenotype has been evaluated before (i.e. is in the
+    cache) or is already due to be evaluated in this generation.
+
+    :param phenotype: The phenotype of an individual.
+    :param phenotypes: A dict of the phenotypes due to be evaluated in this
+    generation, or None if they are not tracked.
+    :return: Whether the phenotype is a duplicate.
+    """
+
+    return phenotype in cache or (phenotypes is not None and
+                                  phenotype in phenotypes)
+
+
+def share_fitness(individuals, names, fitness, runtime_error,
+                  semantics=None):
+    """
+    Set the fitness of a number of individuals with the same phenotype, once
+    that phenotype has been evaluated.
+
+    :param individuals: A population of individuals.
+    :param names: The names (i.e. indexes) of the individuals in the
+    population to be given the fitness.
+    :param fitness: The fitness of the phenotype.
+    :param runtime_error: Whether evaluation produced a runtime error.
+    :param semantics: The semantics of the phenotype, if known (see
+    utilities.fitness.semantic_cache).
+    :return: Nothing.
+    """
+
+    for name in names:
+        ind = individuals[name]
+        ind.fitness, ind.runtime_error = fitness, runtime_error
+
+        if semantics is not None:
+            ind.semantics = semantics
+
         # Check if individual had a runtime error.
-        if ind.runtime_error:
+        if runtime_error:
             runtime_error_cache.append(ind.phenotype)
 
-        if params['CACHE']:
-            # The phenotype string of the individual does not appear
-            # in the cache, it must be evaluated and added to the
-            # cache.
-
-            if (isinstance(ind.fitness, list) and not
-            any([np.isnan(i) for i in ind.fitness])) or \
-                    (not isinstance(ind.fitness, list) and not
-                    np.isnan(ind.fitness)):
-                # All fitnesses are valid.
-                cache[ind.phenotype] = ind.fitness
+
+def evaluate_phenotypes_batch(individuals, phenotypes):
+    """
+    Evaluate unique phenotypes sequentially as a single batch (see
+    base_ff.evaluate_batch), so that fitness functions such as
+    supervised_learning can score the whole generation at once. The
+    fitness of each phenotype is shared by all individuals which have it.
+
+    :param individuals: A population of individuals.
+    :param phenotypes: A dict of unique phenotypes to be evaluated, mapped to
+    the names (i.e. indexes) of the individuals in the population which have
+    them.
+    :return: Nothing.
+    """
+
+    # Evaluate the first individual with each phenotype.
+    batch = [individuals[names[0]] for names in phenotypes.values()]
+    params['FITNESS_FUNCTION'].evaluate_batch(batch)
+
+    for ind, names in zip(batch, phenotypes.values()):
+        record_fitness(ind)
+
+        # Give its fitness to all of its duplicates.
+        share_fitness(individuals, names[1:], ind.fitness, ind.runtime_error,
+                      getattr(ind, 'semantics', None))
+
+
+def evaluate_phenotypes_parallel(individuals, phenotypes, pool):
+    """
+    Evaluate unique phenotypes with a multi-core pool of workers. Phenotypes
+    are sent to the workers in chunks of params['MULTICORE_CHUNK_SIZE'] and
+    only fitness values, runtime error flags and semantics (if the fitness
+    function sets them) are sent back, so that whole individuals (genomes,
+    derivation trees) are never pickled. The results are written back into
+    the population.
+
+    :param individuals: A population of individuals.
+    :param phenotypes: A dict of unique phenotypes to be evaluated, mapped to
+    the names (i.e. indexes) of the individuals in the population which have
+    them.
+    :param pool: A pool of workers for multicore evaluation.
+    :return: Nothing.
+    """
+
+    unique = list(phenotypes)
+
+    chunk_size = params['MULTICORE_CHUNK_SIZE']
+
+    if not chunk_size:
+        # As multiprocessing.Pool.map, aim for four chunks per worker.
+        chunk_size, extra = divmod(len(unique), params['CORES'] * 4)
+        if extra:
+            chunk_size += 1
+
+    chunks = [unique[i:i + chunk_size] for i in
+              range(0, len(unique), chunk_size)]
+
+    # Submit all chunks before waiting on any of them.
+    results = [pool.apply_async(evaluate_phenotypes, (chunk,)) for chunk in
+               chunks]
+
+    for chunk, result in zip(chunks, results):
+        for phenotype, (fitness, runtime_error, semantics) in \
+                zip(chunk, result.get()):
+
+            # Set the fitness of every individual with this phenotype.
+            share_fitness(individuals, phenotypes[phenotype], fitness,
+                          runtime_error, semantics)
+
+            # Add the evaluated phenotype to the cache.
+            cache[phenotype] = fitness
+            cache.set_semantics(phenotype, semantics)
+
+
+def evaluate_phenotypes(phenotypes):
+    """
+    Evaluate a chunk of phenotypes in a multi-core worker. Only for fitness
+    functions whose fitness depends on the phenotype alone (see
+    base_ff.phenotype_only).
+
+    :param phenotypes: A list of phenotype strings.
+    :return: A list of (fitness, runtime error flag, semantics) tuples, one
+    for each phenotype. Semantics are None unless set by the fitness
+    function.
+    """
+
+    individuals = []
+
+    for phenotype in phenotypes:
+        # A bare individual which only carries the phenotype.
+        ind = Individual(None, None, map_ind=False)
+        ind.phenotype = phenotype
+        individuals.append(ind)
+
+    if params['BATCH_EVALUATION']:
+        params['FITNESS_FUNCTION'].evaluate_batch(individuals)
+
+    else:
+        for ind in individuals:
+            ind.evaluate()
+
+    return [(ind.fitness, ind.runtime_error, getattr(ind, 'semantics', None))
+            for ind in individuals]
@@ -8,6 +8,8 @@ class string_match(base_ff):
     Penalty given to individual string components which do not match ASCII
     value of target."""
 
+    phenotype_only = True
+
     def __init__(self):
         # Initialise base fitness function class.
         super().__init__()
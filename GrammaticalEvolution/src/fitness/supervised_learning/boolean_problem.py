@@ -1,10 +1,15 @@
 import itertools
 import random
+from hashlib import sha1
 
 import numpy as np
 from algorithm.parameters import params
 from fitness.supervised_learning.supervised_learning import supervised_learning
+from utilities.fitness.compile_cache import compile_phenotype
 from utilities.fitness.error_metric import Hamming_error
+from utilities.fitness.predicate_bits import as_words, count_confusion, \
+    pack_bits, popcount, unpack_bits
+from utilities.fitness.semantic_cache import get_semantics, semantic_cache
 
 
 class boolean_problem(supervised_learning):
@@ -17,6 +22,13 @@ class boolean_problem(supervised_learning):
     accomplished with, eg, --extra_parameters nparity 5. There is
     no test on unseen data.
 
+    Inputs and targets are bit-sliced: the truth table column of each
+    input variable, and the target outputs, are packed into uint64 words
+    with one bit per input combination (see TruthTable). Phenotypes then
+    evaluate 64 input combinations per bitwise operation, and
+    Hamming_error is a popcount, so that problems with 20 or more inputs
+    remain feasible.
+
     An example command-line is then:
 
     python ponyge.py --generations 10 --population 10 --fitness
@@ -48,17 +60,140 @@ class boolean_problem(supervised_learning):
         else:
             target = eval(target_name)
 
-        # generate all input combinations for n variables, to become
-        # the fitness cases
-        Ls = [[False, True] for i in range(n)]
-        X = np.array(list(itertools.product(*Ls)))
+        # all input combinations for n variables, to become the fitness
+        # cases
+        self.training_in = TruthTable(n)
+
         # evaluate the target function at the fitness cases
-        self.training_exp = np.array([target(xi) for xi in X])
-        self.training_in = X.T
+        if hasattr(target, "bitsliced"):
+            self.training_exp = target.bitsliced(self.training_in)
+
+        else:
+            Ls = [[False, True] for i in range(n)]
+            X = np.array(list(itertools.product(*Ls)))
+            self.training_exp = pack_bits(np.array([target(xi) for xi in X],
+                                                   dtype=bool))
 
         # In Boolean problems we don't want a separate test set
         assert not params['DATASET_TEST']
 
+    def fingerprint(self):
+        """
+        Return everything other than the phenotype and the grammar which
+        determines the fitness of an individual (see base_ff.fingerprint).
+        The target function is given by a checksum of its packed outputs,
+        as e.g. random_boolean targets differ between runs.
+
+        :return: A tuple of values with a stable repr.
+        """
+
+        return super().fingerprint() + (
+            sha1(self.training_exp.tobytes()).hexdigest(),)
+
+    def evaluate(self, ind, **kwargs):
+        """
+        Evaluate a phenotype, e.g. (x[:, 0] & ~x[:, 1]), at all input
+        combinations at once over the bit-sliced truth table.
+
+        :param ind: An individual to be evaluated.
+        :return: The error of the individual.
+        """
+
+        x = self.training_in
+        yhat = eval(compile_phenotype(ind.phenotype))
+
+        if np.ndim(yhat) == 0:
+            # The phenotype does not depend on any input.
+            yhat = x.valid if yhat else np.zeros_like(x.valid)
+
+        elif yhat.dtype != np.uint64 or yhat.shape != x.valid.shape:
+            raise ValueError("Phenotype does not evaluate to packed truth "
+                             "table words: %s" % ind.phenotype)
+
+        # Clear the padding bits set by ~.
+        yhat = yhat & x.valid
+
+        def score():
+            if params['ERROR_METRIC'] is Hamming_error:
+                # The number of mismatches.
+                return popcount(yhat ^ self.training_exp)
+
+            elif hasattr(params['ERROR_METRIC'], "from_counts"):
+                return params['ERROR_METRIC'].from_counts(
+                    *count_confusion(yhat, self.training_exp, x.n_rows))
+
+            return params['ERROR_METRIC'](
+                unpack_bits(self.training_exp, x.n_rows),
+                unpack_bits(yhat, x.n_rows))
+
+        if params['SEMANTIC_CACHE']:
+            # Individuals with the same truth table share a fitness.
+            ind.semantics = get_semantics(yhat)
+            return semantic_cache.get(ind.semantics, score)
+
+        return score()
+
+
+class TruthTable:
+    """
+    The inputs of a Boolean problem of n variables as a bit-sliced truth
+    table. Column j holds the values of variable j at all 2**n input
+    combinations (in itertools.product order) as packed uint64 words,
+    one bit per combination, e.g. for variable 0 of 3 the bits are
+    00001111. Phenotypes index it like a dataset, i.e. x[:, j] (or x[j]).
+    """
+
+    def __init__(self, n):
+        self.n_vars = n
+        self.n_rows = 2 ** n
+
+        # The valid bits. With fewer than 64 rows, the rest of the only
+        # word is padding.
+        self.valid = np.full(max(1, self.n_rows // 64),
+                             np.iinfo(np.uint64).max, dtype=np.uint64)
+        if self.n_rows < 64:
+            self.valid[0] = (1 << self.n_rows) - 1
+
+        # The first variable varies slowest, i.e. is the highest bit of
+        # the row index.
+        self.columns = [truth_table_column(n - 1 - j, n) & self.valid for
+                        j in range(n)]
+
+    def __getitem__(self, key):
+        if isinstance(key, tuple):
+            # x[:, j]
+            _, key = key
+
+        return self.columns[key]
+
+    def __len__(self):
+        return self.n_rows
+
+
+def truth_table_column(bit, n):
+    """
+    Pack the truth table column of one bit of the row index, i.e. row i
+    is set if bit `bit` of i is set, for all 2**n rows. Built a byte at a
+    time, without enumerating rows.
+
+    :param bit: The bit of the row index.
+    :param n: The number of variables.
+    :return: A 1D numpy array of uint64 words.
+    """
+
+    n_bytes = max(1, 2 ** n // 8)
+
+    if bit < 3:
+        # The bit changes within each byte (of 8 rows).
+        packed = np.full(n_bytes, [0xAA, 0xCC, 0xF0][bit], dtype=np.uint8)
+
+    else:
+        # Whole bytes are set or clear.
+        packed = np.where(np.arange(n_bytes) >> (bit - 3) & 1, 0xFF,
+                          0).astype(np.uint8)
+
+    return as_words(packed)
+
 
 # Some target functions. Each just accepts a single instance, eg
 # nparity([False, False, True]) -> True
@@ -67,13 +202,35 @@ def boolean_true(x):
     return True
 
 
+def boolean_true_bits(x):
+    return x.valid.copy()
+
+
+boolean_true.bitsliced = boolean_true_bits
+
+
 def comparator(x):
     """Comparator function: input consists of two n-bit numbers. Output is
     0 if the first is larger or equal, or 1 if the second is larger."""
     assert len(x) % 2 == 0
     n = len(x) // 2
     # no need to convert from binary. just use list comparison
-    return x[:n] < x[n:]
+    return list(x[:n]) < list(x[n:])
+
+
+def comparator_bits(x):
+    """Comparator function over a TruthTable."""
+    assert x.n_vars % 2 == 0
+    n = x.n_vars // 2
+    less, equal = np.zeros_like(x.valid), x.valid.copy()
+    # compare bit by bit from the most significant.
+    for a, b in zip(x.columns[:n], x.columns[n:]):
+        less |= equal & ~a & b
+        equal &= ~(a ^ b)
+    return less & x.valid
+
+
+comparator.bitsliced = comparator_bits
 
 
 def multiplexer(x):
@@ -98,11 +255,42 @@ def multiplexer(x):
     return x[a + addr]  # which data bit? offset by a
 
 
+def multiplexer_bits(x):
+    """Multiplexer function over a TruthTable."""
+    for a in range(1, 7):
+        if x.n_vars == a + 2 ** a:
+            break
+    else:
+        raise ValueError(x.n_vars)
+    result = np.zeros_like(x.valid)
+    for addr in range(2 ** a):
+        # rows whose address bits (most significant first) equal addr.
+        match = x.valid.copy()
+        for j in range(a):
+            if addr >> (a - 1 - j) & 1:
+                match &= x.columns[j]
+            else:
+                match &= ~x.columns[j]
+        result |= match & x.columns[a + addr]
+    return result
+
+
+multiplexer.bitsliced = multiplexer_bits
+
+
 def nparity(x):
     'Parity function of any number of input variables'
     return x.sum() % 2 == 1
 
 
+def nparity_bits(x):
+    'Parity function over a TruthTable'
+    return np.bitwise_xor.reduce(x.columns)
+
+
+nparity.bitsliced = nparity_bits
+
+
 # special target function: random truth table
 def make_random_boolean_fn(n):
     """Make a random Boolean function of n variables."""
@@ -112,6 +300,8 @@ def make_random_boolean_fn(n):
     def f(x):
         return outputs[binlist2int(x)]
 
+    f.bitsliced = lambda x: pack_bits(np.array(outputs))
+
     return f
 
 
@@ -1,11 +1,32 @@
+import numpy as np
+
 from algorithm.parameters import params
+from fitness.base_ff_classes.base_ff import base_ff
 from fitness.supervised_learning.supervised_learning import supervised_learning
+from utilities.fitness.column_evaluation import evaluate_expression
+from utilities.fitness.compile_cache import compile_phenotype
 from utilities.fitness.error_metric import rmse
+from utilities.fitness.linear_scaling import apply_scaling, get_scaling
+from utilities.fitness.math_functions import *
+from utilities.fitness.optimize_constants import optimize_constants
+from utilities.fitness.semantic_cache import get_semantics, semantic_cache
 
 
 class regression(supervised_learning):
     """Fitness function for regression. We just slightly specialise the
-    function for supervised_learning."""
+    function for supervised_learning.
+
+    If params['LINEAR_SCALING'] is specified, the output f(x) of each
+    individual is scaled to a + b * f(x), with the offset a and scale b
+    which minimise the squared error found in closed form, before the
+    error metric is applied. The search is then free to find the shape of
+    the target function, rather than also its offset and scale.
+
+    Phenotypes are evaluated as numeric expressions over whole datasets
+    (see predict_values), rather than as boolean classifiers."""
+
+    prediction_dtype = float
+    # Predictions are real-valued.
 
     def __init__(self):
         # Initialise base fitness function class.
@@ -16,3 +37,143 @@ class regression(supervised_learning):
             params['ERROR_METRIC'] = rmse
 
         self.maximise = params['ERROR_METRIC'].maximise
+
+    def fingerprint(self):
+        """
+        Return everything other than the phenotype, the grammar and the
+        dataset files which determines the fitness of an individual (see
+        base_ff.fingerprint), including whether outputs are linearly
+        scaled.
+
+        :return: A tuple of values with a stable repr.
+        """
+
+        return super().fingerprint() + (params['LINEAR_SCALING'],)
+
+    def evaluate(self, ind, **kwargs):
+        if not params['LINEAR_SCALING']:
+            return super().evaluate(ind, **kwargs)
+
+        dist = kwargs.get('dist', 'training')
+
+        if dist == "training":
+            x, y = self.training_in, self.training_exp
+
+            if params['OPTIMIZE_CONSTANTS']:
+                # Optimise the constants, then scale the output of the
+                # phenotype with the optimised constants.
+                optimize_constants(x, y, ind)
+
+            yhat = self.predict_values(ind, x, y, self.training_set)
+            ind.scaling = get_scaling(y, yhat)
+
+            # Keep the scaled predictions, as for unscaled individuals.
+            ind.eval_train = apply_scaling(yhat, ind.scaling)
+
+            if params['SEMANTIC_CACHE']:
+                # Individuals with the same output have the same scaled
+                # output, and so share a fitness.
+                ind.semantics = get_semantics(yhat)
+                return semantic_cache.get(ind.semantics, lambda: params[
+                    'ERROR_METRIC'](y, ind.eval_train))
+
+            return params['ERROR_METRIC'](y, ind.eval_train)
+
+        elif dist == "test":
+            if not hasattr(ind, 'scaling'):
+                # E.g. the individual was evaluated by a multi-core worker,
+                # which only sends back its fitness: scale it again on the
+                # training data.
+                ind.scaling = get_scaling(self.training_exp,
+                                          self.predict_values(
+                                              ind, self.training_in,
+                                              self.training_exp,
+                                              self.training_set))
+
+            y = self.test_exp
+            ind.eval_test = apply_scaling(
+                self.predict_values(ind, self.test_in, y, self.test_set),
+                ind.scaling)
+
+            return params['ERROR_METRIC'](y, ind.eval_test)
+
+        else:
+            raise ValueError("Unknown dist: " + dist)
+
+    def evaluate_batch(self, individuals):
+        """
+        Evaluate the training fitness of a batch of individuals. Scaled
+        individuals are evaluated one at a time.
+
+        :param individuals: A list of individuals to be evaluated.
+        :return: Nothing.
+        """
+
+        if params['LINEAR_SCALING']:
+            return base_ff.evaluate_batch(self, individuals)
+
+        return super().evaluate_batch(individuals)
+
+    def predict(self, ind, x, dataset):
+        """
+        Compute the output of a phenotype over a dataset (see
+        predict_values).
+
+        :param ind: An individual to be evaluated.
+        :param x: A 2D numpy array of input data.
+        :param dataset: An instance of the Dataset class.
+        :return: A numpy array of the output of the individual for each row.
+        """
+
+        return self.predict_values(ind, x, dataset.y, dataset)
+
+    @staticmethod
+    def prediction_semantics(yhat):
+        """
+        Return the semantics of the output of an individual, i.e. a hash of
+        its exact values.
+
+        :param yhat: The output of an individual.
+        :return: A hex string.
+        """
+
+        return get_semantics(yhat)
+
+    @staticmethod
+    def predict_values(ind, x, y, dataset):
+        """
+        Evaluate the phenotype of an individual (with its optimised
+        constants, if constants are optimised) as a numeric expression over
+        a whole dataset. Without optimised constants, subexpressions shared
+        with other individuals are computed once per dataset (see
+        utilities.fitness.column_evaluation.evaluate_expression).
+
+        :param ind: An individual to be evaluated.
+        :param x: A 2D numpy array of input data.
+        :param y: Expected output, which the output must match in shape.
+        :param dataset: The instance of the Dataset class which holds x.
+        :return: A numpy array of the output of the individual for each row.
+        """
+
+        if params['OPTIMIZE_CONSTANTS']:
+            phen, c = ind.phenotype_consec_consts, ind.opt_consts
+            yhat = eval(compile_phenotype(phen))
+
+        elif params['SUBEXPRESSION_CACHE_SIZE'] and dataset is not None:
+            # Share subexpressions across the population.
+            yhat = evaluate_expression(ind.phenotype, dataset.columns,
+                                       dataset.filename)
+
+        else:
+            yhat = eval(compile_phenotype(ind.phenotype))
+
+        if np.ndim(yhat) == 0:
+            # The output does not depend on x.
+            return np.full(y.shape, yhat, dtype=float)
+
+        if y.shape != yhat.shape:
+            raise ValueError("Shape mismatch between y and yhat. Please "
+                             "check that your grammar uses the `x[:, 0]` "
+                             "style, not `x[0]`. See issue #130.")
+
+        return yhat
@@ -1,16 +1,24 @@
 import numpy as np
-import os
-import pandas as pd
 
 np.seterr(all="raise")
 
 from algorithm.parameters import params
-from utilities.fitness.get_data import get_data
+from utilities.fitness.column_evaluation import boolean_phenotype, \
+    compile_boolean_phenotype, evaluate_columns, evaluate_columns_shared, \
+    phenotype_globals
+from utilities.fitness.compile_cache import compile_phenotype
+from utilities.fitness.get_data import get_data, get_dataset
 from utilities.fitness.math_functions import *
 from utilities.fitness.optimize_constants import optimize_constants
+from utilities.fitness.predicate_bits import confusion_counts, \
+    evaluate_bits, pack_bits
+from utilities.fitness.semantic_cache import get_semantics, semantic_cache
+from utilities.stats.logger import get_logger
 
 from fitness.base_ff_classes.base_ff import base_ff
 
+log = get_logger(__name__)
+
 
 class supervised_learning(base_ff):
     """
@@ -28,6 +36,11 @@ class supervised_learning(base_ff):
     should not be instantiated.
     """
 
+    prediction_dtype = np.int8
+    # The type of the predictions of a batch of individuals (see
+    # get_predictions). Predictions are 0/1, so one byte per sample is
+    # enough.
+
     def __init__(self):
         # Initialise base fitness function class.
         super().__init__()
@@ -36,6 +49,12 @@ class supervised_learning(base_ff):
         self.training_in, self.training_exp, self.test_in, self.test_exp = \
             get_data(params['DATASET_TRAIN'], params['DATASET_TEST'])
 
+        # Keep the parsed datasets (column names, dtypes and data) from
+        # the dataset registry for name-based access to features.
+        self.training_set = get_dataset(params['DATASET_TRAIN'])
+        self.test_set = get_dataset(params['DATASET_TEST']) if \
+            params['DATASET_TEST'] else None
+
         # Find number of variables.
         self.n_vars = np.shape(self.training_in)[1] # sklearn convention
 
@@ -43,17 +62,89 @@ class supervised_learning(base_ff):
         if params['DATASET_TEST']:
             self.training_test = True
 
+    @property
+    def phenotype_only(self):
+        """
+        Fitness depends only on the phenotype, unless constants are optimised
+        (the optimised constants are stored on the individual).
+
+        :return: Whether multi-core evaluation can send phenotypes only.
+        """
+
+        return not params['OPTIMIZE_CONSTANTS']
+
+    def fingerprint(self):
+        """
+        Return everything other than the phenotype, the grammar and the
+        dataset files which determines the fitness of an individual (see
+        base_ff.fingerprint), including how the datasets are parsed.
+
+        :return: A tuple of values with a stable repr.
+        """
+
+        datasets = [getattr(self, name, None) for name in ['training_set',
+                                                           'test_set']]
+
+        return super().fingerprint() + (
+            params['OPTIMIZE_CONSTANTS'], params['DATASET_DELIMITER'],
+            [dataset.skip_header for dataset in datasets if dataset])
+
+    def __getstate__(self):
+        """
+        Return the picklable state of the fitness function, e.g. for
+        multi-core workers. The training and test arrays are not pickled
+        as they are restored from the datasets, which attach shared data
+        by name rather than copying it.
+
+        :return: The state of the fitness function.
+        """
+
+        state = self.__dict__.copy()
+
+        # Workers allocate their own prediction matrix.
+        state.pop('predictions', None)
+
+        if state.get('training_set') is not None:
+            for key in ['training_in', 'training_exp', 'test_in',
+                        'test_exp']:
+                state.pop(key, None)
+
+        return state
+
+    def __setstate__(self, state):
+        """
+        Restore a pickled fitness function.
+
+        :param state: The state of the fitness function.
+        :return: Nothing.
+        """
+
+        self.__dict__.update(state)
+
+        if state.get('training_set') is not None:
+            self.training_in = self.training_set.X
+            self.training_exp = self.training_set.y
+
+            if self.test_set is not None:
+                self.test_in, self.test_exp = self.test_set.X, \
+                                              self.test_set.y
+
+            else:
+                self.test_in, self.test_exp = None, None
+
     def evaluate(self, ind, **kwargs):
         dist = kwargs.get('dist', 'training')
 
         if dist == "training":
             x = self.training_in
             y = self.training_exp
-            print("[DEBUG] Using TRAINING data")
+            dataset = self.training_set
+            log.debug("Using TRAINING data")
         elif dist == "test":
             x = self.test_in
             y = self.test_exp
-            print("[DEBUG] Using TEST data")
+            dataset = self.test_set
+            log.debug("Using TEST data")
         else:
             raise ValueError("Unknown dist: " + dist)
 
@@ -66,37 +157,27 @@ that your grammar uses the `x[:, 0]` style, not `x[0]`. See issue #130."""
             else:
                 phen = ind.phenotype_consec_consts
                 c = ind.opt_consts
-                print(f"[DEBUG] Test eval with optimized constants: {c}")
-                yhat = eval(phen)
+                log.debug("Test eval with optimized constants: %s", c)
+                yhat = eval(compile_phenotype(phen))
                 if np.ndim(yhat) != 0 and y.shape != yhat.shape:
                     raise ValueError(shape_mismatch_txt)
                 return params['ERROR_METRIC'](y, yhat)
 
         else:
-            base_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
-            dataset_path = os.path.normpath(os.path.join(base_path, "datasets", params['DATASET_TRAIN']))
-            df = pd.read_csv(dataset_path)
-            feature_names = list(df.columns[:-1])
+            log.debug("Individual phenotype: %s", ind.phenotype)
 
-            yhat = []
-            print(f"[DEBUG] Individual phenotype: {ind.phenotype}")
+            if params['PACKED_EVALUATION'] and dist == 'training' and \
+                    hasattr(params['ERROR_METRIC'], 'from_counts'):
+                score = self.evaluate_packed(ind, dataset)
 
-            for i in range(len(x)):
-                local_vars = {feature_names[j]: x[i][j] for j in range(len(feature_names))}
-                try:
-                    phen = ind.phenotype.replace("AND", "and").replace("OR", "or").replace("NOT", "not")
-                    result = eval(phen, {}, local_vars)
-                    yhat.append(int(bool(result)))
-                except Exception as e:
-                    print(f"[ERROR] Eval failed at row {i}")
-                    print(f"[ERROR] Phenotype: {ind.phenotype}")
-                    print(f"[ERROR] Local vars: {local_vars}")
-                    print(f"[ERROR] Exception: {e}")
-                    yhat.append(0)
-
-            yhat = np.array(yhat)
-            print(f"[DEBUG] yhat prediction (first 10): {yhat[:10]}")
-            print(f"[DEBUG] y true (first 10): {y[:10]}")
+                if score is not None:
+                    log.debug("Score = %s", score)
+                    return score
+
+            yhat = self.predict(ind, x, dataset)
+
+            log.debug("yhat prediction (first 10): %s", yhat[:10])
+            log.debug("y true (first 10): %s", y[:10])
 
             if dist == 'training':
                 ind.eval_train = yhat
@@ -104,10 +185,331 @@ that your grammar uses the `x[:, 0]` style, not `x[0]`. See issue #130."""
                 ind.eval_test = yhat
 
             if np.ndim(yhat) != 0 and y.shape != yhat.shape:
-                print(f"[ERROR] Shape mismatch: y shape = {y.shape}, yhat shape = {yhat.shape}")
+                log.error("Shape mismatch: y shape = %s, yhat shape = %s",
+                          y.shape, yhat.shape)
                 raise ValueError(shape_mismatch_txt)
 
-            score = params['ERROR_METRIC'](y, yhat)
-            print(f"[DEBUG] Score = {score}")
+            if params['SEMANTIC_CACHE'] and dist == 'training':
+                # Individuals with the same predictions share a fitness.
+                ind.semantics = self.prediction_semantics(yhat)
+                score = semantic_cache.get(ind.semantics, lambda: params[
+                    'ERROR_METRIC'](y, yhat))
+
+            else:
+                score = params['ERROR_METRIC'](y, yhat)
+
+            log.debug("Score = %s", score)
             return score
 
+    def evaluate_packed(self, ind, dataset):
+        """
+        Score a rule classifier phenotype from the confusion counts of its
+        packed predictions (see utilities.fitness.predicate_bits). No
+        predictions are stored on the individual.
+
+        :param ind: An individual to be evaluated.
+        :param dataset: An instance of the Dataset class.
+        :return: The score of the individual, or None if the phenotype (or
+        dataset) cannot be evaluated as packed bitsets.
+        """
+
+        packed = self.packed_counts(ind, dataset)
+
+        if packed is None:
+            return None
+
+        bits, counts = packed
+
+        def score():
+            return params['ERROR_METRIC'].from_counts(*counts)
+
+        if params['SEMANTIC_CACHE']:
+            # Individuals with the same predictions share a fitness.
+            ind.semantics = get_semantics(bits)
+            return semantic_cache.get(ind.semantics, score)
+
+        return score()
+
+    def packed_counts(self, ind, dataset):
+        """
+        Evaluate a rule classifier phenotype as packed bitsets and count
+        its true/false positives/negatives.
+
+        :param ind: An individual to be evaluated.
+        :param dataset: An instance of the Dataset class.
+        :return: The packed predictions and the confusion counts of the
+        individual, or None if the phenotype (or dataset) cannot be
+        evaluated as packed bitsets.
+        """
+
+        try:
+            bits = evaluate_bits(ind.phenotype, dataset)
+            return bits, confusion_counts(bits, dataset)
+
+        except Exception:
+            # Fall back to column evaluation.
+            return None
+
+    def predict(self, ind, x, dataset):
+        """
+        Compute the predictions of a boolean classifier phenotype over a
+        dataset, over whole columns at once where possible, else one row
+        at a time.
+
+        :param ind: An individual to be evaluated.
+        :param x: A 2D numpy array of input data.
+        :param dataset: An instance of the Dataset class.
+        :return: A numpy array of 0/1 integer predictions, one per row.
+        """
+
+        if params['COLUMN_EVALUATION']:
+            # Evaluate the phenotype over whole dataset columns at once.
+            try:
+                if params['SUBEXPRESSION_CACHE_SIZE']:
+                    # Share subexpressions across the population.
+                    return evaluate_columns_shared(
+                        ind.phenotype, dataset.columns, len(x),
+                        dataset.filename)
+
+                return evaluate_columns(
+                    compile_boolean_phenotype(ind.phenotype),
+                    dataset.columns, len(x))
+
+            except Exception:
+                # Fall back to per-row evaluation, which handles errors
+                # row by row.
+                pass
+
+        return self.evaluate_rows(ind, x, dataset.feature_names)
+
+    def evaluate_batch(self, individuals):
+        """
+        Evaluate the training fitness of a batch of individuals, e.g. all
+        unique phenotypes of a generation. The predictions of all
+        individuals are written into one population x samples matrix
+        (reused between batches) and scored by a single call of the error
+        metric; individuals evaluated as packed bitsets are scored by a
+        single call on their confusion counts. As in evaluate, the
+        predictions of each individual evaluated over columns are stored as
+        its eval_train, while individuals evaluated as packed bitsets store
+        no predictions. Individuals which produce a runtime error get the
+        default fitness, as with base_ff.__call__.
+
+        :param individuals: A list of individuals to be evaluated.
+        :return: Nothing.
+        """
+
+        # Find the classes which define the evaluate and evaluate_batch
+        # functions used by this fitness function.
+        mro = type(self).__mro__
+        evaluate_class = next(c for c in mro if 'evaluate' in vars(c))
+        batch_class = next(c for c in mro if 'evaluate_batch' in vars(c))
+
+        if params['OPTIMIZE_CONSTANTS'] or \
+                evaluate_class is not batch_class and \
+                issubclass(evaluate_class, batch_class) or \
+                getattr(self, 'training_set', None) is None:
+            # Constants are optimised one individual at a time, and
+            # subclasses which over-write evaluate but not evaluate_batch
+            # (e.g. boolean_problem) or which have no training dataset are
+            # evaluated with their own evaluate function.
+            return base_ff.evaluate_batch(self, individuals)
+
+        x, y, dataset = self.training_in, self.training_exp, self.training_set
+        metric = params['ERROR_METRIC']
+
+        packed = params['PACKED_EVALUATION'] and hasattr(metric,
+                                                         'from_counts')
+
+        predictions = self.get_predictions(len(individuals), len(x))
+        counted, counts, predicted = [], [], []
+
+        for ind in individuals:
+            log.debug("Individual phenotype: %s", ind.phenotype)
+
+            try:
+                result = self.packed_counts(ind, dataset) if packed else None
+
+                if result is not None:
+                    if not self.lookup_semantics(ind, result[0], True):
+                        counted.append(ind)
+                        counts.append(result[1])
+
+                    continue
+
+                yhat = self.predict(ind, x, dataset)
+                ind.eval_train = yhat
+
+                if not self.lookup_semantics(ind, yhat):
+                    predictions[len(predicted)] = yhat
+                    predicted.append(ind)
+
+            except base_ff.runtime_errors:
+                ind.fitness = base_ff.default_fitness
+                ind.runtime_error = True
+
+        if counted:
+            counts = np.array(counts).T
+            self.set_batch_fitness(
+                counted, lambda: metric.from_counts(*counts),
+                lambda i: metric.from_counts(*counts[:, i]))
+
+        if predicted:
+            self.set_batch_fitness(
+                predicted, lambda: metric(y, predictions[:len(predicted)]),
+                lambda i: metric(y, predictions[i]))
+
+    def lookup_semantics(self, ind, yhat, packed=False):
+        """
+        If params['SEMANTIC_CACHE'] is set, set the semantics of an
+        individual and look up its fitness in the semantic cache.
+
+        :param ind: An individual.
+        :param yhat: The predictions of the individual.
+        :param packed: Whether the predictions are packed bits.
+        :return: Whether the fitness of the individual was found, and set.
+        """
+
+        if not params['SEMANTIC_CACHE']:
+            return False
+
+        ind.semantics = get_semantics(yhat) if packed else \
+            self.prediction_semantics(yhat)
+
+        if ind.semantics in semantic_cache:
+            # Individuals with the same predictions share a fitness.
+            ind.fitness = semantic_cache.get(ind.semantics, None)
+            return True
+
+        return False
+
+    @staticmethod
+    def prediction_semantics(yhat):
+        """
+        Return the semantics of the predictions of an individual (see
+        get_prediction_semantics).
+
+        :param yhat: The predictions of an individual.
+        :return: A hex string.
+        """
+
+        return get_prediction_semantics(yhat)
+
+    def set_batch_fitness(self, individuals, score_all, score_one):
+        """
+        Set the fitness of a batch of individuals from a single vectorised
+        call of the error metric. If that fails (e.g. the metric does not
+        accept a population x samples matrix, or one individual produces a
+        runtime error), individuals are scored one at a time instead.
+
+        :param individuals: A list of individuals.
+        :param score_all: A function of no arguments which returns an
+        array of the scores of all individuals.
+        :param score_one: A function which returns the score of the
+        individual at an index.
+        :return: Nothing.
+        """
+
+        try:
+            scores = score_all()
+
+            if np.shape(scores) != (len(individuals),):
+                scores = None
+
+        except base_ff.runtime_errors:
+            scores = None
+
+        for i, ind in enumerate(individuals):
+            if scores is not None:
+                ind.fitness = scores[i].item()
+
+            else:
+                try:
+                    ind.fitness = score_one(i)
+
+                except base_ff.runtime_errors:
+                    ind.fitness = base_ff.default_fitness
+                    ind.runtime_error = True
+                    continue
+
+            if params['SEMANTIC_CACHE']:
+                semantic_cache.get(ind.semantics, lambda: ind.fitness)
+
+    def get_predictions(self, n_inds, n_rows):
+        """
+        Return a matrix to hold the predictions of a batch of individuals.
+        The matrix is kept and reused by later batches, and only
+        reallocated when a larger batch arrives.
+
+        :param n_inds: The number of individuals in the batch.
+        :param n_rows: The number of rows in the dataset.
+        :return: A 2D numpy array with at least n_inds rows and n_rows
+        columns.
+        """
+
+        predictions = getattr(self, 'predictions', None)
+
+        if predictions is None or len(predictions) < n_inds or \
+                predictions.shape[1] != n_rows:
+            self.predictions = predictions = np.empty(
+                (n_inds, n_rows), dtype=self.prediction_dtype)
+
+        return predictions
+
+    def evaluate_rows(self, ind, x, feature_names):
+        """
+        Evaluate a boolean classifier phenotype one row of the dataset at a
+        time. Rows on which evaluation fails are predicted as 0.
+
+        :param ind: An individual to be evaluated.
+        :param x: A 2D numpy array of input data.
+        :param feature_names: The names of the columns of x.
+        :return: A numpy array of 0/1 integer predictions, one per row.
+        """
+
+        yhat, errors = [], 0
+        phen = boolean_phenotype(ind.phenotype)
+
+        try:
+            # Compile once rather than once per row.
+            phen = compile_phenotype(phen)
+        except SyntaxError:
+            # Leave the string, so the error is reported row by row.
+            pass
+
+        for i in range(len(x)):
+            local_vars = {feature_names[j]: x[i][j] for j in range(len(feature_names))}
+
+            # As in column evaluation, x is the input array (of one row).
+            local_vars.setdefault("x", x[i:i + 1])
+
+            try:
+                result = eval(phen, phenotype_globals, local_vars)
+                yhat.append(int(bool(result)))
+            except Exception as e:
+                log.debug("Eval failed at row %d\n  Phenotype: %s\n  Local "
+                          "vars: %s\n  Exception: %s", i, ind.phenotype,
+                          local_vars, e)
+                errors += 1
+                yhat.append(0)
+
+        if errors:
+            log.debug("Eval failed on %d of %d rows for phenotype: %s",
+                      errors, len(x), ind.phenotype)
+
+        return np.array(yhat)
+
+
+def get_prediction_semantics(yhat):
+    """
+    Return the semantics of the 0/1 predictions of a classifier (see
+    utilities.fitness.semantic_cache.get_semantics). Predictions are hashed
+    as packed bits, as in supervised_learning.evaluate_packed, so that
+    individuals with the same predictions have the same semantics however
+    their predictions were computed.
+
+    :param yhat: A numpy array of 0/1 predictions, one per row.
+    :return: A hex string.
+    """
+
+    return get_semantics(pack_bits(np.asarray(yhat) != 0))
@@ -0,0 +1,154 @@
+from multiprocessing import Pool
+
+from algorithm.parameters import params
+from utilities.algorithm.initialise_run import pool_init
+from utilities.stats import trackers
+from utilities.stats.logger import get_logger
+
+log = get_logger(__name__)
+
+
+class TestEvaluator(object):
+    """
+    Evaluate the best individual of a run on the test set during the run,
+    off the critical path. Test evaluations run in a background worker
+    process, so that the latency of each generation depends only on
+    training evaluation, and their results are logged as they arrive.
+    Results are cached by phenotype (in utilities.stats.trackers.test_cache,
+    which outlives the evaluator), so each phenotype is evaluated on the
+    test set at most once, including at the end of the run.
+
+    params['TEST_EVALUATION'] sets when the best individual is evaluated:
+        "change": whenever the best ever individual changes.
+        "step": every params['TEST_EVALUATION_STEP'] generations.
+        "end": only at the end of the run (see stats.stats.get_soo_stats),
+            so no test evaluations are made during the run.
+    Only fitness functions with a test set (i.e. with a training_test
+    attribute) are evaluated.
+    """
+
+    def __init__(self):
+        """
+        Initialise the test evaluator. The worker process is only started
+        if test evaluations can be made during the run.
+        """
+
+        self.policy = params['TEST_EVALUATION']
+
+        if self.policy not in ("change", "step", "end"):
+            s = "fitness.test_evaluation.TestEvaluator\n" \
+                "Error: unknown test evaluation policy %s. Use \"change\", " \
+                "\"step\" or \"end\"." % self.policy
+            raise Exception(s)
+
+        # Test fitness by phenotype, and pending evaluations.
+        self.cache, self.pending = trackers.test_cache, []
+        self.last = None
+
+        self.pool = None
+
+        if self.policy != "end" and \
+                hasattr(params['FITNESS_FUNCTION'], "training_test"):
+            self.pool = Pool(processes=1, initializer=pool_init,
+                             initargs=(params,))
+
+    def update(self, generation):
+        """
+        Submit the best ever individual for test evaluation if the policy
+        requires it at this generation, and log any finished evaluations.
+
+        :param generation: The current generation.
+        :return: Nothing.
+        """
+
+        if self.pool is None:
+            return
+
+        best = trackers.best_ever
+
+        if self.policy == "change":
+            due = best is not self.last
+
+        else:
+            due = generation % params['TEST_EVALUATION_STEP'] == 0
+
+        self.last = best
+
+        if due:
+            if best.phenotype in self.cache:
+                self.log(generation, self.cache[best.phenotype][0])
+
+            elif best.phenotype not in [phen for _, phen, _ in
+                                        self.pending]:
+                self.pending.append((generation, best.phenotype,
+                                     self.pool.apply_async(evaluate_test,
+                                                           (best,))))
+
+        self.collect(wait=False)
+
+    def collect(self, wait):
+        """
+        Cache and log the results of finished test evaluations.
+
+        :param wait: Whether to wait for all pending evaluations to finish.
+        :return: Nothing.
+        """
+
+        pending = []
+
+        for generation, phenotype, result in self.pending:
+            if not wait and not result.ready():
+                pending.append((generation, phenotype, result))
+                continue
+
+            try:
+                self.cache[phenotype] = result.get()
+                self.log(generation, self.cache[phenotype][0])
+
+            except Exception as e:
+                log.error("❌ Eval error on test set - Gen %d: %s",
+                          generation, e)
+
+        self.pending = pending
+
+    def close(self):
+        """
+        Wait for all pending test evaluations and stop the worker process.
+
+        :return: Nothing.
+        """
+
+        if self.pool is not None:
+            self.collect(wait=True)
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    @staticmethod
+    def log(generation, test_score):
+        """
+        Log the test fitness of the best individual at a generation.
+
+        :param generation: The generation at which it was the best.
+        :param test_score: Its test fitness.
+        :return: Nothing.
+        """
+
+        log.info("🎯 Gen %d - Test set %s: %.4f", generation,
+                 params['ERROR_METRIC'].__name__, test_score)
+
+
+def evaluate_test(ind):
+    """
+    Evaluate an individual on the test set, in the test evaluation worker.
+    The individual is a copy, so its test predictions are returned with its
+    test fitness to be set on the original at the end of the run.
+
+    :param ind: An individual.
+    :return: The test fitness and the test predictions (eval_test, or None
+    if the fitness function does not store them) of the individual.
+    """
+
+    test_fitness = params['FITNESS_FUNCTION'](ind, dist="test")
+
+    return test_fitness, getattr(ind, 'eval_test', None)
@@ -2,8 +2,10 @@ from random import choice, randint, random, sample
 
 from algorithm.parameters import params
 from representation import individual
+from representation.flat_tree import FlatTree
 from representation.latent_tree import latent_tree_crossover, \
     latent_tree_repair
+from utilities.fitness.optimize_constants import inherit_constants
 from utilities.representation.check_methods import check_ind
 
 
@@ -36,6 +38,10 @@ def crossover(parents):
 
         else:
 
+            for ind in inds_out:
+                # Children warm-start their constants from their parents.
+                inherit_constants(ind, inds_in)
+
             # Extend the new population.
             cross_pop.extend(inds_out)
 
@@ -107,10 +113,12 @@ def variable_onepoint(p_0, p_1):
         c_1 = genome_1[:pt_1] + genome_0[pt_0:]
     else:
         c_0, c_1 = genome_0[:], genome_1[:]
+        pt_0 = pt_1 = None
 
-    # Put the new chromosomes into new individuals.
-    ind_0 = individual.Individual(c_0, None)
-    ind_1 = individual.Individual(c_1, None)
+    # Put the new chromosomes into new individuals. Each child maps as its
+    # first parent up to the crossover point.
+    ind_0 = individual.Individual(c_0, None, resume=(p_0, pt_0))
+    ind_1 = individual.Individual(c_1, None, resume=(p_1, pt_1))
 
     return [ind_0, ind_1]
 
@@ -143,10 +151,12 @@ def fixed_onepoint(p_0, p_1):
         c_1 = genome_1[:pt] + genome_0[pt:]
     else:
         c_0, c_1 = genome_0[:], genome_1[:]
+        pt = None
 
-    # Put the new chromosomes into new individuals.
-    ind_0 = individual.Individual(c_0, None)
-    ind_1 = individual.Individual(c_1, None)
+    # Put the new chromosomes into new individuals. Each child maps as its
+    # first parent up to the crossover point.
+    ind_0 = individual.Individual(c_0, None, resume=(p_0, pt))
+    ind_1 = individual.Individual(c_1, None, resume=(p_1, pt))
 
     return [ind_0, ind_1]
 
@@ -179,10 +189,12 @@ def fixed_twopoint(p_0, p_1):
         c_1 = genome_1[:pt_0] + genome_0[pt_0:pt_1] + genome_1[pt_1:]
     else:
         c_0, c_1 = genome_0[:], genome_1[:]
+        pt_0 = None
 
-    # Put the new chromosomes into new individuals.
-    ind_0 = individual.Individual(c_0, None)
-    ind_1 = individual.Individual(c_1, None)
+    # Put the new chromosomes into new individuals. Each child maps as its
+    # first parent up to the first crossover point.
+    ind_0 = individual.Individual(c_0, None, resume=(p_0, pt_0))
+    ind_1 = individual.Individual(c_1, None, resume=(p_1, pt_0))
 
     return [ind_0, ind_1]
 
@@ -217,10 +229,12 @@ def variable_twopoint(p_0, p_1):
         c_1 = genome_1[:pt_2] + genome_0[pt_0:pt_1] + genome_1[pt_3:]
     else:
         c_0, c_1 = genome_0[:], genome_1[:]
+        pt_0 = pt_2 = None
 
-    # Put the new chromosomes into new individuals.
-    ind_0 = individual.Individual(c_0, None)
-    ind_1 = individual.Individual(c_1, None)
+    # Put the new chromosomes into new individuals. Each child maps as its
+    # first parent up to its first crossover point.
+    ind_0 = individual.Individual(c_0, None, resume=(p_0, pt_0))
+    ind_1 = individual.Individual(c_1, None, resume=(p_1, pt_2))
 
     return [ind_0, ind_1]
 
@@ -238,8 +252,9 @@ def subtree(p_0, p_1):
 
     def do_crossover(tree0, tree1, shared_nodes):
         """
-        Given two instances of the representation.tree.Tree class (
-        derivation trees of individuals) and a list of intersecting
+        Given two instances of the representation.tree.Tree class or of
+        the representation.flat_tree.FlatTree class (derivation trees of
+        individuals) and a list of intersecting
         non-terminal nodes across both trees, performs subtree crossover on
         these trees.
         
@@ -262,6 +277,11 @@ def subtree(p_0, p_1):
         # Randomly pick a node.
         t0, t1 = choice(nodes_0), choice(nodes_1)
 
+        if isinstance(tree0, FlatTree):
+            # The nodes are indexes into flat trees. Splice each subtree
+            # into the other tree.
+            return tree0.splice(t0, tree1, t1), tree1.splice(t1, tree0, t0)
+
         # Check the parents of both chosen subtrees.
         p0 = t0.parent
         p1 = t1.parent
@@ -5,11 +5,15 @@ from random import randint, shuffle
 from algorithm.parameters import params
 from representation import individual
 from representation.derivation import generate_tree, pi_grow
+from representation.flat_tree import FlatTree
 from representation.individual import Individual
 from representation.latent_tree import latent_tree_random_ind
 from representation.tree import Tree
 from scripts import GE_LR_parser
 from utilities.representation.python_filter import python_filter
+from utilities.stats.logger import get_logger
+
+log = get_logger(__name__)
 
 
 def initialisation(size):
@@ -169,8 +173,8 @@ def rhh(size):
 
     if size < 2:
         # If the population size is too small, can't use RHH initialisation.
-        print("Error: population size too small for RHH initialisation.")
-        print("Returning randomly built trees.")
+        log.error("Population size too small for RHH initialisation. "
+                  "Returning randomly built trees.")
         return [individual.Individual(sample_genome(), None)
                 for _ in range(size)]
 
@@ -187,9 +191,9 @@ def rhh(size):
             # Population size is odd, need an even population for RHH
             # initialisation.
             size += 1
-            print("Warning: Specified population size is odd, "
-                  "RHH initialisation requires an even population size. "
-                  "Incrementing population size by 1.")
+            log.warning("Specified population size is odd, RHH "
+                        "initialisation requires an even population size. "
+                        "Incrementing population size by 1.")
 
         if size / 2 < len(depths):
             # The population size is too small to fully cover all ramping
@@ -257,8 +261,8 @@ def PI_grow(size):
     if size < 2:
         # If the population size is too small, can't use PI Grow
         # initialisation.
-        print("Error: population size too small for PI Grow initialisation.")
-        print("Returning randomly built trees.")
+        log.error("Population size too small for PI Grow initialisation. "
+                  "Returning randomly built trees.")
         return [individual.Individual(sample_genome(), None)
                 for _ in range(size)]
 
@@ -325,6 +329,10 @@ def generate_ind_tree(max_depth, method):
     genome, output, nodes, _, depth = generate_tree(ind_tree, [], [], method,
                                                     0, 0, 0, max_depth)
 
+    if params['FLAT_TREES']:
+        # Store the tree as a flat tree.
+        ind_tree = FlatTree.from_tree(ind_tree)
+
     # Get remaining individual information
     phenotype, invalid, used_cod = "".join(output), False, len(genome)
 
@@ -362,6 +370,10 @@ def generate_PI_ind_tree(max_depth):
     # Generate a tree
     genome, output, nodes, depth = pi_grow(ind_tree, max_depth)
 
+    if params['FLAT_TREES']:
+        # Store the tree as a flat tree.
+        ind_tree = FlatTree.from_tree(ind_tree)
+
     # Get remaining individual information
     phenotype, invalid, used_cod = "".join(output), False, len(genome)
 
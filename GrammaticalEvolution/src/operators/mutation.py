@@ -2,8 +2,10 @@ from random import choice, randint, random
 
 from algorithm.parameters import params
 from representation import individual
-from representation.derivation import generate_tree
+from representation.derivation import generate_flat_tree, generate_tree
+from representation.flat_tree import FlatTree
 from representation.latent_tree import latent_tree_mutate, latent_tree_repair
+from utilities.fitness.optimize_constants import inherit_constants
 from utilities.representation.check_methods import check_ind
 
 
@@ -47,6 +49,9 @@ def mutation(pop):
             # Check ind does not violate specified limits.
             check = check_ind(new_ind, "mutation")
 
+        # The mutant warm-starts its constants from the individual.
+        inherit_constants(new_ind, [ind])
+
         # Append mutated individual to population.
         new_pop.append(new_ind)
 
@@ -78,14 +83,20 @@ def int_flip_per_codon(ind):
         # Default is 1 divided by genome length.
         p_mut = 1.0 / eff_length
 
+    # The first mutated codon, from which the genome must be re-mapped.
+    first = None
+
     # Mutation probability works per-codon over the portion of the
     # genome as defined by the within_used flag.
     for i in range(eff_length):
         if random() < p_mut:
             ind.genome[i] = randint(0, params['CODON_SIZE'])
 
+            if first is None:
+                first = i
+
     # Re-build a new individual with the newly mutated genetic information.
-    new_ind = individual.Individual(ind.genome, None)
+    new_ind = remap(ind, first)
 
     return new_ind
 
@@ -108,12 +119,18 @@ def int_flip_per_ind(ind):
         # Linear mutation cannot be performed on this individual.
         return ind
 
+    # The first mutated codon, from which the genome must be re-mapped.
+    first = None
+
     for _ in range(params['MUTATION_EVENTS']):
         idx = randint(0, eff_length - 1)
         ind.genome[idx] = randint(0, params['CODON_SIZE'])
 
+        if first is None or idx < first:
+            first = idx
+
     # Re-build a new individual with the newly mutated genetic information.
-    new_ind = individual.Individual(ind.genome, None)
+    new_ind = remap(ind, first)
 
     return new_ind
 
@@ -145,6 +162,24 @@ def subtree(ind):
         # Pick a node.
         new_tree = choice(targets)
 
+        if isinstance(ind_tree, FlatTree):
+            # The node is an index into a flat tree. Splice a new subtree
+            # into the tree in place of the subtree of the node.
+            if params['MAX_TREE_DEPTH']:
+                # Set the limit to the tree depth.
+                max_depth = params['MAX_TREE_DEPTH'] - \
+                    ind_tree.depths[new_tree]
+
+            else:
+                # There is no limit to tree depth.
+                max_depth = None
+
+            root = params['BNF_GRAMMAR'].symbol_strings[
+                ind_tree.symbols[new_tree]]
+
+            return ind_tree.splice(new_tree, generate_flat_tree(
+                root, "random", max_depth), 0)
+
         # Set the depth limits for the new subtree.
         if params['MAX_TREE_DEPTH']:
             # Set the limit to the tree depth.
@@ -180,6 +215,27 @@ def subtree(ind):
     return ind
 
 
+def remap(ind, first):
+    """
+    Map the genome of an individual after it has been mutated in place.
+    Mapping resumes from the last checkpoint of the individual before the
+    first mutated codon (see algorithm.mapper.get_checkpoint). As the
+    genome of the individual has changed, its checkpoints are replaced by
+    those of the new mapping, so that it can be mutated again.
+
+    :param ind: An individual whose genome has been mutated.
+    :param first: The first mutated codon, or None if no codon was mutated.
+    :return: A new individual, mapped from the mutated genome.
+    """
+
+    new_ind = individual.Individual(ind.genome, None, resume=(ind, first))
+
+    # The individual now maps as the new one.
+    ind.checkpoints = new_ind.checkpoints
+
+    return new_ind
+
+
 def get_effective_length(ind):
     """
     Return the effective length of the genome for linear mutation.
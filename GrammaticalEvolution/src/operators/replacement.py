@@ -4,6 +4,7 @@ from operators.crossover import crossover_inds
 from operators.mutation import mutation
 from operators.selection import selection
 from utilities.algorithm.NSGA2 import compute_pareto_metrics
+from utilities.fitness.semantic_cache import split_semantic_clones
 
 
 def replacement(new_pop, old_pop):
@@ -46,6 +47,37 @@ def generational(new_pop, old_pop):
     return new_pop[:params['POPULATION_SIZE']]
 
 
+def semantic_generational(new_pop, old_pop):
+    """
+    Generational replacement which gives fewer slots to behavioural clones,
+    i.e. individuals which make the same predictions as a fitter individual
+    (see params['SEMANTIC_CACHE']). The ELITE_SIZE best individuals with
+    distinct semantics from the previous population are kept as elites. The
+    new population is then filled with individuals with distinct semantics,
+    best first, and only then with clones.
+
+    :param new_pop: The new population (e.g. after selection, variation, &
+    evaluation).
+    :param old_pop: The previous generation population, from which elites
+    are taken.
+    :return: The 'POPULATION_SIZE' new population with elites.
+    """
+
+    # Sort both populations.
+    old_pop.sort(reverse=True)
+    new_pop.sort(reverse=True)
+
+    # Take the best ELITE_SIZE distinct individuals from the old population.
+    elites = split_semantic_clones(old_pop)[0][:params['ELITE_SIZE']]
+
+    # Put all distinct individuals ahead of all clones, keeping elites first.
+    unique, clones = split_semantic_clones(elites + new_pop)
+
+    # Return the top POPULATION_SIZE individuals of the new pop, including
+    # elites.
+    return (unique + clones)[:params['POPULATION_SIZE']]
+
+
 def steady_state(individuals):
     """
     Runs a single generation of the evolutionary algorithm process,
@@ -1,6 +1,7 @@
 from random import choice, randint, randrange
 
 from algorithm.parameters import params
+from representation.flat_tree import FlatTree, subtree_sizes
 from representation.tree import Tree
 from utilities.representation.check_methods import get_nodes_and_depth, \
     ret_true
@@ -87,6 +88,74 @@ def generate_tree(tree, genome, output, method, nodes, depth, max_depth,
     return genome, output, nodes, depth, max_depth
 
 
+def generate_flat_tree(root, method, depth_limit):
+    """
+    Derive a new flat tree (see representation.flat_tree.FlatTree) from a
+    given non-terminal using a given method. Derives the same tree as
+    generate_tree, but iterates over a stack of unexpanded symbols instead
+    of recursing.
+
+    :param root: The non-terminal at the root of the new tree.
+    :param method: A string of the desired tree derivation method,
+    e.g. "full" or "random".
+    :param depth_limit: The maximum depth the tree can expand to.
+    :return: An instance of the flat tree class.
+    """
+
+    bnf_grammar = params['BNF_GRAMMAR']
+    symbol_ids, symbol_strings = bnf_grammar.symbol_ids, \
+        bnf_grammar.symbol_strings
+    n_NTs, rule_offsets = bnf_grammar.n_NTs, bnf_grammar.rule_offsets
+    rule_sizes, prod_children = bnf_grammar.rule_sizes, \
+        bnf_grammar.prod_children
+
+    symbols, codons, depths, parents = [], [], [], []
+
+    # The unexpanded symbols, each with the index of its parent and its
+    # depth. The leftmost symbol is last.
+    stack = [(symbol_ids[("NT", root)], -1, 1)]
+
+    while stack:
+        # Add the nodes to the tree in preorder.
+        symbol, parent, depth = stack.pop()
+        i = len(symbols)
+
+        symbols.append(symbol)
+        depths.append(depth)
+        parents.append(parent)
+
+        if symbol >= n_NTs:
+            # The symbol is a terminal.
+            codons.append(None)
+            continue
+
+        # Find the productions possible from the current node.
+        productions = bnf_grammar.rules[symbol_strings[symbol]]
+
+        if depth_limit:
+            # Set remaining depth.
+            remaining_depth = depth_limit - depth
+
+        else:
+            remaining_depth = depth_limit
+
+        # Find which productions can be used based on the derivation method.
+        available = legal_productions(method, remaining_depth,
+                                      symbol_strings[symbol],
+                                      productions['choices'])
+
+        # Randomly pick a production choice and make a codon with it.
+        chosen_prod = choice(available)
+        codon = generate_codon(chosen_prod, productions)
+        codons.append(codon)
+
+        production = rule_offsets[symbol] + codon % rule_sizes[symbol]
+        stack.extend([(child, i, depth + 1) for child in
+                      prod_children[production]])
+
+    return FlatTree(symbols, codons, depths, parents, subtree_sizes(parents))
+
+
 def generate_codon(chosen_prod, productions):
     """
     Generate a single codon
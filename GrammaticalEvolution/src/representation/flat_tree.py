@@ -0,0 +1,317 @@
+from algorithm.parameters import params
+
+
+class FlatTree:
+    """
+    A derivation tree stored as parallel lists over its nodes in preorder,
+    as an alternative to the pointer-based representation.tree.Tree. For
+    the node at index i, symbols[i] is the ID of its symbol (see
+    representation.grammar.Grammar.compile_tables), codons[i] is the codon
+    which expanded it (None for terminals and unexpanded non-terminals),
+    depths[i] is its depth (1 for the root), parents[i] is the index of its
+    parent (-1 for the root) and sizes[i] is the number of nodes in its
+    subtree, so that the subtree of node i is the slice [i:i + sizes[i]] of
+    every list.
+
+    Copying a tree slices its lists and subtree crossover and mutation
+    splice slices of lists together, so no operation on a FlatTree recurses
+    and deep trees do not hit the recursion limit.
+    """
+
+    def __init__(self, symbols, codons, depths, parents, sizes):
+        """
+        Initialise an instance of the flat tree class.
+
+        :param symbols: The symbol ID of each node in preorder.
+        :param codons: The codon of each node in preorder.
+        :param depths: The depth of each node in preorder.
+        :param parents: The index of the parent of each node in preorder.
+        :param sizes: The size of the subtree of each node in preorder.
+        """
+
+        self.symbols = symbols
+        self.codons = codons
+        self.depths = depths
+        self.parents = parents
+        self.sizes = sizes
+
+    @staticmethod
+    def from_tree(tree):
+        """
+        Create a flat tree from an instance of the representation.tree.Tree
+        class.
+
+        :param tree: An instance of the representation.tree.Tree class.
+        :return: An instance of the flat tree class.
+        """
+
+        bnf_grammar = params['BNF_GRAMMAR']
+        symbol_ids, non_terminals = bnf_grammar.symbol_ids, \
+            bnf_grammar.non_terminals
+
+        symbols, codons, depths, parents = [], [], [], []
+        stack = [(tree, -1, 1)]
+
+        while stack:
+            # Visit the nodes in preorder.
+            node, parent, depth = stack.pop()
+            index = len(symbols)
+
+            symbols.append(symbol_ids[("NT" if node.root in non_terminals
+                                       else "T", node.root)])
+            codons.append(node.codon)
+            depths.append(depth)
+            parents.append(parent)
+
+            stack.extend([(child, index, depth + 1) for child in
+                          reversed(node.children)])
+
+        return FlatTree(symbols, codons, depths, parents,
+                        subtree_sizes(parents))
+
+    def __str__(self):
+        """
+        Builds a string of the current tree, in the same format as
+        representation.tree.Tree.
+
+        :return: A string of the current tree.
+        """
+
+        symbol_strings = params['BNF_GRAMMAR'].symbol_strings
+        sizes = self.sizes
+
+        result, ends = [], []
+
+        for i, symbol in enumerate(self.symbols):
+            while ends and ends[-1] <= i:
+                # Close the subtrees which end before the current node.
+                result.append(")")
+                ends.pop()
+
+            if i and sizes[i] == 1:
+                # The node has no children.
+                result.append(" " + str(symbol_strings[symbol]))
+
+            else:
+                result.append((" (" if i else "(") +
+                              str(symbol_strings[symbol]))
+                ends.append(i + sizes[i])
+
+        result.append(")" * len(ends))
+
+        return "".join(result)
+
+    def __copy__(self):
+        """
+        Creates a new unique copy of self.
+
+        :return: A new unique copy of self.
+        """
+
+        return FlatTree(self.symbols[:], self.codons[:], self.depths[:],
+                        self.parents[:], self.sizes[:])
+
+    def __eq__(self, other):
+        """
+        Determines if self is equal to another tree, i.e. if both trees
+        have the same structure, symbols and codons.
+
+        :param other: Another instance of the flat tree class with which to
+        compare.
+        :return: Whether or not both trees are equal.
+        """
+
+        return isinstance(other, FlatTree) and \
+            self.symbols == other.symbols and \
+            self.codons == other.codons and self.sizes == other.sizes
+
+    def get_target_nodes(self, array, target=None):
+        """
+        Returns the indexes of all NT nodes which match the target NT list
+        in a given tree.
+
+        :param array: The array of all nodes that match the target.
+        :param target: The target nodes to match.
+        :return: The array of the indexes of all nodes that match the
+        target, in preorder.
+        """
+
+        symbol_ids = params['BNF_GRAMMAR'].symbol_ids
+
+        targets = {symbol_ids[("NT", NT)] for NT in target if ("NT", NT) in
+                   symbol_ids}
+
+        array.extend([i for i, symbol in enumerate(self.symbols) if symbol
+                      in targets])
+
+        return array
+
+    def get_node_labels(self, labels):
+        """
+        Adds the roots of all nodes in the tree to a set.
+
+        :param labels: The set of roots of all nodes in the tree.
+        :return: The set of roots of all nodes in the tree.
+        """
+
+        symbol_strings = params['BNF_GRAMMAR'].symbol_strings
+
+        labels.update([symbol_strings[symbol] for symbol in
+                       set(self.symbols)])
+
+        return labels
+
+    def get_tree_info(self, nt_keys, genome, output):
+        """
+        Iterates over a tree and returns all necessary information on a
+        tree required to generate an individual, as
+        representation.tree.Tree.get_tree_info does. The depths of all
+        nodes are set from their parents.
+
+        :param nt_keys: The list of all non-terminals in the grammar. Only
+        kept for compatibility with representation.tree.Tree, as
+        non-terminals are identified by their symbol IDs.
+        :param genome: The list of all codons in the tree.
+        :param output: The list of all terminal nodes in the tree. This is
+        joined to become the phenotype.
+        :return: genome, output, invalid, max_depth, nodes.
+        """
+
+        bnf_grammar = params['BNF_GRAMMAR']
+        n_NTs, symbol_strings = bnf_grammar.n_NTs, bnf_grammar.symbol_strings
+        symbols, codons, depths, parents, sizes = self.symbols, \
+            self.codons, self.depths, self.parents, self.sizes
+
+        # Find the nodes which have non-terminal children.
+        NT_parents = {parents[i] for i, symbol in enumerate(symbols) if
+                      symbol < n_NTs}
+
+        invalid, max_depth, nodes = False, 0, 0
+
+        for i, symbol in enumerate(symbols):
+            depth = depths[i] = depths[parents[i]] + 1 if i else 1
+
+            if i and sizes[i] == 1:
+                # The node has no children, it is a terminal. Append it to
+                # the phenotype output.
+                output.append(symbol_strings[symbol])
+
+                if symbol < n_NTs:
+                    # Current non-terminal node has no children; invalid
+                    # tree.
+                    invalid = True
+
+                continue
+
+            nodes += 1
+
+            if depth > max_depth:
+                # Set new max tree depth.
+                max_depth = depth
+
+            if codons[i] is not None:
+                # If the current node has a codon, append it to the genome.
+                genome.append(codons[i])
+
+            if i not in NT_parents:
+                # The current node has only terminal children, increment
+                # number of tree nodes. Terminal children increase the
+                # current node depth by one.
+                nodes += 1
+
+                if depth + 1 > max_depth:
+                    # Set new max tree depth.
+                    max_depth = depth + 1
+
+            if symbol < n_NTs and sizes[i] == 1:
+                # The root is a non-terminal with no children. Invalid tree.
+                invalid = True
+
+        return genome, output, invalid, max_depth, nodes
+
+    def splice(self, index, other, other_index):
+        """
+        Create a new tree by replacing the subtree of a node of self with
+        the subtree of a node of another tree. Neither tree is changed.
+
+        :param index: The index of the node of self to be replaced.
+        :param other: An instance of the flat tree class.
+        :param other_index: The index of the node of the other tree whose
+        subtree replaces the subtree at index.
+        :return: A new instance of the flat tree class.
+        """
+
+        end = index + self.sizes[index]
+        other_end = other_index + other.sizes[other_index]
+
+        # The change in the number of nodes, the depth and the index of the
+        # spliced subtree.
+        delta = (other_end - other_index) - (end - index)
+        depth_shift = self.depths[index] - other.depths[other_index]
+        index_shift = index - other_index
+
+        symbols = self.symbols[:index] + \
+            other.symbols[other_index:other_end] + self.symbols[end:]
+        codons = self.codons[:index] + other.codons[other_index:other_end] \
+            + self.codons[end:]
+        sizes = self.sizes[:index] + other.sizes[other_index:other_end] + \
+            self.sizes[end:]
+
+        if depth_shift:
+            depths = self.depths[:index] + \
+                [depth + depth_shift for depth in
+                 other.depths[other_index:other_end]] + self.depths[end:]
+
+        else:
+            depths = self.depths[:index] + \
+                other.depths[other_index:other_end] + self.depths[end:]
+
+        # Nodes after the spliced subtree move by delta, and so do their
+        # parents if they are after the spliced subtree too.
+        parents = self.parents[:index + 1] + \
+            [parent + index_shift for parent in
+             other.parents[other_index + 1:other_end]] + \
+            [parent + delta if parent >= end else parent for parent in
+             self.parents[end:]]
+
+        # The ancestors of the spliced subtree change size by delta.
+        parent = parents[index]
+
+        while parent >= 0:
+            sizes[parent] += delta
+            parent = parents[parent]
+
+        return FlatTree(symbols, codons, depths, parents, sizes)
+
+    def print_tree(self):
+        """
+        Prints out all nodes in the tree, indented according to node depth.
+
+        :return: Nothing.
+        """
+
+        symbol_strings = params['BNF_GRAMMAR'].symbol_strings
+
+        for symbol, depth in zip(self.symbols, self.depths):
+            print(depth, "".join([" " for _ in range(depth)]),
+                  symbol_strings[symbol])
+
+
+def subtree_sizes(parents):
+    """
+    Find the size of the subtree of each node of a tree from the parent of
+    each node in preorder.
+
+    :param parents: The index of the parent of each node in preorder, -1
+    for the root.
+    :return: The number of nodes in the subtree of each node in preorder.
+    """
+
+    sizes = [1] * len(parents)
+
+    for i in range(len(parents) - 1, 0, -1):
+        # Every node is after its parent, so its subtree size is complete
+        # before it is added to its parent.
+        sizes[parents[i]] += sizes[i]
+
+    return sizes
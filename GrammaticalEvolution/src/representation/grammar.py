@@ -46,6 +46,16 @@ class Grammar(object):
         # to speed up the recursion step
         self.recursion_cache = {}
 
+        # Integer tables of the grammar for the genome mapper (see
+        # compile_tables).
+        self.symbol_ids, self.symbol_strings, self.n_NTs = {}, [], 0
+        self.start_id, self.rule_offsets, self.rule_sizes = None, [], []
+        self.prod_offsets, self.prod_symbols = [], []
+        self.prod_arities, self.prod_children, self.prod_rules = [], [], []
+        self.prod_leading, self.prod_rest, self.terminal_runs = [], [], []
+        self.min_codons, self.min_heights = [], []
+        self.prod_codon_deltas, self.prod_heights = [], []
+
         # Read in BNF grammar, set production rules, terminals and
         # non-terminals.
         self.read_bnf_file(file_name)
@@ -64,6 +74,10 @@ class Grammar(object):
         # Enables faster tree operations.
         self.set_grammar_properties()
 
+        # Compile the production rules into integer tables for fast
+        # genome mapping.
+        self.compile_tables()
+
         # Calculate the total number of derivation tree permutations and
         # combinations that can be created by a grammar at a range of depths.
         self.check_permutations()
@@ -649,6 +663,153 @@ class Grammar(object):
                             if conc not in self.concat_NTs[NT]:
                                 self.concat_NTs[NT].append(conc)
 
+    def compile_tables(self):
+        """
+        Compile the production rules of the grammar into flat integer
+        tables, so that genomes can be mapped with integer stacks rather
+        than dicts of strings (see algorithm.mapper.map_ind_from_genome).
+
+        Every symbol is given an integer ID: non-terminals are numbered
+        from 0 to self.n_NTs - 1 in the order of their rules, and terminals
+        from self.n_NTs upwards, so a symbol is a non-terminal if and only
+        if its ID is less than self.n_NTs. self.symbol_strings[ID] is the
+        string of a symbol.
+
+        The productions of all rules are numbered consecutively. Production
+        choice k of the non-terminal with ID n is production
+        self.rule_offsets[n] + k, of self.rule_sizes[n] choices. The symbols
+        of production p are self.prod_symbols[self.prod_offsets[p]:
+        self.prod_offsets[p + 1]], and self.prod_arities[p] is its number
+        of non-terminals. self.prod_children[p] holds the same symbols as a
+        reversed tuple, ready to be pushed onto a stack, and
+        self.prod_rules[p] is the ID of the non-terminal it expands.
+
+        Where the order in which terminals are output does not matter,
+        productions are also split into self.prod_leading[p], the string of
+        the terminals before the first non-terminal (None if there are
+        none), and self.prod_rest[p], a reversed tuple of the remaining
+        non-terminals and runs of consecutive terminals. A run of terminals
+        is given as a negative number -1 - r, where self.terminal_runs[r]
+        is the string of the run.
+
+        Finally, the tables of lower bounds for early invalidity detection
+        are compiled (see compile_bounds).
+
+        :return: Nothing.
+        """
+
+        # Number the non-terminals first, then the terminals.
+        self.symbol_ids = {("NT", NT): i for i, NT in enumerate(self.rules)}
+        self.n_NTs = len(self.symbol_ids)
+
+        for rule in self.rules.values():
+            for choice in rule['choices']:
+                for sym in choice['choice']:
+                    key = (sym["type"], sym["symbol"])
+
+                    if key not in self.symbol_ids:
+                        self.symbol_ids[key] = len(self.symbol_ids)
+
+        self.symbol_strings = [symbol for _, symbol in self.symbol_ids]
+        self.start_id = self.symbol_ids[("NT", self.start_rule["symbol"])]
+
+        self.rule_offsets, self.rule_sizes = [], []
+        self.prod_offsets, self.prod_symbols = [0], []
+        self.prod_arities, self.prod_children, self.prod_rules = [], [], []
+        self.prod_leading, self.prod_rest, self.terminal_runs = [], [], []
+
+        for i, rule in enumerate(self.rules.values()):
+            self.rule_offsets.append(len(self.prod_arities))
+            self.rule_sizes.append(rule['no_choices'])
+            self.prod_rules.extend([i] * rule['no_choices'])
+
+            for choice in rule['choices']:
+                symbols = [self.symbol_ids[(sym["type"], sym["symbol"])] for
+                           sym in choice['choice']]
+
+                self.prod_symbols.extend(symbols)
+                self.prod_offsets.append(len(self.prod_symbols))
+                self.prod_arities.append(sum(sym < self.n_NTs for sym in
+                                             symbols))
+                self.prod_children.append(tuple(reversed(symbols)))
+
+                # Group the symbols into non-terminals and runs of
+                # terminals.
+                items = []
+
+                for sym in symbols:
+                    if sym < self.n_NTs:
+                        items.append(sym)
+
+                    elif items and isinstance(items[-1], str):
+                        items[-1] += self.symbol_strings[sym]
+
+                    else:
+                        items.append(self.symbol_strings[sym])
+
+                if items and isinstance(items[0], str):
+                    self.prod_leading.append(items.pop(0))
+
+                else:
+                    self.prod_leading.append(None)
+
+                for i, item in enumerate(items):
+                    if isinstance(item, str):
+                        if item not in self.terminal_runs:
+                            self.terminal_runs.append(item)
+
+                        items[i] = -1 - self.terminal_runs.index(item)
+
+                self.prod_rest.append(tuple(reversed(items)))
+
+        self.compile_bounds()
+
+    def compile_bounds(self):
+        """
+        Compile lower bounds on what is still needed to finish a derivation,
+        so that the mapper can stop as soon as a genome provably cannot be
+        mapped within MAX_WRAPS and MAX_TREE_DEPTH.
+
+        self.min_codons[n] is the minimum number of codons needed to fully
+        expand the non-terminal with ID n, and self.min_heights[n] the
+        minimum depth of its subtree (its min_steps, see check_depths).
+        Choosing production p changes the minimum number of codons still
+        needed by self.prod_codon_deltas[p] (at most -1, as the codon
+        which chose it is used), and the deepest symbol below the children
+        of production p is at least self.prod_heights[p] levels below
+        them.
+
+        :return: Nothing.
+        """
+
+        n_NTs, offsets, symbols = self.n_NTs, self.prod_offsets, \
+            self.prod_symbols
+        kids = [[sym for sym in symbols[offsets[p]:offsets[p + 1]] if
+                 sym < n_NTs] for p in range(len(self.prod_rules))]
+
+        self.min_heights = [self.non_terminals[NT]['min_steps'] for NT in
+                            self.rules]
+
+        # The minimum number of codons of each non-terminal is one more
+        # than that of its cheapest production; iterate until no bound
+        # can be lowered.
+        self.min_codons, changed = [maxsize] * n_NTs, True
+
+        while changed:
+            changed = False
+
+            for p, rule in enumerate(self.prod_rules):
+                codons = 1 + sum([self.min_codons[NT] for NT in kids[p]])
+
+                if codons < self.min_codons[rule]:
+                    self.min_codons[rule], changed = codons, True
+
+        self.prod_codon_deltas = [
+            sum([self.min_codons[NT] for NT in kids[p]]) -
+            self.min_codons[rule] for p, rule in enumerate(self.prod_rules)]
+        self.prod_heights = [max([self.min_heights[NT] for NT in kids[p]],
+                                 default=0) for p in range(len(kids))]
+
     def __str__(self):
         return "%s %s %s %s" % (self.terminals, self.non_terminals,
                                 self.rules, self.start_rule)
@@ -9,27 +9,34 @@ class Individual(object):
     A GE individual.
     """
 
-    def __init__(self, genome, ind_tree, map_ind=True):
+    def __init__(self, genome, ind_tree, map_ind=True, resume=None):
         """
         Initialise an instance of the individual class (i.e. create a new
         individual).
 
         :param genome: An individual's genome.
         :param ind_tree: An individual's derivation tree, i.e. an instance
-        of the representation.tree.Tree class.
+        of the representation.tree.Tree class or of the
+        representation.flat_tree.FlatTree class.
         :param map_ind: A boolean flag that indicates whether or not an
         individual needs to be mapped.
+        :param resume: Optionally, a (parent, index) pair for a genome which
+        was made by changing the genome of a parent from codon index
+        onwards, so that mapping can resume from a checkpoint of the parent
+        (see algorithm.mapper.get_checkpoint).
         """
 
         if map_ind:
             # The individual needs to be mapped from the given input
             # parameters.
             self.phenotype, self.genome, self.tree, self.nodes, self.invalid, \
-            self.depth, self.used_codons = mapper(genome, ind_tree)
+            self.depth, self.used_codons, self.checkpoints = \
+                mapper(genome, ind_tree, resume)
 
         else:
             # The individual does not need to be mapped.
             self.genome, self.tree = genome, ind_tree
+            self.checkpoints = None
 
         self.fitness = params['FITNESS_FUNCTION'].default_fitness
         self.runtime_error = False
@@ -111,8 +118,13 @@ class Individual(object):
         new_ind.phenotype, new_ind.invalid = self.phenotype, self.invalid
         new_ind.depth, new_ind.nodes = self.depth, self.nodes
         new_ind.used_codons = self.used_codons
+        new_ind.checkpoints = self.checkpoints
         new_ind.runtime_error = self.runtime_error
 
+        if hasattr(self, 'semantics'):
+            # The copy makes the same predictions.
+            new_ind.semantics = self.semantics
+
         return new_ind
 
     def evaluate(self):
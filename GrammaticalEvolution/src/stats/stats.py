@@ -6,6 +6,10 @@ import numpy as np
 from algorithm.parameters import params
 from utilities.algorithm.NSGA2 import compute_pareto_metrics
 from utilities.algorithm.state import create_state
+from utilities.fitness.compile_cache import compile_cache
+from utilities.fitness.semantic_cache import split_semantic_clones
+from utilities.fitness.subexpressions import subexpression_cache
+from utilities.representation.mapping_cache import mapping_cache
 from utilities.stats import trackers
 from utilities.stats.file_io import save_best_ind_to_file, \
     save_first_front_to_file, save_stats_headers, save_stats_to_file
@@ -19,8 +23,27 @@ stats = {
     "regens": 0,
     "invalids": 0,
     "runtime_error": 0,
+    "saved_evals": 0,
+    "persistent_hits": 0,
     "unique_inds": len(trackers.cache),
     "unused_search": 0,
+    "cache_size": 0,
+    "cache_bytes": 0,
+    "cache_hit_rate": 0,
+    "cache_evictions": 0,
+    "semantic_duplicates": 0,
+    "compile_hits": 0,
+    "compile_misses": 0,
+    "subexpression_hits": 0,
+    "subexpression_misses": 0,
+    "mapping_hits": 0,
+    "mapping_misses": 0,
+    "mapping_hit_rate": 0,
+    "constant_lookups": 0,
+    "constant_hits": 0,
+    "constant_hit_rate": 0,
+    "opt_iterations": 0,
+    "ave_opt_iterations": 0,
     "ave_genome_length": 0,
     "max_genome_length": 0,
     "min_genome_length": 0,
@@ -119,9 +142,19 @@ def get_soo_stats(individuals, end):
         # Save training fitness.
         trackers.best_ever.training_fitness = copy(trackers.best_ever.fitness)
 
-        # Evaluate test fitness.
-        trackers.best_ever.test_fitness = params['FITNESS_FUNCTION'](
-            trackers.best_ever, dist='test')
+        if trackers.best_ever.phenotype in trackers.test_cache:
+            # Reuse the test fitness and predictions found during the run.
+            test_fitness, eval_test = trackers.test_cache[
+                trackers.best_ever.phenotype]
+            trackers.best_ever.test_fitness = test_fitness
+
+            if eval_test is not None:
+                trackers.best_ever.eval_test = eval_test
+
+        else:
+            # Evaluate test fitness.
+            trackers.best_ever.test_fitness = params['FITNESS_FUNCTION'](
+                trackers.best_ever, dist='test')
 
         # Set main fitness as training fitness.
         trackers.best_ever.fitness = trackers.best_ever.training_fitness
@@ -297,9 +330,39 @@ def update_stats(individuals, end):
     stats['total_inds'] = params['POPULATION_SIZE'] * (stats['gen'] + 1)
     stats['runtime_error'] = len(trackers.runtime_error_cache)
     if params['CACHE']:
-        stats['unique_inds'] = len(trackers.cache)
+        # Count every phenotype added to the cache, including those which
+        # have since been evicted.
+        stats['unique_inds'] = trackers.cache.added
         stats['unused_search'] = 100 - stats['unique_inds'] / \
                                  stats['total_inds'] * 100
+        stats['cache_size'] = len(trackers.cache)
+        stats['cache_bytes'] = trackers.cache.bytes
+        stats['cache_hit_rate'] = trackers.cache.hit_rate()
+        stats['cache_evictions'] = trackers.cache.evictions
+    if params['SEMANTIC_CACHE']:
+        # Count the behavioural clones in the population.
+        stats['semantic_duplicates'] = len(split_semantic_clones(
+            individuals)[1])
+    if params['COMPILE_CACHE_SIZE']:
+        stats['compile_hits'] = compile_cache.hits
+        stats['compile_misses'] = compile_cache.misses
+    if params['SUBEXPRESSION_CACHE_SIZE']:
+        stats['subexpression_hits'] = subexpression_cache.hits
+        stats['subexpression_misses'] = subexpression_cache.misses
+    if params['MAPPING_CACHE_SIZE']:
+        stats['mapping_hits'] = mapping_cache.hits
+        stats['mapping_misses'] = mapping_cache.misses
+        stats['mapping_hit_rate'] = mapping_cache.hit_rate()
+    if params['OPTIMIZE_CONSTANTS'] and not end:
+        # Constant optimisation in this generation alone.
+        totals = [stats['constant_lookups'], stats['constant_hits'],
+                  stats['opt_iterations']]
+        lookups, hits, iterations = [total - previous for total, previous in
+                                     zip(totals, trackers.constant_totals)]
+        trackers.constant_totals = totals
+        stats['constant_hit_rate'] = hits / lookups if lookups else 0
+        stats['ave_opt_iterations'] = iterations / (lookups - hits) if \
+            lookups > hits else 0
 
     # Genome Stats
     genome_lengths = [len(i.genome) for i in individuals]
@@ -188,6 +188,29 @@ def parse_cmd_args(arguments):
                         help='Sets the maximum number of times the genome '
                              'mapping process can wrap over the length of the '
                              'genome. Requires int value.')
+    parser.add_argument('--checkpoint_interval',
+                        dest='CHECKPOINT_INTERVAL',
+                        type=int,
+                        help='Sets the number of codons between checkpoints '
+                             'of the genome mapping, from which the '
+                             'children of linear variation operators resume '
+                             'mapping. Requires int value. 0 disables '
+                             'checkpoints.')
+    parser.add_argument('--mapping_cache_size',
+                        dest='MAPPING_CACHE_SIZE',
+                        type=int,
+                        help='Sets the maximum number of genome mappings '
+                             'kept in the mapping cache, keyed by the '
+                             'production choices of the used codons. '
+                             'Requires int value. 0 disables the mapping '
+                             'cache.')
+    parser.add_argument('--flat_trees',
+                        dest='FLAT_TREES',
+                        action='store_true',
+                        default=None,
+                        help='Stores derivation trees as flat arrays in '
+                             'preorder rather than as linked nodes when '
+                             'subtree operators are used. Default False.')
     parser.add_argument('--permutation_ramps',
                         dest='PERMUTATION_RAMPS',
                         type=int,
@@ -336,6 +359,28 @@ def parse_cmd_args(arguments):
                         help='Sets the error metric to be used with supervised'
                              ' learning problems. Requires string such as '
                              '"mse" or "rmse".')
+    parser.add_argument('--test_evaluation',
+                        dest='TEST_EVALUATION',
+                        type=str,
+                        help='Sets when the best individual is evaluated on '
+                             'the test set during a run: "change" (whenever '
+                             'the best individual changes), "step" (every '
+                             'TEST_EVALUATION_STEP generations) or "end". '
+                             'Requires string.')
+    parser.add_argument('--test_evaluation_step',
+                        dest='TEST_EVALUATION_STEP',
+                        type=int,
+                        help='Sets the number of generations between test '
+                             'set evaluations with "--test_evaluation '
+                             'step". Requires int.')
+    parser.add_argument('--linear_scaling',
+                        dest='LINEAR_SCALING',
+                        action='store_true',
+                        default=None,
+                        help='Scales the output of each individual by the '
+                             'least-squares offset and scale before '
+                             'applying the error metric in regression '
+                             'problems.')
     parser.add_argument('--optimize_constants',
                         dest='OPTIMIZE_CONSTANTS',
                         action='store_true',
@@ -344,6 +389,26 @@ def parse_cmd_args(arguments):
                              'gradient descent in supervised learning '
                              'problems. Requires True or False, default '
                              'False.')
+    parser.add_argument('--no_analytic_gradients',
+                        dest='ANALYTIC_GRADIENTS',
+                        action='store_false',
+                        default=None,
+                        help='Estimates gradients by finite differences '
+                             'when optimizing constants, rather than '
+                             'differentiating phenotypes.')
+    parser.add_argument('--constant_cache_size',
+                        dest='CONSTANT_CACHE_SIZE',
+                        type=int,
+                        help='Sets the maximum number of skeletons whose '
+                             'optimized constants are cached. Requires '
+                             'int. 0 disables the constant cache.')
+    parser.add_argument('--no_warm_start_constants',
+                        dest='WARM_START_CONSTANTS',
+                        action='store_false',
+                        default=None,
+                        help='Starts optimizing the constants of every '
+                             'individual from 0, rather than from the '
+                             'constants of its parents.')
     parser.add_argument('--multicore',
                         dest='MULTICORE',
                         action='store_true',
@@ -354,6 +419,13 @@ def parse_cmd_args(arguments):
                         type=int,
                         help='Specify the number of cores to be used for '
                              'multi-core evaluation. Requires int.')
+    parser.add_argument('--multicore_chunk_size',
+                        dest='MULTICORE_CHUNK_SIZE',
+                        type=int,
+                        help='Specify the number of unique phenotypes sent '
+                             'to a worker in a single multi-core task. '
+                             'Requires int. Default splits each generation '
+                             'into about four tasks per core.')
 
     # REPLACEMENT
     parser.add_argument('--replacement',
@@ -421,6 +493,18 @@ def parse_cmd_args(arguments):
                         default=None,
                         help='Prevents any output from being printed to the '
                              'command line.')
+    parser.add_argument('--log_level',
+                        dest='LOG_LEVEL',
+                        type=str,
+                        help='Sets the log level of all modules, requires '
+                             'string such as "DEBUG" or "WARNING".')
+    parser.add_argument('--log_modules',
+                        dest='LOG_MODULES',
+                        type=str,
+                        help='Sets the log level of individual modules, '
+                             'requires a string of space separated '
+                             'module:LEVEL pairs such as '
+                             '"fitness.supervised_learning:DEBUG".')
     parser.add_argument('--save_all',
                         dest='SAVE_ALL',
                         action='store_true',
@@ -555,6 +639,61 @@ def parse_cmd_args(arguments):
                                MUTATE_DUPLICATES=True,
                                help='Replaces duplicate individuals with '
                                     'mutated versions. Uses cache.')
+    parser.add_argument("--cache_size",
+                        dest='CACHE_SIZE',
+                        type=int,
+                        help='Sets the maximum number of entries in the '
+                             'cache. Requires int. Default is no limit.')
+    parser.add_argument("--cache_memory",
+                        dest='CACHE_MEMORY',
+                        type=int,
+                        help='Sets the maximum approximate memory used by '
+                             'the cache in bytes. Requires int. Default is '
+                             'no limit.')
+    parser.add_argument("--cache_eviction",
+                        dest='CACHE_EVICTION',
+                        type=str,
+                        help='Sets the policy used to evict entries when '
+                             'the cache is full. Requires string: "lru", '
+                             '"lfu" or "age".')
+    parser.add_argument("--subexpression_cache_size",
+                        dest='SUBEXPRESSION_CACHE_SIZE',
+                        type=int,
+                        help='Sets the maximum number of subexpression '
+                             'values kept by column evaluation. Requires '
+                             'int. 0 disables sharing subexpressions.')
+    parser.add_argument("--no_packed_evaluation",
+                        dest='PACKED_EVALUATION',
+                        action='store_false',
+                        default=None,
+                        help='Evaluates rule classifier phenotypes over '
+                             'dataset columns rather than as packed '
+                             'bitsets.')
+    parser.add_argument("--no_batch_evaluation",
+                        dest='BATCH_EVALUATION',
+                        action='store_false',
+                        default=None,
+                        help='Evaluates the unique phenotypes of each '
+                             'generation one at a time rather than as a '
+                             'batch.')
+    parser.add_argument("--semantic_cache",
+                        dest='SEMANTIC_CACHE',
+                        action='store_true',
+                        default=None,
+                        help='Caches training fitness by the predictions '
+                             'of individuals in supervised learning '
+                             'problems.')
+    parser.add_argument("--semantic_cache_size",
+                        dest='SEMANTIC_CACHE_SIZE',
+                        type=int,
+                        help='Sets the maximum number of entries in the '
+                             'semantic cache. Requires int.')
+    parser.add_argument("--persistent_cache",
+                        dest='PERSISTENT_CACHE',
+                        type=str,
+                        help='Sets the file name of an SQLite database used '
+                             'to save fitnesses and share them across '
+                             'runs. Requires string.')
 
     # Parse command line arguments using all above information.
     args, unknown = parser.parse_known_args(arguments)
@@ -280,14 +280,19 @@ def return_attr_from_module(module_name, attr_name):
 def pool_init(params_):
     """
     When initialising the pool the original params dict (params_) is passed in
-    and used to update the newly created instance of params, as Windows does
-    not retain the system memory of the parent process.
+    and used to update the newly created instance of params, as workers which
+    are not forked (e.g. on Windows and macOS) do not retain the system memory
+    of the parent process. Datasets in params_ (e.g. those of the fitness
+    function) attach shared data by name when unpickled, rather than each
+    worker receiving its own copy.
 
     :param params_: original params dict
     :return: Nothing.
     """
 
-    from platform import system
+    from multiprocessing import get_start_method
+    from utilities.stats.logger import set_log_levels
 
-    if system() == 'Windows':
+    if get_start_method() != 'fork':
         params.update(params_)
+        set_log_levels()
@@ -0,0 +1,238 @@
+import ast
+
+import numpy as np
+from utilities.fitness import math_functions
+from utilities.fitness.compile_cache import compile_cache
+from utilities.fitness.subexpressions import evaluate_dag, get_dag
+
+
+def as_truth(value):
+    """
+    Return the element-wise truth value of a column (or scalar) as a
+    boolean numpy array. This is the vectorised equivalent of calling
+    bool() on every row.
+
+    :param value: A numpy array or scalar.
+    :return: A boolean numpy array (or numpy bool for scalar input).
+    """
+
+    return np.asarray(value, dtype=bool)
+
+
+phenotype_globals = {name: value for name, value in
+                     vars(math_functions).items() if not
+                     name.startswith("_")}
+phenotype_globals["as_truth"] = as_truth
+# The globals in which phenotypes are evaluated over dataset columns: the
+# protected operators of utilities.fitness.math_functions (e.g. psqrt, aq),
+# numpy as np and as_truth.
+
+
+class BitwiseTransformer(ast.NodeTransformer):
+    """
+    Rewrites the abstract syntax tree of a boolean classifier phenotype so
+    that it can be evaluated over entire dataset columns at once:
+
+        a and b     ->  as_truth(a) & as_truth(b)
+        a or b      ->  as_truth(a) | as_truth(b)
+        not a       ->  ~as_truth(a)
+        a < b < c   ->  (a < b) & (b < c)
+
+    Since the rewrite happens on the parsed tree rather than on the
+    phenotype string, operator precedence is preserved exactly (a simple
+    string replacement of "AND" by "&" would not be, as & binds tighter
+    than comparisons in Python).
+    """
+
+    @staticmethod
+    def truth(node):
+        return ast.Call(func=ast.Name(id="as_truth", ctx=ast.Load()),
+                        args=[node], keywords=[])
+
+    def visit_BoolOp(self, node):
+        self.generic_visit(node)
+
+        op = ast.BitAnd() if isinstance(node.op, ast.And) else ast.BitOr()
+
+        # Fold the operands left to right, as Python does.
+        result = self.truth(node.values[0])
+        for value in node.values[1:]:
+            result = ast.BinOp(left=result, op=op, right=self.truth(value))
+
+        return result
+
+    def visit_UnaryOp(self, node):
+        self.generic_visit(node)
+
+        if isinstance(node.op, ast.Not):
+            return ast.UnaryOp(op=ast.Invert(), operand=self.truth(
+                node.operand))
+
+        return node
+
+    def visit_Compare(self, node):
+        self.generic_visit(node)
+
+        if len(node.ops) == 1:
+            return node
+
+        # Split chained comparisons into pairwise comparisons.
+        left, pairs = node.left, []
+        for op, right in zip(node.ops, node.comparators):
+            pairs.append(ast.Compare(left=left, ops=[op],
+                                     comparators=[right]))
+            left = right
+
+        result = pairs[0]
+        for pair in pairs[1:]:
+            result = ast.BinOp(left=result, op=ast.BitAnd(), right=pair)
+
+        return result
+
+
+def boolean_phenotype(phenotype):
+    """
+    Convert the AND/OR/NOT keywords used by classifier grammars into their
+    Python equivalents.
+
+    :param phenotype: The phenotype string of an individual.
+    :return: A phenotype string which is valid Python.
+    """
+
+    return phenotype.replace("AND", "and").replace("OR", "or").replace(
+        "NOT", "not")
+
+
+def compile_boolean_phenotype(phenotype):
+    """
+    Compile a boolean classifier phenotype into a code object which
+    evaluates the phenotype over whole dataset columns in a single call.
+    Code objects are kept in the compile cache, so each phenotype is only
+    parsed and compiled once.
+
+    :param phenotype: The phenotype string of an individual.
+    :return: A code object to be evaluated with the columns of a dataset
+    bound by feature name (see bind_columns).
+    """
+
+    return compile_cache.get(("columns", phenotype), lambda: compile(
+        parse_boolean_phenotype(phenotype), "<phenotype>", "eval"))
+
+
+def parse_boolean_phenotype(phenotype):
+    """
+    Parse a boolean classifier phenotype and rewrite it for evaluation over
+    whole dataset columns (see BitwiseTransformer).
+
+    :param phenotype: The phenotype string of an individual.
+    :return: An ast.Expression.
+    """
+
+    tree = ast.parse(boolean_phenotype(phenotype).strip(), mode="eval")
+
+    return ast.fix_missing_locations(BitwiseTransformer().visit(tree))
+
+
+def bind_columns(x, feature_names):
+    """
+    Build the namespace in which compiled phenotypes are evaluated. Each
+    feature name is bound to the matching column of the dataset, and x is
+    bound to the whole input array, for grammars which index columns as
+    x[:, i].
+
+    :param x: A 2D numpy array of input data (one row per example).
+    :param feature_names: The names of the columns of x.
+    :return: A dict of feature names to dataset columns.
+    """
+
+    # Columns of a row-major array are strided; a contiguous copy of each
+    # column is made once so that every comparison runs over contiguous
+    # memory. Column-major data (e.g. cached datasets) is not copied.
+    columns = np.ascontiguousarray(np.transpose(x))
+
+    namespace = {name: columns[j] for j, name in enumerate(feature_names)}
+
+    # A feature named x takes precedence over the input array.
+    namespace.setdefault("x", x)
+
+    return namespace
+
+
+def evaluate_columns(code, columns, n_rows):
+    """
+    Evaluate a compiled boolean phenotype over a full dataset.
+
+    :param code: A code object returned by compile_boolean_phenotype.
+    :param columns: A dict of feature names to dataset columns, as
+    returned by bind_columns.
+    :param n_rows: The number of rows in the dataset.
+    :return: A numpy array of 0/1 integer predictions, one per row.
+    """
+
+    return as_predictions(eval(code, phenotype_globals, columns), n_rows)
+
+
+def evaluate_columns_shared(phenotype, columns, n_rows, dataset):
+    """
+    Evaluate a boolean phenotype over a full dataset as an expression DAG,
+    so that subexpressions shared with other individuals (e.g. the same
+    threshold condition) are computed only once per dataset. Gives the same
+    predictions as evaluate_columns.
+
+    :param phenotype: The phenotype string of an individual.
+    :param columns: A dict of feature names to dataset columns, as
+    returned by bind_columns.
+    :param n_rows: The number of rows in the dataset.
+    :param dataset: A name which identifies the dataset, e.g. its file name.
+    :return: A numpy array of 0/1 integer predictions, one per row.
+    """
+
+    dag = get_dag(phenotype, lambda: parse_boolean_phenotype(phenotype))
+
+    return as_predictions(evaluate_dag(dag, (phenotype_globals, columns),
+                                       dataset), n_rows)
+
+
+def evaluate_expression(phenotype, columns, dataset):
+    """
+    Evaluate a numeric phenotype (e.g. "psqrt(x[:, 0]) + x[:, 1]") over a
+    full dataset as an expression DAG, so that subexpressions shared with
+    other individuals are computed only once per dataset. Gives the same
+    values as evaluating the phenotype with eval.
+
+    :param phenotype: The phenotype string of an individual.
+    :param columns: A dict of feature names to dataset columns, as
+    returned by bind_columns.
+    :param dataset: A name which identifies the dataset, e.g. its file name.
+    :return: The value of the phenotype, e.g. a numpy array with one value
+    per row.
+    """
+
+    dag = get_dag(phenotype, lambda: ast.parse(phenotype.strip(),
+                                               mode="eval"), "numeric dag")
+
+    return evaluate_dag(dag, (phenotype_globals, columns), dataset)
+
+
+def as_predictions(result, n_rows):
+    """
+    Convert the value of a boolean phenotype over a full dataset into
+    predictions.
+
+    :param result: The value of the phenotype.
+    :param n_rows: The number of rows in the dataset.
+    :return: A numpy array of 0/1 integer predictions, one per row.
+    """
+
+    if np.ndim(result) == 0:
+        # The phenotype does not depend on any column, i.e. it is a
+        # constant.
+        return np.full(n_rows, int(bool(result)))
+
+    result = as_truth(result)
+
+    if result.shape != (n_rows,):
+        raise ValueError("Column evaluation produced shape %s, expected "
+                         "(%d,)." % (str(result.shape), n_rows))
+
+    return result.astype(int)
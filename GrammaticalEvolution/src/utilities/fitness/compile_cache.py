@@ -0,0 +1,40 @@
+from utilities.fitness.lru_cache import LRUCache
+
+
+class CompileCache(LRUCache):
+    """
+    A least-recently-used cache of compiled phenotypes (see
+    utilities.fitness.lru_cache.LRUCache). Keys identify both the phenotype
+    string and the way it was compiled, values are the resulting code
+    objects (or other structures parsed from phenotypes, e.g. expression
+    DAGs). The maximum number of entries is set by
+    params['COMPILE_CACHE_SIZE'].
+
+    Code objects cannot be pickled, so the cache is deliberately kept out
+    of utilities.stats.trackers (which is saved with the state of a run).
+    """
+
+    def __init__(self):
+        """
+        Initialise an empty compile cache.
+        """
+
+        super().__init__('COMPILE_CACHE_SIZE')
+
+
+compile_cache = CompileCache()
+# The compile cache shared by all fitness functions in this process.
+
+
+def compile_phenotype(phenotype):
+    """
+    Compile a phenotype string as a Python expression, re-using the code
+    object from the compile cache if the same phenotype has been compiled
+    before. The returned code object can be passed straight to eval().
+
+    :param phenotype: A phenotype string (or any Python expression).
+    :return: A code object.
+    """
+
+    return compile_cache.get(("eval", phenotype), lambda: compile(
+        phenotype, "<phenotype>", "eval"))
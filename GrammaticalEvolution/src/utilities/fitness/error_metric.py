@@ -1,55 +1,103 @@
-import warnings
-
 import numpy as np
-from sklearn.metrics import f1_score as sklearn_f1_score
 
 
 def mae(y, yhat):
     """
     Calculate mean absolute error between inputs.
 
+    :param y: The expected input (i.e. from dataset).
+    :param yhat: The given input (i.e. from phenotype), or a 2D population
+    x samples matrix of the inputs of many individuals.
+    :return: The mean absolute error, or one per row of yhat.
+    """
+
+    return np.mean(np.abs(y - yhat), axis=-1)
+
+
+def mae_gradient(y, yhat):
+    """
+    The gradient of mae with respect to yhat, e.g. for optimising
+    constants.
+
     :param y: The expected input (i.e. from dataset).
     :param yhat: The given input (i.e. from phenotype).
-    :return: The mean absolute error.
+    :return: The gradient, one entry per sample.
     """
 
-    return np.mean(np.abs(y - yhat))
+    return np.sign(yhat - y) / len(y)
 
 
 # Set maximise attribute for mae error metric.
 mae.maximise = False
+mae.gradient = mae_gradient
 
 
 def rmse(y, yhat):
     """
     Calculate root mean square error between inputs.
 
+    :param y: The expected input (i.e. from dataset).
+    :param yhat: The given input (i.e. from phenotype), or a 2D population
+    x samples matrix of the inputs of many individuals.
+    :return: The root mean square error, or one per row of yhat.
+    """
+
+    return np.sqrt(np.mean(np.square(y - yhat), axis=-1))
+
+
+def rmse_gradient(y, yhat):
+    """
+    The gradient of rmse with respect to yhat, e.g. for optimising
+    constants.
+
     :param y: The expected input (i.e. from dataset).
     :param yhat: The given input (i.e. from phenotype).
-    :return: The root mean square error.
+    :return: The gradient, one entry per sample.
     """
 
-    return np.sqrt(np.mean(np.square(y - yhat)))
+    error = rmse(y, yhat)
+
+    if error == 0:
+        # At the minimum.
+        return np.zeros(len(y))
+
+    return (yhat - y) / (len(y) * error)
 
 
 # Set maximise attribute for rmse error metric.
 rmse.maximise = False
+rmse.gradient = rmse_gradient
 
 
 def mse(y, yhat):
     """
     Calculate mean square error between inputs.
 
+    :param y: The expected input (i.e. from dataset).
+    :param yhat: The given input (i.e. from phenotype), or a 2D population
+    x samples matrix of the inputs of many individuals.
+    :return: The mean square error, or one per row of yhat.
+    """
+
+    return np.mean(np.square(y - yhat), axis=-1)
+
+
+def mse_gradient(y, yhat):
+    """
+    The gradient of mse with respect to yhat, e.g. for optimising
+    constants.
+
     :param y: The expected input (i.e. from dataset).
     :param yhat: The given input (i.e. from phenotype).
-    :return: The mean square error.
+    :return: The gradient, one entry per sample.
     """
 
-    return np.mean(np.square(y - yhat))
+    return 2 * (yhat - y) / len(y)
 
 
 # Set maximise attribute for mse error metric.
 mse.maximise = False
+mse.gradient = mse_gradient
 
 
 def hinge(y, yhat):
@@ -59,15 +107,17 @@ def hinge(y, yhat):
     ie a real value. The classifier will use sign(yhat) as its prediction.
 
     :param y: The expected input (i.e. from dataset).
-    :param yhat: The given input (i.e. from phenotype).
-    :return: The hinge loss.
+    :param yhat: The given input (i.e. from phenotype), or a 2D population
+    x samples matrix of the inputs of many individuals.
+    :return: The hinge loss, or one per row of yhat.
     """
 
     # Deal with possibility of {-1, 1} or {0, 1} class label convention
     y_vals = set(y)
-    # convert from {0, 1} to {-1, 1}
+    # convert from {0, 1} to {-1, 1}. Don't convert in place, y may be a
+    # read-only (memory-mapped) dataset column.
     if 0 in y_vals:
-        y[y == 0] = -1
+        y = np.where(y == 0, -1, y)
 
     # Our definition of hinge loss cannot be used for multi-class
     assert len(y_vals) == 2
@@ -75,7 +125,7 @@ def hinge(y, yhat):
     # NB not np.max. maximum does element-wise max.  Also we use the
     # mean hinge loss rather than sum so that the result doesn't
     # depend on the size of the dataset.
-    return np.mean(np.maximum(0, 1 - y * yhat))
+    return np.mean(np.maximum(0, 1 - y * yhat), axis=-1)
 
 
 # Set maximise attribute for hinge error metric.
@@ -86,54 +136,244 @@ def f1_score(y, yhat):
     """
     The F_1 score is a metric for classification which tries to balance
     precision and recall, ie both true positives and true negatives.
-    For F_1 score higher is better.
+    For F_1 score higher is better. As sklearn's f1_score with
+    average="weighted", the scores of both classes are averaged, weighted
+    by their support.
 
     :param y: The expected input (i.e. from dataset).
-    :param yhat: The given input (i.e. from phenotype).
+    :param yhat: The given input (i.e. from phenotype), or a 2D population
+    x samples matrix of the inputs of many individuals.
+    :return: The f1 score, or a 1D array of scores, one per row of yhat.
+    """
+
+    return f1_score_from_counts(*confusion_counts(y, yhat))
+
+
+def f1_score_from_counts(tp, fp, fn, tn):
+    """
+    Calculate the weighted F_1 score, as f1_score, from the confusion
+    counts of a binary classifier rather than from y and yhat, e.g. for
+    packed evaluation (see utilities.fitness.predicate_bits).
+
+    :param tp: The number of true positives.
+    :param fp: The number of false positives.
+    :param fn: The number of false negatives.
+    :param tn: The number of true negatives.
     :return: The f1 score.
     """
 
+    tp_sum, true_sum, pred_sum = class_counts(tp, fp, fn, tn)
+
+    return weighted_average(2 * tp_sum, true_sum + pred_sum, true_sum)
+
+
+# Set maximise attribute for f1_score error metric.
+f1_score.maximise = True
+f1_score.from_counts = f1_score_from_counts
+
+
+def precision(y, yhat):
+    """
+    The precision of a binary classifier, i.e. the fraction of predictions
+    of a class which are correct, averaged over both classes weighted by
+    their support (as sklearn's precision_score with average="weighted").
+    For precision higher is better.
+
+    :param y: The expected input (i.e. from dataset).
+    :param yhat: The given input (i.e. from phenotype), or a 2D population
+    x samples matrix of the inputs of many individuals.
+    :return: The precision, or a 1D array of precisions, one per row of
+    yhat.
+    """
+
+    return precision_from_counts(*confusion_counts(y, yhat))
+
+
+def precision_from_counts(tp, fp, fn, tn):
+    """
+    Calculate the weighted precision, as precision, from the confusion
+    counts of a binary classifier.
+
+    :param tp: The number of true positives.
+    :param fp: The number of false positives.
+    :param fn: The number of false negatives.
+    :param tn: The number of true negatives.
+    :return: The precision.
+    """
+
+    tp_sum, true_sum, pred_sum = class_counts(tp, fp, fn, tn)
+
+    return weighted_average(tp_sum, pred_sum, true_sum)
+
+
+# Set maximise attribute for precision error metric.
+precision.maximise = True
+precision.from_counts = precision_from_counts
+
+
+def recall(y, yhat):
+    """
+    The recall of a binary classifier, i.e. the fraction of each class
+    which is predicted correctly, averaged over both classes weighted by
+    their support (as sklearn's recall_score with average="weighted").
+    For recall higher is better.
+
+    :param y: The expected input (i.e. from dataset).
+    :param yhat: The given input (i.e. from phenotype), or a 2D population
+    x samples matrix of the inputs of many individuals.
+    :return: The recall, or a 1D array of recalls, one per row of yhat.
+    """
+
+    return recall_from_counts(*confusion_counts(y, yhat))
+
+
+def recall_from_counts(tp, fp, fn, tn):
+    """
+    Calculate the weighted recall, as recall, from the confusion counts of
+    a binary classifier.
+
+    :param tp: The number of true positives.
+    :param fp: The number of false positives.
+    :param fn: The number of false negatives.
+    :param tn: The number of true negatives.
+    :return: The recall.
+    """
+
+    tp_sum, true_sum, pred_sum = class_counts(tp, fp, fn, tn)
+
+    return weighted_average(tp_sum, true_sum, true_sum)
+
+
+# Set maximise attribute for recall error metric.
+recall.maximise = True
+recall.from_counts = recall_from_counts
+
+
+def accuracy(y, yhat):
+    """
+    The accuracy of a binary classifier, i.e. the fraction of correct
+    predictions. For accuracy higher is better.
+
+    :param y: The expected input (i.e. from dataset).
+    :param yhat: The given input (i.e. from phenotype), or a 2D population
+    x samples matrix of the inputs of many individuals.
+    :return: The accuracy, or a 1D array of accuracies, one per row of
+    yhat.
+    """
+
+    return accuracy_from_counts(*confusion_counts(y, yhat))
+
+
+def accuracy_from_counts(tp, fp, fn, tn):
+    """
+    Calculate the accuracy, as accuracy, from the confusion counts of a
+    binary classifier.
+
+    :param tp: The number of true positives.
+    :param fp: The number of false positives.
+    :param fn: The number of false negatives.
+    :param tn: The number of true negatives.
+    :return: The accuracy.
+    """
+
+    score = np.divide(tp + tn, tp + fp + fn + tn, dtype=float)
+
+    return score if np.ndim(score) else float(score)
+
+
+# Set maximise attribute for accuracy error metric.
+accuracy.maximise = True
+accuracy.from_counts = accuracy_from_counts
+
+
+def confusion_counts(y, yhat):
+    """
+    Count the true/false positives/negatives of a binary classifier.
+
+    :param y: The expected input (i.e. from dataset), with {0, 1} or
+    {-1, 1} class labels. 1 is the positive class.
+    :param yhat: The given input (i.e. from phenotype), thresholded at 0,
+    or a 2D population x samples matrix of the inputs of many individuals.
+    :return: The numbers of true positives, false positives, false
+    negatives and true negatives, or 1D arrays of them, one per row of
+    yhat.
+    """
+
     # if phen is a constant, eg 0.001 (doesn't refer to x), then yhat
-    # will be a constant. that will break f1_score. so convert to a
-    # constant array.
-    if not isinstance(yhat, np.ndarray) or len(yhat.shape) < 1:
-        yhat = np.ones_like(y) * yhat
+    # will be a constant. so convert to a constant array.
+    if np.ndim(yhat) == 0:
+        yhat = np.full(len(y), yhat)
 
     # Deal with possibility of {-1, 1} or {0, 1} class label
     # convention.  FIXME: would it be better to canonicalise the
     # convention elsewhere and/or create user parameter to control it?
     # See https://github.com/PonyGE/PonyGE2/issues/113.
-    y_vals = set(y)
-    # convert from {-1, 1} to {0, 1}
-    if -1 in y_vals:
-        y[y == -1] = 0
+    y_vals = np.unique(y)
 
     # We binarize with a threshold, so this cannot be used for multi-class
-    assert len(y_vals) == 2
+    assert len(y_vals) == 2 and set(y_vals.tolist()) <= {-1, 0, 1}
+
+    positive = (y == 1)
 
     # convert real values to boolean {0, 1} with a zero threshold
     yhat = (yhat > 0)
 
-    with warnings.catch_warnings():
-        # if we predict the same value for all samples (trivial
-        # individuals will do so as described above) then f-score is
-        # undefined, and sklearn will give a runtime warning and
-        # return 0. We can ignore that warning and happily return 0.
-        warnings.simplefilter("ignore")
-        return sklearn_f1_score(y, yhat, average="weighted")
+    tp = np.count_nonzero(yhat & positive, axis=-1)
+    fp = np.count_nonzero(yhat, axis=-1) - tp
+    fn = np.count_nonzero(positive) - tp
+    tn = len(positive) - tp - fp - fn
 
+    return tp, fp, fn, tn
 
-# Set maximise attribute for f1_score error metric.
-f1_score.maximise = True
+
+def class_counts(tp, fp, fn, tn):
+    """
+    Convert binary confusion counts into per class counts, for classes 0
+    and 1.
+
+    :param tp: The number of true positives.
+    :param fp: The number of false positives.
+    :param fn: The number of false negatives.
+    :param tn: The number of true negatives.
+    :return: The true positives, support (true count) and predicted count
+    of each class, as float arrays with classes along the first axis.
+    """
+
+    tp_sum = np.array([tn, tp], dtype=float)
+    true_sum = np.array([tn + fp, tp + fn], dtype=float)
+    pred_sum = np.array([tn + fn, tp + fp], dtype=float)
+
+    return tp_sum, true_sum, pred_sum
+
+
+def weighted_average(numerator, denominator, weights):
+    """
+    Average a per class ratio over classes, as sklearn's average="weighted".
+
+    :param numerator: The numerators of the ratio, classes along the first
+    axis.
+    :param denominator: The denominators of the ratio. As sklearn, the
+    ratio of a class is 0 if its denominator is 0.
+    :param weights: The weight (support) of each class.
+    :return: The weighted average, or a 1D array of them.
+    """
+
+    ratio = np.divide(numerator, denominator,
+                      out=np.zeros_like(numerator), where=denominator != 0)
+
+    score = np.average(ratio, axis=0, weights=weights)
+
+    return score if np.ndim(score) else float(score)
 
 
 def Hamming_error(y, yhat):
     """
     The number of mismatches between y and yhat. Suitable
     for Boolean problems and if-else classifier problems.
-    Assumes both y and yhat are binary or integer-valued.
+    Assumes both y and yhat are binary or integer-valued. yhat may be a 2D
+    population x samples matrix, with one error per row.
     """
-    return np.sum(y != yhat)
+    return np.sum(y != yhat, axis=-1)
 
 
 Hamming_error.maximise = False
@@ -1,80 +1,449 @@
-from os import path
+from glob import escape, glob
+from hashlib import sha1
+from multiprocessing.shared_memory import SharedMemory
+from os import getpid, path, remove, replace
 
 import numpy as np
 from algorithm.parameters import params
+from utilities.fitness.column_evaluation import bind_columns
 
+datasets = {}
+# This dict is the dataset registry for the current process. The key for
+# each entry is the absolute path of a dataset file and the number of header
+# lines skipped when parsing it, the value is the parsed Dataset. Every
+# dataset file is therefore only read once per process (for each way it is
+# parsed).
 
-def get_Xy_train_test_separate(train_filename, test_filename, skip_header=0):
+shared_blocks = []
+# This list stores the shared memory blocks created by this process for
+# multi-core evaluation. They are unlinked by release_shared_datasets().
+
+
+class Dataset(object):
     """
-    Read in training and testing data files, and split each into X
-    (all columns up to last) and y (last column). The data files should
-    contain one row per training example.
-    
-    :param train_filename: The file name of the training dataset.
-    :param test_filename: The file name of the testing dataset.
-    :param skip_header: The number of header lines to skip.
-    :return: Parsed numpy arrays of training and testing input (x) and
-    output (y) data.
+    A parsed dataset file. Keeps the column names, the column dtypes and
+    the numpy data of a dataset together. The last column is the output
+    (y), all other columns are inputs (X).
+
+    Datasets whose data lives in a memory-mapped cache file or in shared
+    memory are pickled by reference: unpickling (e.g. in a multi-core
+    worker) attaches a read-only view of the same memory instead of
+    copying the data.
+    """
+
+    def __init__(self, filename, names, data, source=None, skip_header=0):
+        """
+        Initialise an instance of the dataset class.
+
+        :param filename: The file name of the dataset.
+        :param names: The names of all columns in the dataset.
+        :param data: A 2D numpy array of the dataset, one row per example.
+        :param source: Where the data can be attached from by other
+        processes, i.e. ("mmap", cache file name) or ("shm", shared memory
+        block name, shape, dtype, fortran order). None if the data is
+        private to this process.
+        :param skip_header: The number of header lines skipped when parsing
+        the dataset file.
+        """
+
+        self.filename, self.names = filename, names
+        self.skip_header = skip_header
+        self.data, self.source = as_ndarray(data), source
+
+        # The narrowest dtype each column can be stored in without loss.
+        self.dtypes = {name: get_column_dtype(data[:, i]) for i, name in
+                       enumerate(names)}
+
+        # Input columns bound by feature name, built on first use.
+        self._columns = None
+
+    @property
+    def feature_names(self):
+        """The names of the input columns."""
+
+        return self.names[:-1]
+
+    @property
+    def X(self):
+        """The input data, all columns but the last."""
+
+        return self.data[:, :-1]
+
+    @property
+    def y(self):
+        """The output data, the last column."""
+
+        return self.data[:, -1]
+
+    @property
+    def columns(self):
+        """A dict of feature names to contiguous input columns."""
+
+        if self._columns is None:
+            self._columns = bind_columns(self.X, self.feature_names)
+
+        return self._columns
+
+    def column(self, name):
+        """
+        Return a single column of the dataset by name.
+
+        :param name: The name of a column.
+        :return: The column as a 1D numpy array.
+        """
+
+        return self.data[:, self.names.index(name)]
+
+    def __getstate__(self):
+        """
+        Return the picklable state of the dataset. Shared data is not
+        pickled, only its source.
+
+        :return: The state of the dataset.
+        """
+
+        state = self.__dict__.copy()
+        state['_columns'] = None
+
+        if self.source:
+            state['data'] = None
+
+        return state
+
+    def __setstate__(self, state):
+        """
+        Restore a pickled dataset, attaching shared data by name, and add it
+        to the dataset registry of this process.
+
+        :param state: The state of the dataset.
+        :return: Nothing.
+        """
+
+        self.__dict__.update(state)
+
+        if self.source:
+            self.data = attach_data(self.source)
+
+        datasets.setdefault((path.abspath(self.filename), self.skip_header),
+                            self)
+
+
+def as_ndarray(data):
+    """
+    Return a plain numpy array view of memory-mapped data. Indexing a
+    numpy.memmap goes through Python code, which makes element-wise access
+    (e.g. set(y) in the error metrics) very slow; a plain view of the same
+    memory does not.
+
+    :param data: A numpy array or numpy.memmap.
+    :return: A numpy array.
+    """
+
+    if isinstance(data, np.memmap):
+        return data.view(np.ndarray)
+
+    return data
+
+
+def get_column_dtype(column):
+    """
+    Return the narrowest dtype a column of parsed data can be stored in
+    without loss, i.e. int64 for integral columns and float64 otherwise.
+
+    :param column: A 1D numpy array.
+    :return: A numpy dtype.
+    """
+
+    with np.errstate(invalid='ignore'):
+        if np.all(column == np.floor(column)):
+            return np.dtype(np.int64)
+
+    return np.dtype(np.float64)
+
+
+def get_delimiter(filename):
+    """
+    Return the field separator (i.e. delimiter) of a dataset file. Uses
+    params['DATASET_DELIMITER'] if it has been set, otherwise the delimiter
+    is auto-detected from the first data line of the file.
+
+    :param filename: The file name of a dataset.
+    :return: The delimiter of the dataset file.
     """
 
     if params['DATASET_DELIMITER']:
         # Dataset delimiter has been explicitly specified.
-        delimiter = params['DATASET_DELIMITER']
+        return params['DATASET_DELIMITER']
 
-    else:
-        # Try to auto-detect the field separator (i.e. delimiter).
-        f = open(train_filename)
-        for line in f:
-            if line.startswith("#") or len(line) < 2:
-                # Skip excessively short lines or commented out lines.
-                continue
+    # Try to auto-detect the field separator (i.e. delimiter).
+    delimiter = None
+    f = open(filename)
+    for line in f:
+        if line.startswith("#") or len(line) < 2:
+            # Skip excessively short lines or commented out lines.
+            continue
 
+        else:
+            # Set the delimiter.
+            if "\t" in line:
+                delimiter = "\t"
+                break
+            elif "," in line:
+                delimiter = ","
+                break
+            elif ";" in line:
+                delimiter = ";"
+                break
+            elif ":" in line:
+                delimiter = ":"
+                break
             else:
-                # Set the delimiter.
-                if "\t" in line:
-                    delimiter = "\t"
-                    break
-                elif "," in line:
-                    delimiter = ","
-                    break
-                elif ";" in line:
-                    delimiter = ";"
-                    break
-                elif ":" in line:
-                    delimiter = ":"
-                    break
-                else:
-                    print(
-                        "Warning (in utilities.fitness.get_data.get_Xy_train_test_separate)\n"
-                        "Warning: Dataset delimiter not found. "
-                        "Defaulting to whitespace delimiter.")
-                    delimiter = " "
-                    break
-        f.close()
-
-    # Read in all training data.
-    train_Xy = np.genfromtxt(train_filename, skip_header=skip_header,
+                print(
+                    "Warning (in utilities.fitness.get_data.get_delimiter)\n"
+                    "Warning: Dataset delimiter not found. "
+                    "Defaulting to whitespace delimiter.")
+                delimiter = " "
+                break
+    f.close()
+
+    return delimiter
+
+
+def load_dataset(filename, skip_header=0):
+    """
+    Return the parsed dataset for a given file from the dataset registry.
+    The file is read and parsed only the first time it is requested. If
+    params['DATASET_CACHE'] is set, the parsed data is also saved to a
+    binary ".npy" cache next to the dataset file, which later runs
+    memory-map instead of parsing the file again. Parallel runs then share
+    the same page-cached data.
+
+    :param filename: The file name of a dataset.
+    :param skip_header: The number of header lines to skip. If non-zero,
+    column names are read from the first header line.
+    :return: An instance of the Dataset class.
+    """
+
+    key = path.abspath(filename), skip_header
+
+    if key in datasets:
+        # The dataset has already been loaded by this process.
+        return datasets[key]
+
+    delimiter = get_delimiter(filename)
+
+    data, cache_file = None, None
+
+    if params['DATASET_CACHE']:
+        # Look for a binary cache of the parsed dataset.
+        cache_file = get_cache_filename(filename, delimiter, skip_header)
+
+        if path.isfile(cache_file):
+            data = np.load(cache_file, mmap_mode='r')
+
+    if data is None:
+        # Read in all data.
+        data = np.genfromtxt(filename, skip_header=skip_header,
                              delimiter=delimiter)
 
+        if data.ndim != 2:
+            s = "utilities.fitness.get_data.load_dataset\n" \
+                "Error: specified delimiter '%s' incorrectly parses " \
+                "dataset %s." % (delimiter, filename)
+            raise Exception(s)
+
+        if cache_file:
+            # Save a binary cache for later runs and use it from now on.
+            data = save_cache(data, filename, cache_file)
+
+    names = None
+
+    if skip_header:
+        # Read the column names from the header line.
+        with open(filename) as f:
+            header = f.readline().lstrip("#").strip()
+
+        names = [name.strip().strip("'\"") for name in header.split(
+            None if delimiter == " " else delimiter)]
+
+    if not names or len(names) != data.shape[1]:
+        # No (usable) header, use default column names.
+        names = ["x%d" % i for i in range(data.shape[1] - 1)] + ["y"]
+
+    source = None
+
+    if isinstance(data, np.memmap):
+        # Other processes can memory-map the same cache file.
+        source = ("mmap", cache_file)
+
+    elif params['MULTICORE']:
+        # Place the data in shared memory for the multi-core workers.
+        data, source = share_data(data)
+
+    datasets[key] = Dataset(filename, names, data, source, skip_header)
+
+    return datasets[key]
+
+
+def share_data(data):
+    """
+    Copy an array into a new shared memory block.
+
+    :param data: A numpy array.
+    :return: A read-only numpy array backed by the shared memory block, and
+    the source from which other processes can attach it.
+    """
+
+    block = SharedMemory(create=True, size=max(data.nbytes, 1))
+    shared_blocks.append(block)
+
+    fortran = bool(data.flags['F_CONTIGUOUS'] and not
+                   data.flags['C_CONTIGUOUS'])
+    source = ("shm", block.name, data.shape, data.dtype.str, fortran)
+
+    shared = attach_data(source, block)
+    shared.flags.writeable = True
+    shared[...] = data
+    shared.flags.writeable = False
+
+    return shared, source
+
+
+def attach_data(source, block=None):
+    """
+    Attach a read-only view of data shared by another process.
+
+    :param source: The source of the data, as stored in Dataset.source.
+    :param block: An already open shared memory block, if any.
+    :return: A read-only numpy array.
+    """
+
+    if source[0] == "mmap":
+        return as_ndarray(np.load(source[1], mmap_mode='r'))
+
+    _, name, shape, dtype, fortran = source
+
+    if block is None:
+        block = SharedMemory(name=name)
+
+        # Keep the block open for as long as this process runs.
+        shared_blocks.append(block)
+
+    data = np.ndarray(shape, dtype=dtype, buffer=block.buf,
+                      order="F" if fortran else "C")
+    data.flags.writeable = False
+
+    return data
+
+
+def release_shared_datasets():
+    """
+    Unlink the shared memory blocks created by this process, once no more
+    workers need to attach them. Data remains accessible to this process.
+
+    :return: Nothing.
+    """
+
+    for block in shared_blocks:
+        try:
+            block.unlink()
+        except FileNotFoundError:
+            # Already unlinked, or created by another process.
+            pass
+
+
+def get_cache_filename(filename, delimiter, skip_header):
+    """
+    Return the file name of the binary cache of a dataset file. The name
+    contains a checksum of the parsing options followed by a checksum of
+    the dataset file contents, so that the cache is invalidated whenever
+    either changes, and the same file parsed with different options has a
+    separate cache.
+
+    :param filename: The file name of a dataset.
+    :param delimiter: The delimiter used to parse the dataset.
+    :param skip_header: The number of header lines skipped when parsing.
+    :return: The file name of the binary cache.
+    """
+
+    options = sha1(repr((delimiter, skip_header)).encode())
+    checksum = options.copy()
+
+    with open(filename, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            checksum.update(chunk)
+
+    return "%s.%s-%s.npy" % (filename, options.hexdigest()[:8],
+                             checksum.hexdigest()[:16])
+
+
+def save_cache(data, filename, cache_file):
+    """
+    Save a parsed dataset to its binary cache file and remove any stale
+    caches of the same dataset file parsed with the same options. Data is
+    saved in column-major order, so that dataset columns are contiguous.
+    The cache is written to a temporary file first and then renamed, so
+    that parallel runs never see a partially written cache.
+
+    :param data: A 2D numpy array of a parsed dataset.
+    :param filename: The file name of the dataset.
+    :param cache_file: The file name of the binary cache.
+    :return: The data, memory-mapped from the binary cache if it could be
+    written.
+    """
+
+    tmp_file = "%s.%d.tmp" % (cache_file, getpid())
+
     try:
-        # Separate out input (X) and output (y) data.
-        train_X = train_Xy[:, :-1] # all columns but last
-        train_y = train_Xy[:, -1]  # last column
+        with open(tmp_file, 'wb') as f:
+            np.save(f, np.asfortranarray(data))
+        replace(tmp_file, cache_file)
 
-    except IndexError:
-        s = "utilities.fitness.get_data.get_Xy_train_test_separate\n" \
-            "Error: specified delimiter '%s' incorrectly parses training " \
-            "data." % delimiter
-        raise Exception(s)
+    except OSError:
+        # The dataset folder is not writable. Use the parsed data.
+        if path.isfile(tmp_file):
+            remove(tmp_file)
+        return data
 
-    if test_filename:
-        # Read in all testing data.
-        test_Xy = np.genfromtxt(test_filename, skip_header=skip_header,
-                                delimiter=delimiter)
+    # The checksum of the parsing options of the new cache.
+    options = cache_file[len(filename) + 1:].split("-")[0]
+
+    for stale in glob(escape(filename) + ".*.npy"):
+        checksums = stale[len(filename) + 1:-len(".npy")]
+
+        if stale != cache_file and checksums.split("-")[0] in (options,
+                                                               checksums):
+            # The cache has the same parsing options (or was saved without
+            # a separate checksum of them).
+            try:
+                remove(stale)
+            except OSError:
+                pass
 
-        # Separate out input (X) and output (y) data.
-        test_X = test_Xy[:, :-1] # all columns but last
-        test_y = test_Xy[:, -1]  # last column
+    return np.load(cache_file, mmap_mode='r')
+
+
+def get_Xy_train_test_separate(train_filename, test_filename, skip_header=0):
+    """
+    Read in training and testing data files, and split each into X
+    (all columns up to last) and y (last column). The data files should
+    contain one row per training example. Files are read through the
+    dataset registry, i.e. only once per process.
+    
+    :param train_filename: The file name of the training dataset.
+    :param test_filename: The file name of the testing dataset.
+    :param skip_header: The number of header lines to skip.
+    :return: Parsed numpy arrays of training and testing input (x) and
+    output (y) data.
+    """
+
+    # Separate out input (X) and output (y) data.
+    train_set = load_dataset(train_filename, skip_header)
+    train_X, train_y = train_set.X, train_set.y
+
+    if test_filename:
+        test_set = load_dataset(test_filename, skip_header)
+        test_X, test_y = test_set.X, test_set.y
 
     else:
         test_X, test_y = None, None
@@ -82,6 +451,20 @@ def get_Xy_train_test_separate(train_filename, test_filename, skip_header=0):
     return train_X, train_y, test_X, test_y
 
 
+def get_dataset(name, skip_header=1):
+    """
+    Return a dataset from the "datasets" folder by name, e.g.
+    params['DATASET_TRAIN'].
+
+    :param name: The name of the dataset file within the "datasets" folder.
+    :param skip_header: The number of header lines to skip. The datasets
+    shipped in the "datasets" folder have one header line.
+    :return: An instance of the Dataset class.
+    """
+
+    return load_dataset(path.join("..", "datasets", name), skip_header)
+
+
 def get_data(train, test):
     """
     Return the training and test data for the current experiment.
@@ -0,0 +1,193 @@
+import ast
+
+from utilities.fitness.compile_cache import compile_cache
+from utilities.fitness.math_functions import *
+
+derivatives = {
+    ast.Add: ["{g}", "{g}"],
+    ast.Sub: ["{g}", "-{g}"],
+    ast.Mult: ["{g} * {b}", "{g} * {a}"],
+    ast.Div: ["{g} / {b}", "-{g} * {out} / {b}"],
+    ast.Pow: ["{g} * {b} * {a} ** ({b} - 1)", "{g} * {out} * np.log({a})"],
+    ast.USub: ["-{g}"],
+    ast.UAdd: ["{g}"],
+    "aq": ["{g} / np.sqrt(1.0 + {b} * {b})",
+           "-{g} * {out} * {b} / (1.0 + {b} * {b})"],
+    "pdiv": ["np.where({b} == 0, 0.0, {g} / {b})",
+             "np.where({b} == 0, 0.0, -{g} * {out} / {b})"],
+    "rlog": ["np.where({a} == 0, 0.0, {g} / {a})"],
+    "ppow": ["{g} * np.sign({a}) * {b} * np.abs({a}) ** ({b} - 1)",
+             "np.where({a} == 0, 0.0, {g} * {out} * np.log(np.abs({a})))"],
+    "ppow2": ["{g} * {b} * np.abs({a}) ** ({b} - 1)",
+              "np.where({a} == 0, 0.0, {g} * {out} * np.log(np.abs({a})))"],
+    "psqrt": ["np.where({a} == 0, 0.0, {g} * np.sign({a}) / (2 * {out}))"],
+    "psqrt2": ["np.where({a} == 0, 0.0, {g} / (2 * np.sqrt(np.abs({a}))))"],
+    "plog": ["{g} * np.sign({a}) / (1.0 + np.abs({a}))"],
+    "np.sin": ["{g} * np.cos({a})"],
+    "np.cos": ["-{g} * np.sin({a})"],
+    "np.tanh": ["{g} * (1.0 - {out} * {out})"],
+    "np.exp": ["{g} * {out}"],
+    "np.log": ["{g} / {a}"],
+    "np.sqrt": ["{g} * 0.5 / {out}"],
+    "np.abs": ["{g} * np.sign({a})"],
+    "np.square": ["{g} * 2 * {a}"]}
+# Templates for the gradient of a loss with respect to each argument of an
+# operator (by AST node type) or function (by name), given its gradient
+# {g} with respect to the result {out} and the arguments {a} and {b}.
+# Phenotypes which apply anything else to the constants cannot be
+# differentiated. Where a protected function is constant (e.g. pdiv where b
+# is 0) or not differentiable (psqrt at 0), the gradient is taken as 0.
+
+
+def get_objective(phenotype):
+    """
+    Differentiate a phenotype with constants c[0], c[1], ... with respect to
+    the constants, by reverse-mode differentiation of its abstract syntax
+    tree. The result is a single function, compiled once and kept in the
+    compile cache, which evaluates the phenotype and then propagates the
+    gradient of the loss back through it.
+
+    The function is called as objective(x, c, y, loss, gradient), where
+    loss is an error metric and gradient is its gradient with respect to
+    yhat (see utilities.fitness.error_metric), and returns the loss and a
+    numpy array of its gradient with respect to the constants. The loss is
+    exactly the loss of eval'ing the phenotype, and errors evaluating the
+    phenotype or the loss are raised as usual. The gradient is computed
+    with numpy errors ignored, so it may not be finite.
+
+    :param phenotype: A phenotype string with consecutive constants (see
+    utilities.fitness.optimize_constants.make_consts_consecutive).
+    :return: The objective function, or None if the phenotype cannot be
+    differentiated.
+    """
+
+    def build():
+        try:
+            source = differentiate(phenotype)
+
+        except NotImplementedError:
+            return None
+
+        namespace = {}
+        exec(compile(source, "<gradient>", "exec"), globals(), namespace)
+
+        return namespace["objective"]
+
+    return compile_cache.get(("gradient", phenotype), build)
+
+
+def differentiate(phenotype):
+    """
+    Write the source of the objective function of get_objective: one
+    statement per node of the phenotype which depends on the constants,
+    followed by one statement per gradient, in reverse order.
+
+    :param phenotype: A phenotype string with consecutive constants.
+    :return: A string of Python source which defines objective().
+    """
+
+    forward, backward, consts = [], [], {}
+
+    def uses(node, name):
+        return any(isinstance(child, ast.Name) and child.id == name for
+                   child in ast.walk(node))
+
+    def visit(node):
+        # Write the statement which evaluates a node. Return the variable
+        # which holds its value, whether it depends on the constants,
+        # whether it is an array (i.e. depends on x) and, if it applies an
+        # operator or function, the operator and its children.
+        var = "v%d" % len(forward)
+        is_array = uses(node, "x")
+
+        if not uses(node, "c"):
+            # No constants below this node: evaluate it as a whole.
+            forward.append("%s = %s" % (var, ast.unparse(node)))
+            return var, False, is_array, None
+
+        if isinstance(node, ast.Subscript) and \
+                isinstance(node.value, ast.Name) and node.value.id == "c" \
+                and isinstance(node.slice, ast.Constant):
+            forward.append("%s = c[%d]" % (var, node.slice.value))
+            consts.setdefault(node.slice.value, []).append(var)
+            return var, True, False, None
+
+        elif isinstance(node, ast.BinOp) and type(node.op) in derivatives:
+            op, args = type(node.op), [node.left, node.right]
+
+        elif isinstance(node, ast.UnaryOp) and type(node.op) in derivatives:
+            op, args = type(node.op), [node.operand]
+
+        elif isinstance(node, ast.Call) and not node.keywords and \
+                ast.unparse(node.func) in derivatives and \
+                len(node.args) == len(derivatives[ast.unparse(node.func)]):
+            op, args = ast.unparse(node.func), node.args
+
+        else:
+            raise NotImplementedError("Cannot differentiate %s" %
+                                      ast.unparse(node))
+
+        children = [visit(arg) for arg in args]
+        names = [ast.Name(child[0]) for child in children]
+
+        if isinstance(op, str):
+            value = ast.Call(ast.Name(op), names, [])
+
+        elif len(names) == 2:
+            value = ast.BinOp(names[0], node.op, names[1])
+
+        else:
+            value = ast.UnaryOp(node.op, names[0])
+
+        # As the phenotype, with the children replaced by their variables.
+        var = "v%d" % len(forward)
+        forward.append("%s = %s" % (var, ast.unparse(value)))
+
+        return var, True, is_array, (op, children)
+
+    def propagate(var, is_array, op, children):
+        # Write the gradients of the children of a node which depend on the
+        # constants, from the gradient g<var> of the node.
+        names = dict(zip("ab", [child[0] for child in children]),
+                     g="g" + var, out=var)
+
+        for (child, depends, child_array, apply), template in \
+                zip(children, derivatives[op]):
+            if not depends:
+                continue
+
+            gradient = template.format(**names)
+
+            if is_array and not child_array:
+                # The child was broadcast over the dataset.
+                gradient = "np.sum(%s)" % gradient
+
+            backward.append("g%s = %s" % (child, gradient))
+
+            if apply is not None:
+                propagate(child, child_array, *apply)
+
+    root, _, is_array, apply = visit(ast.parse(phenotype.strip(),
+                                               mode="eval").body)
+
+    if is_array:
+        backward.append("g%s = gradient(y, %s)" % (root, root))
+
+    else:
+        # The phenotype is a constant, broadcast over the dataset.
+        backward.append("g%s = np.sum(gradient(y, %s))" % (root, root))
+
+    if apply is not None:
+        propagate(root, is_array, *apply)
+
+    # Sum the gradients of every occurrence of each constant.
+    gradient = ", ".join(" + ".join("g" + var for var in consts.get(i, []))
+                         or "0.0" for i in range(max(consts, default=-1) + 1))
+
+    return "\n".join(
+        ["def objective(x, c, y, loss, gradient):"] +
+        ["    " + line for line in forward] +
+        ["    fitness = loss(y, %s)" % root,
+         "    with np.errstate(all='ignore'):"] +
+        ["        " + line for line in backward] +
+        ["        return fitness, np.array([%s], dtype=float)" % gradient])
@@ -0,0 +1,40 @@
+import numpy as np
+
+
+def get_scaling(y, yhat):
+    """
+    Find the offset a and scale b which minimise the squared error between
+    y and a + b * yhat, in closed form: b is the covariance of y and yhat
+    over the variance of yhat, and a puts the mean of the scaled
+    predictions on the mean of y. A phenotype whose output is constant
+    over the dataset is scaled to the mean of y.
+
+    :param y: Expected output (a numpy array).
+    :param yhat: The predictions of an individual, of the same shape as y.
+    :return: The offset a and the scale b.
+    """
+
+    yhat_mean, y_mean = np.mean(yhat), np.mean(y)
+    deviation = yhat - yhat_mean
+    variance = np.dot(deviation, deviation)
+
+    if variance == 0:
+        return y_mean, 0.0
+
+    b = np.dot(deviation, y - y_mean) / variance
+
+    return y_mean - b * yhat_mean, b
+
+
+def apply_scaling(yhat, scaling):
+    """
+    Scale the predictions of an individual.
+
+    :param yhat: The predictions of an individual.
+    :param scaling: An (offset, scale) pair, as returned by get_scaling.
+    :return: The scaled predictions.
+    """
+
+    a, b = scaling
+
+    return a + b * yhat
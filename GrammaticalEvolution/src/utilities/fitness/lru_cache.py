@@ -0,0 +1,99 @@
+from collections import OrderedDict
+
+from algorithm.parameters import params
+
+
+class LRUCache(object):
+    """
+    A least-recently-used cache. The maximum number of entries is set by
+    the parameter named by size_param (e.g. params['SEMANTIC_CACHE_SIZE']);
+    when it is exceeded the least recently used entry is evicted. A size of
+    0 disables the cache.
+
+    Lookups (get) count as hits or misses, and a hit marks the entry as the
+    most recently used. Membership tests have no side effects.
+    """
+
+    def __init__(self, size_param):
+        """
+        Initialise an empty cache.
+
+        :param size_param: The name of the parameter which sets the maximum
+        number of entries.
+        """
+
+        self.size_param = size_param
+        self.entries = OrderedDict()
+        self.hits, self.misses, self.evictions = 0, 0, 0
+
+    def get(self, key, build):
+        """
+        Return the cached value for a key, building and caching it on a
+        miss.
+
+        :param key: A hashable key.
+        :param build: A function of no arguments which returns the value
+        for the key.
+        :return: The cached value.
+        """
+
+        entries = self.entries
+
+        if key in entries:
+            # Mark the entry as the most recently used.
+            entries.move_to_end(key)
+            self.hits += 1
+            return entries[key]
+
+        self.misses += 1
+        value = build()
+
+        self.put(key, value)
+
+        return value
+
+    def put(self, key, value):
+        """
+        Cache a value for a key, as the most recently used entry, evicting
+        the least recently used entries if the cache is full.
+
+        :param key: A hashable key.
+        :param value: The value for the key.
+        :return: Nothing.
+        """
+
+        max_size = params[self.size_param]
+
+        if max_size:
+            entries = self.entries
+
+            entries[key] = value
+            entries.move_to_end(key)
+
+            while len(entries) > max_size:
+                # Evict the least recently used entry.
+                entries.popitem(last=False)
+                self.evictions += 1
+
+    def __contains__(self, key):
+        """
+        Check whether a key is cached, without counting a hit or miss or
+        marking the entry as used.
+
+        :param key: A hashable key.
+        :return: Whether the key is in the cache.
+        """
+
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def clear(self):
+        """
+        Remove all entries from the cache.
+
+        :return: Nothing.
+        """
+
+        self.entries.clear()
@@ -2,13 +2,26 @@ import re
 
 import scipy
 from algorithm.parameters import params
+from utilities.fitness.compile_cache import compile_phenotype
+from utilities.fitness.gradients import get_objective
+from utilities.fitness.lru_cache import LRUCache
 from utilities.fitness.math_functions import *
 
+constant_cache = LRUCache('CONSTANT_CACHE_SIZE')
+# The best constants found so far for each skeleton (a phenotype with
+# consecutive constants), with the loss at those constants, shared by all
+# individuals in this process. Keys are skeletons, values are (constants,
+# loss) pairs.
+
 
 def optimize_constants(x, y, ind):
     """
     Use gradient descent to search for values for the constants in
-    ind.phenotype which minimise loss.
+    ind.phenotype which minimise loss. Skeletons which have been optimised
+    before take their constants from the constant cache, and otherwise the
+    search starts from the constants of the nearest parent (see
+    get_initial_constants). Whether the cache was hit and the number of
+    iterations of the optimiser are stored in ind.constant_stats.
     
     :param x: Input (an array of x values).
     :param y: Expected output (expected y values for given inputs).
@@ -26,8 +39,8 @@ def optimize_constants(x, y, ind):
     # Create new consecutive constant attribute for individual.
     ind.phenotype_consec_consts = s
 
-    # Eval the phenotype.
-    f = eval("lambda x, c: " + s)
+    # Eval the phenotype. The code object comes from the compile cache.
+    f = eval(compile_phenotype("lambda x, c: " + s))
 
     # Pre-load the error metric fitness function.
     loss = params['ERROR_METRIC']
@@ -47,15 +60,31 @@ at https://github.com/PonyGE/PonyGE2/issues/130."""
         ind.opt_consts = c
         return fitness
 
+    if s in constant_cache:
+        # The skeleton has been optimised before: reuse its constants.
+        opt_consts, fitness = constant_cache.get(s, None)
+        ind.opt_consts = opt_consts.copy()
+        ind.phenotype = replace_consts_with_values(s, ind.opt_consts)
+        ind.constant_stats = True, 0
+        return fitness
+
     obj = lambda c: loss(y, f(x, c))
     # obj is now a function of c only for L-BFGS-B. Using 0 as the init seems a
     # reasonable choice. But for scipy.curve_fit we might use [1.0] * n_consts.
     # Maybe other minimizers do better with some other choices? There are other
-    # methods to try out.
-    init = [0.0] * n_consts
+    # methods to try out. Where a parent's constants are known they are
+    # usually a much better start.
+    init = get_initial_constants(ind, obj)
+
+    jac = None
+
+    if params['ANALYTIC_GRADIENTS'] and hasattr(loss, 'gradient') and \
+            get_objective(s) is not None:
+        # The objective returns both the loss and its gradient.
+        obj, jac = get_objective_and_gradient(s, x, y, loss, obj), True
 
     try:
-        res = scipy.optimize.minimize(obj, init, method="L-BFGS-B")
+        res = scipy.optimize.minimize(obj, init, method="L-BFGS-B", jac=jac)
     except ValueError:
         raise ValueError("Error during optimization of constants. " \
                          "Possible cause: " + shape_mismatch_txt)
@@ -63,6 +92,10 @@ at https://github.com/PonyGE/PonyGE2/issues/130."""
 
     # the result is accessed like a dict
     ind.opt_consts = res['x']  # the optimum values of the constants
+    ind.constant_stats = False, res['nit']
+
+    if params['CONSTANT_CACHE_SIZE']:
+        constant_cache.get(s, lambda: (res['x'].copy(), res['fun']))
 
     # the most useful form of the phenotype: c[0], c[1] etc replaced
     # with actual numbers, so can be eval'd directly
@@ -71,6 +104,119 @@ at https://github.com/PonyGE/PonyGE2/issues/130."""
     return res['fun']
 
 
+def get_objective_and_gradient(s, x, y, loss, obj):
+    """
+    Make an objective function which returns both the loss and its exact
+    gradient with respect to the constants, by reverse-mode
+    differentiation of the phenotype (see utilities.fitness.gradients).
+    A single pass over the dataset then replaces the n_consts + 1
+    evaluations of finite differences.
+
+    :param s: The phenotype string with consecutive constants.
+    :param x: Input (an array of x values).
+    :param y: Expected output (expected y values for given inputs).
+    :param loss: The error metric, which must have a gradient attribute.
+    :param obj: The objective function of the constants alone, used for
+    finite differences where the gradient is not finite.
+    :return: A function of the constants which returns the loss and its
+    gradient.
+    """
+
+    objective = get_objective(s)
+
+    def objective_and_gradient(c):
+        fitness, gradient = objective(x, c, y, loss, loss.gradient)
+
+        if not np.all(np.isfinite(gradient)):
+            # E.g. at a singularity of the phenotype: estimate the gradient
+            # by finite differences instead.
+            gradient = scipy.optimize.approx_fprime(c, obj)
+
+        return fitness, gradient
+
+    return objective_and_gradient
+
+
+def get_initial_constants(ind, obj):
+    """
+    Choose the initial values of the constants of an individual for the
+    optimiser. If params['WARM_START_CONSTANTS'] is specified, the search is
+    warm-started from the optimised constants of the nearest parent (see
+    inherit_constants), i.e. the parent which shares the most constants
+    c[i] of the original phenotype. Constants which the parent does not
+    have start from 0. As the parent's constants may suit the new phenotype
+    badly, they are only used if their loss is no worse than starting all
+    constants from 0.
+
+    :param ind: A GE individual, with ind.phenotype_original set.
+    :param obj: The loss as a function of the constants.
+    :return: A list of initial values for the consecutive constants.
+    """
+
+    const_idxs = get_const_idxs(ind.phenotype_original)
+    init = [0.0] * len(const_idxs)
+
+    if params['WARM_START_CONSTANTS']:
+        parents = [parent for parent in getattr(ind, 'parent_consts', [])
+                   if any(i in parent for i in const_idxs)]
+
+        if parents:
+            # The nearest parent shares the most constants.
+            nearest = max(parents, key=lambda parent: sum(
+                i in parent for i in const_idxs))
+            warm = [nearest.get(i, 0.0) for i in const_idxs]
+
+            with np.errstate(all='ignore'):
+                if obj(warm) <= obj(init):
+                    init = warm
+
+    return init
+
+
+def inherit_constants(child, parents):
+    """
+    Give a new individual the optimised constants of its parents, by
+    original constant index, so that the optimisation of its own constants
+    can be warm-started (see get_initial_constants). Parents which have not
+    been evaluated yet (e.g. the children of crossover which are then
+    mutated) pass on the constants they inherited themselves.
+
+    :param child: A new individual produced by a variation operator.
+    :param parents: The individuals from which it was produced.
+    :return: Nothing.
+    """
+
+    if not params['OPTIMIZE_CONSTANTS']:
+        return
+
+    parent_consts = []
+
+    for parent in parents:
+        if hasattr(parent, 'opt_consts') and \
+                hasattr(parent, 'phenotype_original'):
+            parent_consts.append(dict(zip(
+                get_const_idxs(parent.phenotype_original),
+                parent.opt_consts)))
+
+        else:
+            parent_consts.extend(getattr(parent, 'parent_consts', []))
+
+    child.parent_consts = parent_consts
+
+
+def get_const_idxs(s):
+    """
+    Find the indexes of the constants c[0], c[1], etc in a phenotype.
+
+    :param s: A given phenotype string.
+    :return: A sorted list of the unique constant indexes.
+    """
+
+    p = r"c\[(\d+)\]"
+    # find the consts, extract idxs as ints, unique-ify and sort
+    return sorted(map(int, set(re.findall(p, s))))
+
+
 def make_consts_consecutive(s):
     """
     The given phenotype will have zero or more occurrences of each const c[0],
@@ -83,9 +229,7 @@ def make_consts_consecutive(s):
     :return: The phenotype string but with consecutive constants.
     """
 
-    p = r"c\[(\d+)\]"
-    # find the consts, extract idxs as ints, unique-ify and sort
-    const_idxs = sorted(map(int, set(re.findall(p, s))))
+    const_idxs = get_const_idxs(s)
 
     for i, j in enumerate(const_idxs):
         ci = "c[%d]" % i
@@ -0,0 +1,172 @@
+import pickle
+import sqlite3
+from hashlib import sha1
+from os import path
+
+from algorithm.parameters import params
+
+BATCH_SIZE = 500
+# The maximum number of phenotypes looked up in a single query. Older
+# versions of SQLite allow at most 999 variables in a statement.
+
+
+class PersistentCache(object):
+    """
+    An on-disk fitness cache which is shared across runs, stored in an
+    SQLite database. Each entry is keyed by the fingerprint of the
+    experiment (see get_fingerprint) and the phenotype, so a single database
+    can hold the fitnesses of many different experiments.
+
+    Reads and writes are batched, one query per generation (or per
+    BATCH_SIZE phenotypes). SQLite locks the database for writing, so
+    parallel runs (e.g. from scripts/experiment_manager.py) can safely share
+    a database; if two runs evaluate the same phenotype the first result
+    written is kept.
+
+    The semantics of each phenotype (see utilities.fitness.semantic_cache)
+    are saved with its fitness, if the fitness function computes them.
+    """
+
+    def __init__(self, filename, fingerprint):
+        """
+        Open (and create if necessary) a persistent fitness cache.
+
+        :param filename: The file name of the SQLite database.
+        :param fingerprint: The fingerprint of the current experiment.
+        """
+
+        self.filename, self.fingerprint = filename, fingerprint
+
+        # Wait for up to a minute for other runs to finish writing.
+        self.connection = sqlite3.connect(filename, timeout=60)
+
+        # Write-ahead logging lets other runs read while one run writes.
+        self.connection.execute("PRAGMA journal_mode=WAL")
+
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS fitness ("
+                "fingerprint TEXT NOT NULL, "
+                "phenotype TEXT NOT NULL, "
+                "fitness BLOB NOT NULL, "
+                "runtime_error INTEGER NOT NULL, "
+                "semantics TEXT, "
+                "PRIMARY KEY (fingerprint, phenotype))")
+
+            columns = [row[1] for row in self.connection.execute(
+                "PRAGMA table_info(fitness)")]
+
+            if "semantics" not in columns:
+                # Databases written by older versions have no semantics.
+                self.connection.execute(
+                    "ALTER TABLE fitness ADD COLUMN semantics TEXT")
+
+    def get_many(self, phenotypes):
+        """
+        Look up the fitnesses of a number of phenotypes.
+
+        :param phenotypes: A list of phenotype strings.
+        :return: A dict of the phenotypes found in the cache, mapped to
+        (fitness, runtime error flag, semantics) tuples. The semantics are
+        None if they are not known.
+        """
+
+        results = {}
+
+        for i in range(0, len(phenotypes), BATCH_SIZE):
+            batch = phenotypes[i:i + BATCH_SIZE]
+
+            rows = self.connection.execute(
+                "SELECT phenotype, fitness, runtime_error, semantics "
+                "FROM fitness "
+                "WHERE fingerprint = ? AND phenotype IN (%s)" %
+                ", ".join("?" * len(batch)), [self.fingerprint] + batch)
+
+            for phenotype, fitness, runtime_error, semantics in rows:
+                results[phenotype] = pickle.loads(fitness), bool(
+                    runtime_error), semantics
+
+        return results
+
+    def put_many(self, results):
+        """
+        Save the fitnesses of a number of phenotypes in a single
+        transaction.
+
+        :param results: A dict of phenotype strings mapped to (fitness,
+        runtime error flag, semantics) tuples.
+        :return: Nothing.
+        """
+
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO fitness (fingerprint, phenotype, "
+                "fitness, runtime_error, semantics) VALUES (?, ?, ?, ?, ?)",
+                [(self.fingerprint, phenotype, pickle.dumps(fitness),
+                  int(runtime_error), semantics) for
+                 phenotype, (fitness, runtime_error, semantics) in
+                 results.items()])
+
+    def close(self):
+        """
+        Close the connection to the database.
+
+        :return: Nothing.
+        """
+
+        self.connection.close()
+
+
+persistent_cache = None
+# The persistent fitness cache of this process, opened on first use by
+# get_persistent_cache(). An open database connection cannot be pickled,
+# so it is deliberately kept out of utilities.stats.trackers.
+
+
+def get_persistent_cache():
+    """
+    Return the persistent fitness cache for the current experiment, opening
+    the database set in params['PERSISTENT_CACHE'] on first use.
+
+    :return: An instance of the PersistentCache class.
+    """
+
+    global persistent_cache
+
+    if persistent_cache is None:
+        persistent_cache = PersistentCache(params['PERSISTENT_CACHE'],
+                                           get_fingerprint())
+
+    return persistent_cache
+
+
+def get_fingerprint():
+    """
+    Return the fingerprint of the current experiment: a checksum of
+    everything other than the phenotype which determines fitness, i.e. the
+    grammar file, the dataset files and the fingerprint of the fitness
+    function (see fitness.base_ff_classes.base_ff.fingerprint), e.g. its
+    class, the error metric, the target and the extra parameters.
+
+    :return: A hex string.
+    """
+
+    checksum = sha1()
+
+    files = [path.join("..", "grammars", params['GRAMMAR_FILE'])]
+
+    for dataset in [params['DATASET_TRAIN'], params['DATASET_TEST']]:
+        if dataset:
+            files.append(path.join("..", "datasets", dataset))
+
+    for filename in files:
+        checksum.update(filename.encode())
+
+        if path.isfile(filename):
+            with open(filename, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    checksum.update(chunk)
+
+    checksum.update(repr(params['FITNESS_FUNCTION'].fingerprint()).encode())
+
+    return checksum.hexdigest()
@@ -0,0 +1,198 @@
+import ast
+
+import numpy as np
+from utilities.fitness.column_evaluation import BitwiseTransformer, \
+    as_predictions, boolean_phenotype, phenotype_globals
+from utilities.fitness.compile_cache import compile_cache
+from utilities.fitness.subexpressions import subexpression_cache
+
+if hasattr(np, "bitwise_count"):
+    def popcount(words):
+        """
+        Count the set bits in an array of packed words.
+
+        :param words: A numpy array of uint64 words.
+        :return: The number of set bits.
+        """
+
+        return int(np.bitwise_count(words).sum())
+
+else:
+    # numpy < 2.0 has no popcount; count the bits of each byte instead.
+    POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)],
+                              dtype=np.uint8)
+
+    def popcount(words):
+        """
+        Count the set bits in an array of packed words.
+
+        :param words: A numpy array of uint64 words.
+        :return: The number of set bits.
+        """
+
+        return int(POPCOUNT_TABLE[words.view(np.uint8)].sum(dtype=np.int64))
+
+
+def pack_bits(mask):
+    """
+    Pack a boolean column into uint64 words, one bit per row. Padding bits
+    past the last row are 0.
+
+    :param mask: A 1D boolean numpy array.
+    :return: A 1D numpy array of uint64 words.
+    """
+
+    return as_words(np.packbits(mask, bitorder="little"))
+
+
+def as_words(packed):
+    """
+    Pad bytes of packed bits (as returned by np.packbits with little bit
+    order) with zeros to a whole number of uint64 words.
+
+    :param packed: A 1D numpy array of uint8 bytes.
+    :return: A 1D numpy array of uint64 words.
+    """
+
+    padded = np.zeros(-(-len(packed) // 8) * 8, dtype=np.uint8)
+    padded[:len(packed)] = packed
+
+    return padded.view(np.uint64)
+
+
+def unpack_bits(words, n_rows):
+    """
+    Unpack uint64 words into a boolean column, i.e. undo pack_bits.
+
+    :param words: A 1D numpy array of uint64 words.
+    :param n_rows: The number of rows (bits) to unpack.
+    :return: A 1D boolean numpy array.
+    """
+
+    return np.unpackbits(words.view(np.uint8), count=n_rows,
+                         bitorder="little").astype(bool)
+
+
+def get_rule(phenotype):
+    """
+    Parse a rule classifier phenotype into a tree of AND/OR/NOT over atomic
+    predicates (e.g. "HeartRate < 60"). Rules are kept in the compile
+    cache.
+
+    :param phenotype: The phenotype string of an individual.
+    :return: A nested tuple: ("and", [rules]), ("or", [rules]), ("not",
+    rule) or ("atom", key, code object).
+    """
+
+    def visit(node):
+        if isinstance(node, ast.BoolOp):
+            op = "and" if isinstance(node.op, ast.And) else "or"
+            return op, [visit(value) for value in node.values]
+
+        elif isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+            return "not", visit(node.operand)
+
+        # Anything else is an atomic predicate, evaluated over whole
+        # dataset columns (chained comparisons are split as usual).
+        key = "[bits %s]" % ast.unparse(node)
+        node = ast.fix_missing_locations(BitwiseTransformer().visit(
+            ast.Expression(node)))
+
+        return "atom", key, compile(node, "<predicate>", "eval")
+
+    def build():
+        tree = ast.parse(boolean_phenotype(phenotype).strip(), mode="eval")
+        return visit(tree.body)
+
+    return compile_cache.get(("rule", phenotype), build)
+
+
+def evaluate_bits(phenotype, dataset):
+    """
+    Evaluate a rule classifier phenotype over a full dataset as packed
+    bitsets. Each atomic predicate is computed and packed once per dataset
+    (and kept in the subexpression cache); the phenotype is then a few
+    bitwise operations over uint64 words.
+
+    :param phenotype: The phenotype string of an individual.
+    :param dataset: An instance of the Dataset class.
+    :return: The predictions of the phenotype as a 1D numpy array of
+    uint64 words, one bit per row.
+    """
+
+    n_rows = len(dataset.data)
+    valid = subexpression_cache.get((dataset.filename, "[bits valid]"),
+                                    lambda: pack_bits(np.ones(n_rows, bool)))
+
+    def atom(key, code):
+        predictions = as_predictions(eval(code, phenotype_globals,
+                                          dataset.columns), n_rows)
+        return pack_bits(predictions.astype(bool))
+
+    def value(rule):
+        if rule[0] == "atom":
+            return subexpression_cache.get((dataset.filename, rule[1]),
+                                           lambda: atom(*rule[1:]))
+
+        elif rule[0] == "not":
+            # Clear the padding bits set by the inversion.
+            return ~value(rule[1]) & valid
+
+        reduce = np.bitwise_and if rule[0] == "and" else np.bitwise_or
+        return reduce.reduce([value(child) for child in rule[1]])
+
+    return value(get_rule(phenotype))
+
+
+def get_label_bits(dataset):
+    """
+    Return the positive labels of a binary classification dataset as packed
+    bits. As in utilities.fitness.error_metric.f1_score, labels must be
+    {0, 1} or {-1, 1}, and 1 is the positive class.
+
+    :param dataset: An instance of the Dataset class.
+    :return: A 1D numpy array of uint64 words, one bit per row.
+    """
+
+    def build():
+        if not set(np.unique(dataset.y)) in ({0, 1}, {-1, 1}):
+            raise ValueError("Packed evaluation needs {0, 1} or {-1, 1} "
+                             "class labels.")
+
+        return pack_bits(dataset.y == 1)
+
+    return subexpression_cache.get((dataset.filename, "[bits y]"), build)
+
+
+def confusion_counts(bits, dataset):
+    """
+    Count true/false positives/negatives of packed predictions with
+    popcounts.
+
+    :param bits: Packed predictions, as returned by evaluate_bits.
+    :param dataset: An instance of the Dataset class.
+    :return: The numbers of true positives, false positives, false
+    negatives and true negatives.
+    """
+
+    return count_confusion(bits, get_label_bits(dataset), len(dataset.data))
+
+
+def count_confusion(bits, labels, n_rows):
+    """
+    Count true/false positives/negatives of packed predictions against
+    packed positive labels with popcounts. Padding bits must be 0.
+
+    :param bits: Packed predictions.
+    :param labels: Packed positive labels.
+    :param n_rows: The number of rows.
+    :return: The numbers of true positives, false positives, false
+    negatives and true negatives.
+    """
+
+    tp = popcount(bits & labels)
+    fp = popcount(bits) - tp
+    fn = popcount(labels) - tp
+    tn = n_rows - tp - fp - fn
+
+    return tp, fp, fn, tn
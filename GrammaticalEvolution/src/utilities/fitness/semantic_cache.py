@@ -0,0 +1,59 @@
+from hashlib import sha1
+
+import numpy as np
+from utilities.fitness.lru_cache import LRUCache
+
+semantic_cache = LRUCache('SEMANTIC_CACHE_SIZE')
+# The semantic cache of this process. Keys are the semantics of individuals
+# (see get_semantics), values are their training fitnesses. Individuals
+# which differ in phenotype but make identical predictions share an entry,
+# so the error metric is only computed once for each distinct behaviour.
+
+
+def get_semantics(yhat):
+    """
+    Return the semantics of an individual, i.e. a hash of its predictions
+    on the training data. Individuals with the same semantics make exactly
+    the same predictions, and so have the same fitness.
+
+    :param yhat: The predictions of an individual (a numpy array or
+    scalar).
+    :return: A hex string.
+    """
+
+    yhat = np.ascontiguousarray(yhat)
+
+    checksum = sha1(repr((yhat.dtype.str, yhat.shape)).encode())
+    checksum.update(yhat.data)
+
+    return checksum.hexdigest()
+
+
+def split_semantic_clones(individuals):
+    """
+    Split a list of individuals into those with distinct semantics and
+    their behavioural clones, i.e. individuals with the same semantics as
+    an individual earlier in the list. Individuals without semantics (e.g.
+    invalids) are never clones. The order of individuals is kept.
+
+    :param individuals: A list of individuals.
+    :return: A list of individuals with distinct semantics and a list of
+    behavioural clones.
+    """
+
+    seen, unique, clones = set(), [], []
+
+    for ind in individuals:
+        semantics = getattr(ind, 'semantics', None)
+
+        if semantics is None:
+            unique.append(ind)
+
+        elif semantics in seen:
+            clones.append(ind)
+
+        else:
+            seen.add(semantics)
+            unique.append(ind)
+
+    return unique, clones
@@ -0,0 +1,166 @@
+import ast
+import operator
+
+from utilities.fitness.compile_cache import compile_cache
+from utilities.fitness.lru_cache import LRUCache
+
+operators = {
+    ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul,
+    ast.Div: operator.truediv, ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod, ast.Pow: operator.pow,
+    ast.BitAnd: operator.and_, ast.BitOr: operator.or_,
+    ast.BitXor: operator.xor, ast.LShift: operator.lshift,
+    ast.RShift: operator.rshift, ast.MatMult: operator.matmul,
+    ast.Invert: operator.invert, ast.USub: operator.neg,
+    ast.UAdd: operator.pos, ast.Not: operator.not_,
+    ast.Lt: operator.lt, ast.LtE: operator.le, ast.Gt: operator.gt,
+    ast.GtE: operator.ge, ast.Eq: operator.eq, ast.NotEq: operator.ne,
+    ast.Is: operator.is_, ast.IsNot: operator.is_not}
+# The functions which apply Python operators, by AST node type. Nodes with
+# any other operator (e.g. "in") are evaluated as a whole.
+
+subexpression_cache = LRUCache('SUBEXPRESSION_CACHE_SIZE')
+# The values of subexpressions over whole datasets, shared by all
+# individuals in this process. Keys are (dataset, subexpression) pairs. As a
+# least-recently-used cache, values are kept within a generation and the
+# most recently used are retained across generations.
+
+
+def build_dag(tree):
+    """
+    Convert the abstract syntax tree of a phenotype into a hash-consed
+    expression DAG. Every subexpression is identified by a canonical key
+    built bottom-up from the keys of its children, so identical
+    subexpressions within a phenotype, or across a whole population, map to
+    the same node.
+
+    :param tree: An ast.Expression, e.g. from ast.parse(phenotype,
+    mode="eval").
+    :return: The key of the root node and a dict of node keys to nodes.
+    Each node is a (kind, function, child keys) tuple. Nodes of kind "apply"
+    apply an operator function (or, if function is None, call their first
+    child) to the values of their children. Nodes of kind "leaf" and "name"
+    evaluate a code object as a whole; only "leaf" values are cached, as
+    names and constants cost nothing to evaluate.
+    """
+
+    nodes = {}
+
+    def visit(node):
+        function, children = None, None
+
+        if isinstance(node, ast.BinOp) and type(node.op) in operators:
+            function = operators[type(node.op)]
+            children = [visit(node.left), visit(node.right)]
+
+        elif isinstance(node, ast.UnaryOp) and type(node.op) in operators:
+            function = operators[type(node.op)]
+            children = [visit(node.operand)]
+
+        elif isinstance(node, ast.Compare) and len(node.ops) == 1 and \
+                type(node.ops[0]) in operators:
+            function = operators[type(node.ops[0])]
+            children = [visit(node.left), visit(node.comparators[0])]
+
+        elif isinstance(node, ast.Call) and not node.keywords and not any(
+                isinstance(arg, ast.Starred) for arg in node.args):
+            children = [visit(node.func)] + [visit(arg) for arg in
+                                             node.args]
+
+        if children is not None:
+            key = "%s(%s)" % (function.__name__ if function else "call",
+                              ", ".join(children))
+
+            if key not in nodes:
+                nodes[key] = "apply", function, children
+
+        else:
+            # Subscripts such as x[:, 0] and anything else are evaluated as
+            # a whole. Leaf keys are bracketed, so that they can never be
+            # mistaken for the key of an operator node.
+            key = "[%s]" % ast.unparse(node)
+
+            if key not in nodes:
+                kind = "name" if isinstance(node, (ast.Name, ast.Constant)) \
+                    else "leaf"
+                nodes[key] = kind, compile(ast.Expression(node),
+                                           "<subexpression>", "eval"), []
+
+        return key
+
+    return visit(tree.body), nodes
+
+
+def get_dag(phenotype, parse, kind="dag"):
+    """
+    Return the expression DAG of a phenotype, building it on first use.
+    DAGs are kept in the compile cache.
+
+    :param phenotype: The phenotype string of an individual.
+    :param parse: A function which returns the abstract syntax tree of the
+    phenotype, e.g. with boolean keywords rewritten.
+    :param kind: The way the phenotype is parsed, which keeps the DAGs of
+    different parses of the same phenotype apart in the compile cache.
+    :return: The key of the root node and a dict of node keys to nodes (see
+    build_dag).
+    """
+
+    return compile_cache.get((kind, phenotype), lambda: build_dag(parse()))
+
+
+def evaluate_dag(dag, namespace, dataset):
+    """
+    Evaluate an expression DAG over a whole dataset. The value of each
+    subexpression (other than plain names and constants) is taken from the
+    subexpression cache if any individual has already computed it on this
+    dataset, and is otherwise computed once and cached.
+
+    :param dag: An expression DAG, as returned by get_dag.
+    :param namespace: A tuple of the globals and locals (e.g. dataset
+    columns bound by feature name) in which leaves are evaluated.
+    :param dataset: A name which identifies the dataset, e.g. its file name.
+    :return: The value of the phenotype.
+    """
+
+    root, nodes = dag
+    global_names, local_names = namespace
+    values = {}
+
+    def value(key):
+        if key in values:
+            return values[key]
+
+        kind, function, children = nodes[key]
+
+        if kind == "apply":
+            result = subexpression_cache.get((dataset, key), lambda: apply(
+                function, [value(child) for child in children]))
+
+        elif kind == "leaf":
+            result = subexpression_cache.get((dataset, key), lambda: eval(
+                function, global_names, local_names))
+
+        else:
+            # A name (e.g. a dataset column) or a constant.
+            result = eval(function, global_names, local_names)
+
+        values[key] = result
+        return result
+
+    return value(root)
+
+
+def apply(function, arguments):
+    """
+    Apply the function of a DAG node to the values of its children.
+
+    :param function: An operator function, or None for a function call.
+    :param arguments: The values of the children of the node.
+    :return: The value of the node.
+    """
+
+    if function is None:
+        # A function call; the first child is the function.
+        return arguments[0](*arguments[1:])
+
+    return function(*arguments)
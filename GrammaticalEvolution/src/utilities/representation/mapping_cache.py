@@ -0,0 +1,122 @@
+from collections import OrderedDict
+
+from algorithm.parameters import params
+
+
+class MappingCache(object):
+    """
+    A least-recently-used cache of genome mappings. Only the first
+    used_codons codons of a genome determine its phenotype, and each of
+    them only through its remainder modulo the number of choices of the
+    rule it expands. The cache is keyed by this effective genome, given as
+    the tuple of the productions selected by the used codons (see
+    representation.grammar.Grammar.compile_tables), so that a genome which
+    differs from a previously mapped genome only in its unused tail, or
+    only in codons which select the same productions, is not mapped again.
+
+    The rule expanded by each codon depends on the choices before it, so
+    the key of a changed genome is found from the productions of its
+    parent: codons before the first change select the same productions,
+    and later codons are reduced modulo the rules the parent expanded. As
+    each production identifies its rule, a key can only match a cached
+    mapping if those were also the rules the changed genome expands. Only
+    valid genomes mapped without wrapping are cached. The maximum number of
+    entries is set by params['MAPPING_CACHE_SIZE']; when it is exceeded the
+    least recently used entry is evicted.
+    """
+
+    def __init__(self):
+        """
+        Initialise an empty mapping cache.
+        """
+
+        self.entries = OrderedDict()
+        self.hits, self.misses, self.evictions = 0, 0, 0
+
+    def lookup(self, genome, productions, index):
+        """
+        Find the mapping of a changed genome whose effective genome is
+        cached.
+
+        :param genome: A genome to be mapped.
+        :param productions: The productions selected by the used codons of
+        a parent of the genome.
+        :param index: The first codon which differs from the genome of the
+        parent, or None if no codon differs.
+        :return: The cached mapping (see add), or None if there is none.
+        """
+
+        if index is None or index >= len(productions):
+            # The genome selects the same productions as the parent.
+            key = productions[:len(genome)]
+
+        else:
+            bnf_grammar = params['BNF_GRAMMAR']
+            rule_offsets, rule_sizes = bnf_grammar.rule_offsets, \
+                bnf_grammar.rule_sizes
+
+            key = productions[:index] + tuple([
+                rule_offsets[rule] + codon % rule_sizes[rule] for rule, codon
+                in zip(map(bnf_grammar.prod_rules.__getitem__,
+                           productions[index:]), genome[index:])])
+
+        mapping = self.entries.get(key)
+
+        if mapping is None:
+            self.misses += 1
+            return None
+
+        # Mark the entry as the most recently used.
+        self.entries.move_to_end(key)
+        self.hits += 1
+
+        return mapping
+
+    def add(self, productions, mapping):
+        """
+        Cache the mapping of a valid genome.
+
+        :param productions: The productions selected by the used codons of
+        a genome which has been mapped without wrapping.
+        :param mapping: The mapping of the genome, which is returned for
+        any genome which selects the same productions.
+        :return: Nothing.
+        """
+
+        max_size = params['MAPPING_CACHE_SIZE']
+
+        if not max_size:
+            return
+
+        entries = self.entries
+        entries[productions] = mapping
+
+        while len(entries) > max_size:
+            # Evict the least recently used entry.
+            entries.popitem(last=False)
+            self.evictions += 1
+
+    def hit_rate(self):
+        """
+        Return the fraction of lookups which found their genome in the
+        cache.
+
+        :return: The hit rate, or 0 if there have been no lookups.
+        """
+
+        lookups = self.hits + self.misses
+
+        return self.hits / lookups if lookups else 0
+
+    def clear(self):
+        """
+        Remove all entries from the cache.
+
+        :return: Nothing.
+        """
+
+        self.entries.clear()
+
+
+mapping_cache = MappingCache()
+# The mapping cache shared by all mappings in this process.
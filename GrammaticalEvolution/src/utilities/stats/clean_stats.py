@@ -13,6 +13,36 @@ def clean_stats():
     if not params['CACHE']:
         stats.pop('unique_inds')
         stats.pop('unused_search')
+        stats.pop('cache_size')
+        stats.pop('cache_bytes')
+        stats.pop('cache_hit_rate')
+        stats.pop('cache_evictions')
+
+    if not params['SEMANTIC_CACHE']:
+        stats.pop('semantic_duplicates')
+
+    if not params['COMPILE_CACHE_SIZE']:
+        stats.pop('compile_hits')
+        stats.pop('compile_misses')
+
+    if not params['PERSISTENT_CACHE']:
+        stats.pop('persistent_hits')
+
+    if not params['SUBEXPRESSION_CACHE_SIZE']:
+        stats.pop('subexpression_hits')
+        stats.pop('subexpression_misses')
+
+    if not params['MAPPING_CACHE_SIZE']:
+        stats.pop('mapping_hits')
+        stats.pop('mapping_misses')
+        stats.pop('mapping_hit_rate')
+
+    if not params['OPTIMIZE_CONSTANTS']:
+        stats.pop('constant_lookups')
+        stats.pop('constant_hits')
+        stats.pop('constant_hit_rate')
+        stats.pop('opt_iterations')
+        stats.pop('ave_opt_iterations')
 
     if not params['MUTATE_DUPLICATES']:
         stats.pop('regens')
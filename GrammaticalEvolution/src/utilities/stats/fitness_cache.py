@@ -0,0 +1,273 @@
+from collections import OrderedDict, defaultdict
+from sys import getsizeof
+
+from algorithm.parameters import params
+
+
+class LRUPolicy(object):
+    """
+    Least-recently-used eviction: the entry which has gone longest without
+    being looked up is evicted first.
+    """
+
+    def __init__(self):
+        self.order = OrderedDict()
+
+    def add(self, key):
+        self.order[key] = None
+
+    def touch(self, key):
+        self.order.move_to_end(key)
+
+    def remove(self, key):
+        del self.order[key]
+
+    def victim(self):
+        return next(iter(self.order))
+
+
+class AgePolicy(LRUPolicy):
+    """
+    Age-based (first in, first out) eviction: the oldest entry is evicted
+    first, however often it has been looked up.
+    """
+
+    def touch(self, key):
+        pass
+
+
+class LFUPolicy(object):
+    """
+    Least-frequently-used eviction: the entry which has been looked up the
+    fewest times is evicted first. Ties are broken by evicting the least
+    recently used of those entries. All operations take constant time.
+    """
+
+    def __init__(self):
+        self.counts = {}
+        self.buckets = defaultdict(OrderedDict)
+        self.min_count = 0
+
+    def add(self, key):
+        self.counts[key] = 0
+        self.buckets[0][key] = None
+        self.min_count = 0
+
+    def touch(self, key):
+        count = self.counts[key]
+        self.unlink(key, count)
+
+        self.counts[key] = count + 1
+        self.buckets[count + 1][key] = None
+
+    def remove(self, key):
+        self.unlink(key, self.counts.pop(key))
+
+    def unlink(self, key, count):
+        bucket = self.buckets[count]
+        del bucket[key]
+
+        if not bucket:
+            del self.buckets[count]
+
+            if self.min_count == count:
+                self.min_count = count + 1
+
+    def victim(self):
+        if self.min_count not in self.buckets:
+            # The least frequent entry was removed; find the new minimum.
+            self.min_count = min(self.buckets)
+
+        return next(iter(self.buckets[self.min_count]))
+
+
+policies = {"lru": LRUPolicy, "lfu": LFUPolicy, "age": AgePolicy}
+# The eviction policies which can be set by params['CACHE_EVICTION'].
+
+
+class FitnessCache(object):
+    """
+    The fitness cache of an evolutionary run, mapping the phenotype of each
+    individual to its fitness. Used as a dict (i.e. "phenotype in cache",
+    cache.get(phenotype), cache[phenotype] and cache[phenotype] = fitness).
+
+    The cache can be bounded by the number of entries (params['CACHE_SIZE'])
+    and/or by its approximate size in bytes (params['CACHE_MEMORY']). When
+    either is exceeded, entries are evicted according to
+    params['CACHE_EVICTION'] ("lru", "lfu" or "age"). With no bounds set
+    (the default) nothing is ever evicted, so the cache holds every unique
+    phenotype of the run.
+
+    Lookups (cache.get(phenotype)) count as hits or misses, and a hit counts
+    as a use of the entry for LRU and LFU eviction. Membership tests and
+    cache[phenotype] have no side effects.
+
+    The semantics of each phenotype (see
+    utilities.fitness.semantic_cache), if known, are kept next to its
+    fitness, so that individuals which take their fitness from the cache
+    can still be recognised as behavioural clones.
+    """
+
+    def __init__(self):
+        """
+        Initialise an empty fitness cache.
+        """
+
+        self.entries, self.sizes, self.semantics = {}, {}, {}
+        self.policy = None
+        self.bytes = 0
+        self.hits, self.misses, self.evictions, self.added = 0, 0, 0, 0
+
+    def __contains__(self, phenotype):
+        return phenotype in self.entries
+
+    def get(self, phenotype, default=None):
+        """
+        Look up the fitness of a phenotype, counting the lookup as a hit or
+        a miss.
+
+        :param phenotype: The phenotype of an individual.
+        :param default: The value returned if the phenotype is not cached.
+        :return: The cached fitness of the phenotype, or default.
+        """
+
+        if phenotype in self.entries:
+            self.hits += 1
+
+            if self.policy:
+                self.policy.touch(phenotype)
+
+            return self.entries[phenotype]
+
+        self.misses += 1
+        return default
+
+    def __getitem__(self, phenotype):
+        return self.entries[phenotype]
+
+    def __setitem__(self, phenotype, fitness):
+        if phenotype in self.entries:
+            # Update an existing entry.
+            self.bytes -= self.sizes[phenotype]
+
+        else:
+            self.added += 1
+
+            if self.policy is None:
+                self.policy = get_policy(params['CACHE_EVICTION'])
+
+            self.policy.add(phenotype)
+
+        self.entries[phenotype] = fitness
+        self.sizes[phenotype] = get_entry_size(phenotype, fitness)
+        self.bytes += self.sizes[phenotype]
+
+        self.evict()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def set_semantics(self, phenotype, semantics):
+        """
+        Keep the semantics of a cached phenotype next to its fitness.
+
+        :param phenotype: The phenotype of an individual in the cache.
+        :param semantics: The semantics of the phenotype, or None if they
+        are not known.
+        :return: Nothing.
+        """
+
+        if semantics is not None and phenotype in self.entries:
+            self.semantics[phenotype] = semantics
+
+    def get_semantics(self, phenotype):
+        """
+        Return the semantics of a cached phenotype.
+
+        :param phenotype: The phenotype of an individual.
+        :return: The semantics of the phenotype, or None if they are not
+        known.
+        """
+
+        return self.semantics.get(phenotype)
+
+    def evict(self):
+        """
+        Evict entries until the cache is within the bounds set by
+        params['CACHE_SIZE'] and params['CACHE_MEMORY'].
+
+        :return: Nothing.
+        """
+
+        max_size, max_bytes = params['CACHE_SIZE'], params['CACHE_MEMORY']
+
+        while (max_size and len(self.entries) > max_size) or \
+                (max_bytes and self.bytes > max_bytes and self.entries):
+            phenotype = self.policy.victim()
+
+            self.policy.remove(phenotype)
+            del self.entries[phenotype]
+            self.semantics.pop(phenotype, None)
+            self.bytes -= self.sizes.pop(phenotype)
+
+            self.evictions += 1
+
+    def hit_rate(self):
+        """
+        Return the fraction of lookups which found their phenotype in the
+        cache.
+
+        :return: The hit rate, or 0 if there have been no lookups.
+        """
+
+        lookups = self.hits + self.misses
+
+        return self.hits / lookups if lookups else 0
+
+    def clear(self):
+        """
+        Remove all entries from the cache.
+
+        :return: Nothing.
+        """
+
+        self.entries.clear()
+        self.sizes.clear()
+        self.semantics.clear()
+        self.policy, self.bytes = None, 0
+
+
+def get_policy(name):
+    """
+    Return a new instance of an eviction policy.
+
+    :param name: The name of the policy, i.e. "lru", "lfu" or "age".
+    :return: An instance of the eviction policy.
+    """
+
+    if name not in policies:
+        s = "utilities.stats.fitness_cache.get_policy\n" \
+            "Error: unknown cache eviction policy '%s'.\n" \
+            "       Use one of %s." % (name, ", ".join(sorted(policies)))
+        raise Exception(s)
+
+    return policies[name]()
+
+
+def get_entry_size(phenotype, fitness):
+    """
+    Return the approximate memory used by a cache entry in bytes, i.e. the
+    size of the phenotype string and of the fitness (including the values
+    of multi-objective fitness lists).
+
+    :param phenotype: The phenotype of an individual.
+    :param fitness: The fitness of the individual.
+    :return: The size of the entry in bytes.
+    """
+
+    size = getsizeof(phenotype) + getsizeof(fitness)
+
+    if isinstance(fitness, list):
+        size += sum(getsizeof(value) for value in fitness)
+
+    return size
@@ -0,0 +1,91 @@
+import logging
+from sys import stdout
+
+from algorithm.parameters import params
+
+# All PonyGE2 loggers are children of this logger, so that configuring them
+# does not affect the loggers of other libraries.
+ROOT = "ponyge"
+
+root_logger = logging.getLogger(ROOT)
+root_logger.propagate = False
+
+handler = logging.StreamHandler(stdout)
+handler.setFormatter(logging.Formatter("[%(levelname)s] %(message)s"))
+root_logger.addHandler(handler)
+root_logger.setLevel(logging.INFO)
+
+
+def get_logger(name):
+    """
+    Return the logger for a module. Call once at module level with the
+    module's __name__, e.g.
+
+        log = get_logger(__name__)
+
+    and log with lazy %-style formatting, e.g.
+
+        log.debug("Phenotype: %s", ind.phenotype)
+
+    The message is only formatted if the level is enabled, so a disabled
+    log call costs a single level check.
+
+    :param name: The name of the module, i.e. __name__.
+    :return: A logging.Logger instance.
+    """
+
+    return logging.getLogger(".".join([ROOT, name]))
+
+
+def set_log_levels():
+    """
+    Set the levels of all loggers from the params dictionary.
+    params['LOG_LEVEL'] sets the level of all modules (or WARNING if
+    params['SILENT'] is set). params['LOG_MODULES'] switches the level of
+    individual modules or packages, given as space separated
+    "module:LEVEL" pairs, e.g.
+
+        "fitness.supervised_learning:DEBUG algorithm.search_loop:WARNING"
+
+    :return: Nothing.
+    """
+
+    level = params['LOG_LEVEL']
+
+    if params['SILENT'] and level in ("DEBUG", "INFO"):
+        # Only show warnings and errors in silent mode.
+        level = "WARNING"
+
+    root_logger.setLevel(get_level(level))
+
+    if params['LOG_MODULES']:
+        for switch in params['LOG_MODULES'].split():
+            name, _, module_level = switch.rpartition(":")
+
+            if not name:
+                s = "utilities.stats.logger.set_log_levels\n" \
+                    "Error: LOG_MODULES entry '%s' is not of the form " \
+                    "module:LEVEL." % switch
+                raise Exception(s)
+
+            get_logger(name).setLevel(get_level(module_level))
+
+
+def get_level(level):
+    """
+    Convert a level name, e.g. "DEBUG", into a logging level.
+
+    :param level: The name of a logging level.
+    :return: The logging level.
+    """
+
+    value = logging.getLevelName(str(level).upper())
+
+    if not isinstance(value, int):
+        s = "utilities.stats.logger.get_level\n" \
+            "Error: unknown log level '%s'.\n" \
+            "       Use one of DEBUG, INFO, WARNING, ERROR, CRITICAL." \
+            % level
+        raise Exception(s)
+
+    return value
@@ -1,9 +1,19 @@
 """Utilities for tracking progress of runs, including time taken per
 generation, fitness plots, fitness caches, etc."""
 
-cache = {}
-# This dict stores the cache for an evolutionary run. The key for each entry
-# is the phenotype of the individual, the value is its fitness.
+from utilities.stats.fitness_cache import FitnessCache
+
+cache = FitnessCache()
+# This dict-like FitnessCache stores the cache for an evolutionary run. The
+# key for each entry is the phenotype of the individual, the value is its
+# fitness. It can be bounded by params['CACHE_SIZE'] and
+# params['CACHE_MEMORY'].
+
+test_cache = {}
+# This dict stores the test fitness and test predictions of each phenotype
+# evaluated on the test set by fitness.test_evaluation.TestEvaluator during
+# the run, so that the best individual is not evaluated again at the end of
+# the run.
 
 runtime_error_cache = []
 # This list stores a list of phenotypes which produce runtime errors over an
@@ -25,5 +35,9 @@ stats_list = []
 # List for storing stats at each generation
 # Used when verbose mode is off to speed up program
 
+constant_totals = [0, 0, 0]
+# The total constant cache lookups, hits and optimiser iterations at the end
+# of the previous generation, from which per-generation rates are found.
+
 best_ever = None
 # Store the best ever individual here.